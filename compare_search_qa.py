@@ -85,13 +85,13 @@ def compare_search_results():
             qa_result = qa_service.answer_question(question, context_limit=5)
             print(f"QA回答結果:")
             print(f"  信頼度: {qa_result.confidence:.1%}")
-            print(f"  参考記事数: {len(qa_result.source_articles)}")
+            print(f"  参考記事数: {len(qa_result.sources)}")
             print(f"  回答: {qa_result.answer[:100]}...")
             
-            if qa_result.source_articles:
+            if qa_result.sources:
                 print("  参考記事:")
-                for i, article in enumerate(qa_result.source_articles):
-                    print(f"    {i+1}. {article.name}")
+                for i, source in enumerate(qa_result.sources):
+                    print(f"    {i+1}. {source.name}")
         except Exception as e:
             print(f"  ❌ QAサービス呼び出し失敗: {e}")
         
@@ -40,7 +40,7 @@ def check_articles():
                 print(f"  本文（最初の100文字）: {article.body_md[:100] if article.body_md else 'なし'}...")
                 print(f"  処理済みテキスト（最初の100文字）: {article.processed_text[:100] if article.processed_text else 'なし'}...")
                 print(f"  要約: {article.summary[:100] if article.summary else 'なし'}...")
-                print(f"  埋め込みベクトル: {'あり' if article.embedding else 'なし'}")
+                print(f"  埋め込みベクトル: {'あり' if article.embedding is not None else 'なし'}")
                 
         return len(articles)
         
@@ -39,7 +39,7 @@ def debug_article_818():
         print(f"   タイトル: {article_818.name}")
         print(f"   カテゴリ: {article_818.category}")
         print(f"   本文: {article_818.processed_text[:200]}...")
-        print(f"   ベクトル長: {len(article_818.embedding) if article_818.embedding else 0}")
+        print(f"   ベクトル長: {len(article_818.embedding) if article_818.embedding is not None else 0}")
         print()
         
         # ChromaDBから記事818を直接取得
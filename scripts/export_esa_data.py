@@ -21,6 +21,9 @@ from src.services.search_service import SearchService
 from src.utils.text_processing import TextProcessor
 from src.config.settings import settings
 
+# 記事をDBへ一括書き込みする際の1文あたりの行数
+UPSERT_CHUNK_SIZE = 500
+
 
 def export_members(api_client: EsaAPIClient, member_repo: MemberRepository):
     """メンバー情報のエクスポート"""
@@ -82,6 +85,7 @@ def export_articles(api_client: EsaAPIClient, article_repo: ArticleRepository):
         text_processor = TextProcessor()
         
         success_count = 0
+        article_rows = []
         for i, post_data in enumerate(posts):
             try:
                 # デバッグ: 記事データの構造を確認
@@ -141,37 +145,24 @@ def export_articles(api_client: EsaAPIClient, article_repo: ArticleRepository):
                     "summary": summary
                 }
                 
-                article_repo.upsert_article(article_data)
-                success_count += 1
-                
-                # 10件ごとにコミットしてメモリとコネクションを開放
-                if (i + 1) % 10 == 0:
-                    try:
-                        article_repo.db.commit()
-                        print(f"  進捗: {i + 1}/{len(posts)} 記事を処理...")
-                    except Exception as commit_error:
-                        print(f"⚠️ コミットエラー (記事 {i+1}): {commit_error}")
-                        article_repo.db.rollback()
+                article_rows.append(article_data)
                 
             except Exception as e:
                 print(f"⚠️ 記事 {post_data.get('number')} の処理でエラー: {e}")
                 import traceback
                 print(f"   詳細: {traceback.format_exc()}")
-                # セッションのロールバック
-                try:
-                    article_repo.db.rollback()
-                except:
-                    pass
                 continue
         
-        # 最終コミット
-        try:
-            article_repo.db.commit()
-            print(f"✅ {success_count}件の記事をエクスポートしました")
-        except Exception as final_commit_error:
-            print(f"⚠️ 最終コミットエラー: {final_commit_error}")
-            article_repo.db.rollback()
+        # UPSERT_CHUNK_SIZE件ずつ1文で書き込み（行ごとのSELECT・コミットを避ける）
+        for start in range(0, len(article_rows), UPSERT_CHUNK_SIZE):
+            chunk = article_rows[start:start + UPSERT_CHUNK_SIZE]
+            try:
+                success_count += article_repo.upsert_many(chunk)
+                print(f"  進捗: {start + len(chunk)}/{len(posts)} 記事を保存...")
+            except Exception as chunk_error:
+                print(f"⚠️ 記事の一括保存でエラー ({start + 1}〜{start + len(chunk)}件目): {chunk_error}")
         
+        print(f"✅ {success_count}件の記事をエクスポートしました")
         return success_count
         
     except Exception as e:
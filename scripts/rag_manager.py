@@ -281,7 +281,7 @@ def check_data(args):
                         print(f"  {i}. 記事{article.number}: {article.name}")
                         print(f"     更新日: {article.updated_at}")
                         print(f"     カテゴリ: {article.category}")
-                        print(f"     ベクトル化: {'✅' if article.embedding else '❌'}")
+                        print(f"     ベクトル化: {'✅' if article.embedding is not None else '❌'}")
                         print(f"     テキスト長: {len(article.processed_text or article.body_md or '') if article.processed_text or article.body_md else 0}文字")
                         print()
                 
@@ -333,8 +333,8 @@ def check_data(args):
                                     chroma_embedding = chroma_result["embeddings"][0]
                                     
                                     # ベクトルサイズ確認
-                                    sqlite_size = len(sqlite_embedding) if sqlite_embedding else 0
-                                    chroma_size = len(chroma_embedding) if chroma_embedding else 0
+                                    sqlite_size = len(sqlite_embedding) if sqlite_embedding is not None else 0
+                                    chroma_size = len(chroma_embedding) if chroma_embedding is not None else 0
                                     
                                     if sqlite_size == chroma_size and sqlite_size > 0:
                                         # 最初の3要素を比較（完全一致は計算誤差もあるので近似比較）
@@ -358,7 +358,7 @@ def check_data(args):
                                 print(f"   記事{article.number}: ❌ 確認エラー: {verify_error}")
                         
                         print(f"\n📊 ベクトルデータの説明:")
-                        print(f"   SQLite: JSONフィールドとして記事テーブルに保存")
+                        print(f"   SQLite: float32バイナリとして記事テーブルに保存")
                         print(f"   ChromaDB: 専用ベクトルDBで高速検索に最適化")
                         print(f"   データ同期: ベクトル化時に両方に同じデータを保存")
                     
@@ -44,6 +44,38 @@ def setup_database():
         sys.exit(1)
 
 
+def migrate_embeddings_to_blob(batch_size: int = 500):
+    """旧形式（JSONテキスト）の埋め込みをfloat32バイナリに変換"""
+    import numpy as np
+    import orjson
+    from sqlalchemy import text
+    
+    migrated = 0
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            "SELECT number, embedding FROM articles WHERE typeof(embedding) = 'text'"
+        )).fetchall()
+        
+        for start in range(0, len(rows), batch_size):
+            params = [
+                {
+                    "number": number,
+                    "embedding": np.asarray(orjson.loads(embedding), dtype=np.float32).tobytes() or None
+                }
+                for number, embedding in rows[start:start + batch_size]
+            ]
+            conn.execute(
+                text("UPDATE articles SET embedding = :embedding WHERE number = :number"),
+                params
+            )
+            migrated += len(params)
+    
+    if migrated:
+        print(f"✅ 埋め込みをバイナリ形式に変換: {migrated}件")
+    else:
+        print("✅ 変換が必要な埋め込みはありません")
+
+
 def create_directories():
     """必要なディレクトリを作成"""
     directories = [
@@ -73,6 +105,10 @@ def main():
     setup_database()
     print()
     
+    # 旧形式データの変換
+    migrate_embeddings_to_blob()
+    print()
+    
     print("🎉 セットアップが完了しました！")
     print()
     print("次のステップ:")
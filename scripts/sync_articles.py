@@ -13,9 +13,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.services.esa_api_service import EsaAPIClient
+from src.database.connection import SessionLocal
 from src.database.repositories.article_repository import ArticleRepository
 from src.services.embedding_service import EmbeddingService
 from src.services.search_service import SearchService
+from src.models.esa_models import Article
 from src.utils.text_processing import TextProcessor
 from src.config.settings import settings
 
@@ -24,10 +26,11 @@ def sync_recent_articles(hours: int = 24):
     """指定時間以内の更新記事を同期"""
     print(f"📥 過去{hours}時間以内の記事を同期中...")
     
+    db_session = SessionLocal()
     try:
         # サービス初期化
         api_client = EsaAPIClient()
-        article_repo = ArticleRepository()
+        article_repo = ArticleRepository(db=db_session)
         search_service = SearchService()
         embedding_service = EmbeddingService()
         text_processor = TextProcessor()
@@ -39,7 +42,8 @@ def sync_recent_articles(hours: int = 24):
             print("✅ 同期対象の記事はありませんでした")
             return 0
         
-        success_count = 0
+        article_rows = []
+        articles_to_index = []
         for i, post_data in enumerate(recent_posts):
             try:
                 # テキスト前処理
@@ -69,28 +73,33 @@ def sync_recent_articles(hours: int = 24):
                     "summary": summary
                 }
                 
-                # データベースに保存
-                article_repo.upsert_article(article_data)
-                
-                # 記事をベクトルDBに追加
+                # データベース・ベクトルDBへの保存はループ後にまとめて行う
+                article_rows.append(article_data)
                 if embedding:
-                    from src.models.esa_models import Article
-                    article_obj = Article(**article_data)
-                    search_service.add_article(article_obj)
+                    articles_to_index.append(Article(**article_data))
                 
-                success_count += 1
-                print(f"  同期完了: {post_data['name']}")
+                print(f"  同期準備完了: {post_data['name']}")
                 
             except Exception as e:
                 print(f"⚠️ 記事 {post_data.get('number')} の同期でエラー: {e}")
                 continue
         
+        # 記事をデータベースに一括で追加または更新
+        success_count = article_repo.upsert_many(article_rows)
+        
+        # 記事をベクトルDBに一括で追加または更新（更新記事の重複登録を防ぐ）
+        if articles_to_index:
+            indexed_count = search_service.upsert_articles(articles_to_index)
+            print(f"  ベクトルDB更新: {indexed_count}件")
+        
         print(f"✅ {success_count}件の記事を同期しました")
         return success_count
         
     except Exception as e:
         print(f"❌ 同期エラー: {e}")
         return 0
+    finally:
+        db_session.close()
 
 
 def main():
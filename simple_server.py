@@ -2,6 +2,7 @@
 シンプルサーバー起動スクリプト
 """
 
+import os
 import uvicorn
 import sys
 from pathlib import Path
@@ -15,6 +16,11 @@ if __name__ == "__main__":
     print("📡 http://localhost:8500 でAPIサーバーを起動します")
     print("💡 依存関係を利用するには 'uv run python simple_server.py' で起動してください")
     
+    # CPU推論のスレッド数（torchのimport前に設定する必要がある）
+    cpu_threads = str(os.cpu_count() or 1)
+    os.environ.setdefault("OMP_NUM_THREADS", cpu_threads)
+    os.environ.setdefault("MKL_NUM_THREADS", cpu_threads)
+    
     # 依存関係チェック
     try:
         import transformers
@@ -5,6 +5,9 @@ FastAPI メインアプリケーション
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+import asyncio
 import secrets
 
 from ..config.settings import settings
@@ -43,7 +46,8 @@ except ImportError as e:
 app = FastAPI(
     title="研究室 esa.io RAGシステム API",
     description="esa.io記事の検索・質問応答システム",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORSミドルウェアの設定
@@ -55,6 +59,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# レスポンス圧縮（検索・QA結果のJSONは数十KBになるため。SSEのtext/event-streamは圧縮対象外）
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # セキュリティ設定
 security = HTTPBasic()
 
@@ -81,6 +88,35 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
 async def startup_event():
     """アプリケーション起動時の処理"""
     init_db()
+    
+    # 検索サービスは埋め込みモデルの読み込みが重いため、最初のリクエスト前に生成しておく
+    await asyncio.to_thread(_init_search_services)
+    
+    # 頻出クエリの埋め込みを事前計算（設定されている場合のみ）
+    if settings.query_warmup_file:
+        await asyncio.to_thread(_warmup_query_embeddings)
+
+
+def _init_search_services():
+    """共有の検索サービスを初期化"""
+    try:
+        from ..services.search_service import get_search_service
+        get_search_service()
+    except Exception as e:
+        print(f"⚠️ Search service initialization failed: {e}")
+
+
+def _warmup_query_embeddings():
+    """クエリログの頻出クエリで埋め込みキャッシュを温める"""
+    try:
+        from ..services.embedding_service import load_frequent_queries
+        from ..services.search_service import get_search_service
+        
+        queries = load_frequent_queries(settings.query_warmup_file, settings.query_warmup_top_n)
+        if queries:
+            get_search_service().embedding_service.warmup(queries)
+    except Exception as e:
+        print(f"⚠️ Query embedding warmup failed: {e}")
 
 
 # ルーターの登録
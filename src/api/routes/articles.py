@@ -47,7 +47,7 @@ async def get_articles(
     repo = ArticleRepository(db)
     
     if category:
-        articles = repo.search_by_category(category)
+        articles = repo.search_by_category(category, limit=limit)
     else:
         articles = repo.get_all(skip=skip, limit=limit)
     
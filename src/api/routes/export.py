@@ -4,12 +4,14 @@
 
 import asyncio
 from typing import Dict, Any
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 import csv
 import io
 
 from ...services.esa_api_service import EsaAPIClient
+from ...database.connection import SessionLocal, get_db
 from ...database.repositories.article_repository import ArticleRepository
 from ...database.repositories.member_repository import MemberRepository
 
@@ -33,6 +35,30 @@ export_status = {
 }
 
 
+# 記事・メンバーをDBへ一括書き込みする際の1文あたりの行数
+UPSERT_CHUNK_SIZE = 500
+
+
+def _post_to_article_row(post_data: Dict[str, Any]) -> Dict[str, Any]:
+    """esa.io APIの記事データをarticlesテーブルの行に変換"""
+    return {
+        "number": post_data["number"],
+        "name": post_data["name"],
+        "full_name": post_data["full_name"],
+        "wip": post_data["wip"],
+        "body_md": post_data["body_md"],
+        "body_html": post_data["body_html"],
+        "created_at": post_data["created_at"],
+        "updated_at": post_data["updated_at"],
+        "url": post_data["url"],
+        "tags": post_data.get("tags", []),
+        "category": post_data.get("category", ""),
+        "created_by_id": post_data["created_by"]["id"],
+        "updated_by_id": post_data["updated_by"]["id"],
+        "processed_text": post_data["body_md"]  # 簡単な前処理
+    }
+
+
 @router.post("/")
 async def start_export():
     """esa.io データのエクスポートを開始"""
@@ -57,6 +83,8 @@ async def run_export():
     """バックグラウンドエクスポート処理"""
     global export_status
     
+    # バックグラウンド処理はリクエストより長く続くため、専用のセッションを使う
+    db = SessionLocal()
     try:
         export_status["status"] = "running"
         export_status["message"] = "esa.io APIからデータを取得中..."
@@ -69,10 +97,10 @@ async def run_export():
         members_response = api_client.get_members()
         members = members_response.get("members", [])
         
-        # メンバー情報をデータベースに保存
-        member_repo = MemberRepository()
-        for member_data in members:
-            member_repo.upsert_member({
+        # メンバー情報をデータベースに一括保存
+        member_repo = MemberRepository(db)
+        member_repo.upsert_many([
+            {
                 "id": member_data["id"],
                 "screen_name": member_data["screen_name"],
                 "name": member_data["name"],
@@ -80,61 +108,53 @@ async def run_export():
                 "role": member_data.get("role", "member"),
                 "posts_count": member_data.get("posts_count", 0),
                 "joined_at": member_data.get("joined_at")
-            })
+            }
+            for member_data in members
+        ])
         
         # 記事情報を取得
         export_status["message"] = "記事情報を取得中..."
         posts = api_client.export_all_posts()
         export_status["total"] = len(posts)
         
-        # 記事をデータベースに保存
-        article_repo = ArticleRepository()
-        for i, post_data in enumerate(posts):
+        # 記事をデータベースに保存（UPSERT_CHUNK_SIZE件ずつ一括書き込み）
+        article_rows = []
+        for post_data in posts:
             try:
-                article_repo.upsert_article({
-                    "number": post_data["number"],
-                    "name": post_data["name"],
-                    "full_name": post_data["full_name"],
-                    "wip": post_data["wip"],
-                    "body_md": post_data["body_md"],
-                    "body_html": post_data["body_html"],
-                    "created_at": post_data["created_at"],
-                    "updated_at": post_data["updated_at"],
-                    "url": post_data["url"],
-                    "tags": post_data.get("tags", []),
-                    "category": post_data.get("category", ""),
-                    "created_by_id": post_data["created_by"]["id"],
-                    "updated_by_id": post_data["updated_by"]["id"],
-                    "processed_text": post_data["body_md"]  # 簡単な前処理
-                })
-                
-                export_status["progress"] = i + 1
-                export_status["message"] = f"記事を処理中... ({i + 1}/{len(posts)})"
-                
+                article_rows.append(_post_to_article_row(post_data))
             except Exception as e:
                 print(f"記事 {post_data.get('number')} の処理でエラー: {e}")
                 continue
         
+        article_repo = ArticleRepository(db)
+        for start in range(0, len(article_rows), UPSERT_CHUNK_SIZE):
+            article_repo.upsert_many(article_rows[start:start + UPSERT_CHUNK_SIZE])
+            
+            done = min(start + UPSERT_CHUNK_SIZE, len(article_rows))
+            export_status["progress"] = done
+            export_status["message"] = f"記事を処理中... ({done}/{len(posts)})"
+        
         export_status["status"] = "completed"
         export_status["message"] = f"エクスポート完了。{len(posts)}件の記事を処理しました。"
         
     except Exception as e:
         export_status["status"] = "error"
         export_status["message"] = f"エラーが発生しました: {str(e)}"
+    finally:
+        db.close()
 
 
 @router.post("/upload/csv")
-async def upload_csv_data(file: UploadFile = File(...)):
+async def upload_csv_data(file: UploadFile = File(...), db: Session = Depends(get_db)):
     """手動CSVアップロード"""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="CSVファイルが必要です")
     
     try:
-        content = await file.read()
-        csv_data = csv.DictReader(io.StringIO(content.decode('utf-8')))
+        # アップロードされた一時ファイルを全体を文字列化せずに逐次読み込む
+        csv_data = csv.DictReader(io.TextIOWrapper(file.file, encoding='utf-8', newline=''))
         
-        article_repo = ArticleRepository()
-        articles_count = 0
+        article_rows = []
         
         for row in csv_data:
             # CSVの列をArticleフィールドにマッピング
@@ -155,43 +175,26 @@ async def upload_csv_data(file: UploadFile = File(...)):
                 "processed_text": row.get("body_md", "")
             }
             
-            article_repo.upsert_article(article_data)
-            articles_count += 1
+            article_rows.append(article_data)
+        
+        ArticleRepository(db).upsert_many(article_rows)
         
-        return {"message": f"{articles_count}件の記事をアップロードしました"}
+        return {"message": f"{len(article_rows)}件の記事をアップロードしました"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"CSVアップロードエラー: {str(e)}")
 
 
 @router.post("/sync")
-async def sync_recent_articles(hours: int = 24):
+async def sync_recent_articles(hours: int = 24, db: Session = Depends(get_db)):
     """差分データの同期更新"""
     try:
         api_client = EsaAPIClient()
         recent_posts = api_client.get_recent_posts(hours=hours)
         
-        article_repo = ArticleRepository()
-        updated_count = 0
-        
-        for post_data in recent_posts:
-            article_repo.upsert_article({
-                "number": post_data["number"],
-                "name": post_data["name"],
-                "full_name": post_data["full_name"],
-                "wip": post_data["wip"],
-                "body_md": post_data["body_md"],
-                "body_html": post_data["body_html"],
-                "created_at": post_data["created_at"],
-                "updated_at": post_data["updated_at"],
-                "url": post_data["url"],
-                "tags": post_data.get("tags", []),
-                "category": post_data.get("category", ""),
-                "created_by_id": post_data["created_by"]["id"],
-                "updated_by_id": post_data["updated_by"]["id"],
-                "processed_text": post_data["body_md"]
-            })
-            updated_count += 1
+        updated_count = ArticleRepository(db).upsert_many(
+            [_post_to_article_row(post_data) for post_data in recent_posts]
+        )
         
         return {
             "message": f"過去{hours}時間以内の{updated_count}件の記事を同期しました",
@@ -3,11 +3,12 @@
 Sparse + Dense 検索の統合エンドポイント
 """
 
+import asyncio
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
-from ...services.hybrid_search_service import HybridSearchService, HybridSearchResult
+from ...services.hybrid_search_service import HybridSearchResult, get_hybrid_search_service
 from ...models.search import SearchParams
 
 
@@ -31,10 +32,7 @@ class HybridSearchRequest(BaseModel):
     use_query_processing: bool = Field(True, description="クエリ前処理を使用")
     sparse_weight: Optional[float] = Field(0.6, ge=0, le=1, description="Sparse検索の重み")
     dense_weight: Optional[float] = Field(0.4, ge=0, le=1, description="Dense検索の重み")
-
-
-# ハイブリッド検索サービスのインスタンス
-hybrid_service = HybridSearchService()
+    fusion_mode: Optional[Literal["cc", "rrf"]] = Field(None, description="スコア統合方式（未指定時は設定値）")
 
 
 @router.post("/hybrid", response_model=HybridSearchResponse)
@@ -45,9 +43,12 @@ async def hybrid_search(request: HybridSearchRequest):
     特徴:
     - BM25ベースのキーワード検索
     - ベクター埋め込みによる意味的検索
-    - RRF + 重み付きスコアによる結果統合
+    - 正規化スコアの凸結合（またはRRF + 重み付きスコア）による結果統合
     """
     try:
+        # サービスはリクエストごとに取得する（QAルートのリセット後は新しいインスタンスを使う。初回は初期化を伴うためスレッドで取得）
+        hybrid_service = await asyncio.to_thread(get_hybrid_search_service)
+        
         # 重みの正規化
         total_weight = request.sparse_weight + request.dense_weight
         if total_weight > 0:
@@ -57,31 +58,33 @@ async def hybrid_search(request: HybridSearchRequest):
             normalized_sparse = 0.6
             normalized_dense = 0.4
         
-        # ハイブリッド検索実行
-        results = await hybrid_service.hybrid_search(
+        # ハイブリッド検索実行（繰り返しの質問はキャッシュから返す）
+        results, cache_hit = await hybrid_service.cached_hybrid_search(
             query=request.query,
             limit=request.limit,
             use_query_processing=request.use_query_processing,
             sparse_weight=normalized_sparse,
-            dense_weight=normalized_dense
+            dense_weight=normalized_dense,
+            fusion_mode=request.fusion_mode
         )
         
-        # レスポンス形式に変換
-        response_results = []
-        for result in results:
-            response_results.append({
-                "article_id": result.article_id,
-                "title": result.title,
-                "content": result.content,
+        # レスポンス形式に変換（スコアは丸めずにそのまま返す。表示側で整形する）
+        response_results = [
+            {
+                "article_id": r.article_id,
+                "title": r.title,
+                "content": r.content,
                 "scores": {
-                    "hybrid": round(result.hybrid_score, 3),
-                    "sparse": round(result.sparse_score, 3),
-                    "dense": round(result.dense_score, 3)
+                    "hybrid": r.hybrid_score,
+                    "sparse": r.sparse_score,
+                    "dense": r.dense_score
                 },
-                "search_type": result.search_type
-            })
+                "search_type": r.search_type
+            }
+            for r in results
+        ]
         
-        # クエリ処理情報の取得
+        # クエリ処理情報の取得（検索時の結果がキャッシュされているため再計算されない）
         processed_info = hybrid_service.query_processor.process_query(request.query)
         
         return HybridSearchResponse(
@@ -90,11 +93,13 @@ async def hybrid_search(request: HybridSearchRequest):
             total_results=len(results),
             search_weights={
                 "sparse_weight": normalized_sparse,
-                "dense_weight": normalized_dense
+                "dense_weight": normalized_dense,
+                "fusion_mode": request.fusion_mode or hybrid_service.fusion_mode
             },
             results=response_results,
             performance_info={
                 "query_processing_used": request.use_query_processing,
+                "cache_hit": cache_hit,
                 "extracted_keywords": processed_info['keywords'] if request.use_query_processing else [],
                 "technical_terms": processed_info['technical_terms'] if request.use_query_processing else []
             }
@@ -115,6 +120,7 @@ async def explain_hybrid_search(
     検索プロセスの透明化とデバッグ用
     """
     try:
+        hybrid_service = await asyncio.to_thread(get_hybrid_search_service)
         explanation = hybrid_service.explain_search(query, limit)
         return explanation
     except Exception as e:
@@ -132,10 +138,25 @@ async def compare_search_methods(
     Sparse vs Dense vs Hybrid の結果を並列表示
     """
     try:
+        hybrid_service = await asyncio.to_thread(get_hybrid_search_service)
+        
+        # クエリのベクトル化は一度だけ行い、3つの検索で共用する（推論はスレッドで実行）
+        query_embedding = await asyncio.to_thread(
+            hybrid_service.embedding_service.generate_query_embedding, query
+        )
+        
         # 各検索手法を並列実行
-        hybrid_results = await hybrid_service.hybrid_search(query, limit, use_query_processing=True)
-        sparse_results = await hybrid_service.hybrid_search(query, limit, sparse_weight=1.0, dense_weight=0.0)
-        dense_results = await hybrid_service.hybrid_search(query, limit, sparse_weight=0.0, dense_weight=1.0)
+        hybrid_results, sparse_results, dense_results = await asyncio.gather(
+            hybrid_service.hybrid_search(
+                query, limit, use_query_processing=True, query_embedding=query_embedding
+            ),
+            hybrid_service.hybrid_search(
+                query, limit, sparse_weight=1.0, dense_weight=0.0, query_embedding=query_embedding
+            ),
+            hybrid_service.hybrid_search(
+                query, limit, sparse_weight=0.0, dense_weight=1.0, query_embedding=query_embedding
+            )
+        )
         
         return {
             "query": query,
@@ -186,38 +207,47 @@ async def compare_search_methods(
         raise HTTPException(status_code=500, detail=f"比較検索エラー: {str(e)}")
 
 
+# 設定情報のうちリクエストごとに変わらない部分（起動時に一度だけ構築）
+_HYBRID_CONFIG_BASE = {
+    "supported_features": [
+        "BM25 sparse search",
+        "Vector dense search", 
+        "Min-max normalized convex combination (CC) score fusion",
+        "RRF score fusion",
+        "Query preprocessing",
+        "Multi-language support"
+    ],
+    "optimal_use_cases": {
+        "sparse_preferred": [
+            "正確なキーワード検索",
+            "技術用語での検索",
+            "固有名詞での検索"
+        ],
+        "dense_preferred": [
+            "概念的な質問",
+            "自然言語での質問",
+            "類似した内容の検索"
+        ],
+        "hybrid_optimal": [
+            "一般的な検索",
+            "複合的な質問",
+            "最高の検索精度が必要な場合"
+        ]
+    }
+}
+
+
 @router.get("/hybrid/config")
 async def get_hybrid_config():
     """ハイブリッド検索の設定情報"""
+    hybrid_service = await asyncio.to_thread(get_hybrid_search_service)
     return {
         "current_weights": {
             "sparse_weight": hybrid_service.sparse_weight,
             "dense_weight": hybrid_service.dense_weight
         },
-        "supported_features": [
-            "BM25 sparse search",
-            "Vector dense search", 
-            "RRF score fusion",
-            "Query preprocessing",
-            "Multi-language support"
-        ],
-        "optimal_use_cases": {
-            "sparse_preferred": [
-                "正確なキーワード検索",
-                "技術用語での検索",
-                "固有名詞での検索"
-            ],
-            "dense_preferred": [
-                "概念的な質問",
-                "自然言語での質問",
-                "類似した内容の検索"
-            ],
-            "hybrid_optimal": [
-                "一般的な検索",
-                "複合的な質問",
-                "最高の検索精度が必要な場合"
-            ]
-        }
+        "fusion_mode": hybrid_service.fusion_mode,
+        **_HYBRID_CONFIG_BASE
     }
 
 
@@ -241,16 +271,20 @@ class HybridSearchIntegration:
     @staticmethod
     def get_compatibility_layer():
         """既存APIとの互換性レイヤー"""
-        return {
-            "migration_guide": {
-                "from": "/api/search/semantic",
-                "to": "/api/search/hybrid",
-                "benefits": [
-                    "より高い検索精度",
-                    "自然言語質問の改善された処理",
-                    "キーワード検索と意味検索の統合"
-                ]
-            },
-            "backward_compatibility": "既存のsemantic検索APIは引き続き利用可能",
-            "recommended_migration": "新しい検索機能にはhybrid検索の使用を推奨"
-        }
+        return _COMPATIBILITY_LAYER
+
+
+# 互換性レイヤーの情報（固定値）
+_COMPATIBILITY_LAYER = {
+    "migration_guide": {
+        "from": "/api/search/semantic",
+        "to": "/api/search/hybrid",
+        "benefits": [
+            "より高い検索精度",
+            "自然言語質問の改善された処理",
+            "キーワード検索と意味検索の統合"
+        ]
+    },
+    "backward_compatibility": "既存のsemantic検索APIは引き続き利用可能",
+    "recommended_migration": "新しい検索機能にはhybrid検索の使用を推奨"
+}
@@ -2,70 +2,234 @@
 進捗追跡とリアルタイム通知のためのエンドポイント
 """
 
-import json
+import orjson
 import time
 import asyncio
-from typing import Dict, Any
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
 from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from loguru import logger
-import uuid
+import secrets
+
+from ...frontend.templates.progress_qa import (
+    PROGRESS_QA_HTML_BYTES,
+    PROGRESS_QA_HTML_ENCODED,
+    PROGRESS_QA_HTML_ENCODED_ETAGS,
+    PROGRESS_QA_HTML_ETAG,
+)
 
 router = APIRouter()
 
-# 進捗状況を保存するためのグローバル辞書
-progress_store: Dict[str, Dict[str, Any]] = {}
+
+class ProgressStore:
+    """
+    進捗状況の保存先（上限件数 + TTL付き、スレッドセーフ）
+    
+    ProgressTrackerはワーカースレッド内の同期コードからも更新されるため
+    asyncio.Lockではなくthreading.Lockで保護する。
+    更新時は購読中のSSEストリームへcall_soon_threadsafeで通知する
+    """
+    
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # task_id -> (最終更新時刻, 進捗データ, リビジョン)。最終更新の古い順に並ぶ
+        self._data: "OrderedDict[str, tuple[float, Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._revision = 0
+        # task_id -> 購読者（イベントループ, asyncio.Event）のリスト
+        self._waiters: Dict[str, list] = {}
+    
+    def _evict(self, now: float):
+        """期限切れ・上限超過のエントリを古い順に削除（ロック取得済みで呼ぶ）"""
+        while self._data:
+            task_id, (touched_at, _, _) = next(iter(self._data.items()))
+            if now - touched_at < self.ttl and len(self._data) <= self.maxsize:
+                break
+            del self._data[task_id]
+    
+    def set(self, task_id: str, data: Dict[str, Any]):
+        """進捗データを登録"""
+        now = time.time()
+        with self._lock:
+            self._revision += 1
+            self._data[task_id] = (now, data, self._revision)
+            self._data.move_to_end(task_id)
+            self._evict(now)
+        self._notify(task_id)
+    
+    def update(self, task_id: str, values: Dict[str, Any]) -> bool:
+        """既存の進捗データを更新（存在しない場合はFalse）"""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._data.get(task_id)
+            if entry is None:
+                return False
+            entry[1].update(values)
+            self._revision += 1
+            self._data[task_id] = (now, entry[1], self._revision)
+            self._data.move_to_end(task_id)
+        self._notify(task_id)
+        return True
+    
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """進捗データのスナップショットを取得"""
+        return self.get_with_revision(task_id)[0]
+    
+    def get_with_revision(self, task_id: str) -> tuple[Optional[Dict[str, Any]], int]:
+        """進捗データのスナップショットと、更新ごとに増えるリビジョンを取得"""
+        with self._lock:
+            self._evict(time.time())
+            entry = self._data.get(task_id)
+            if entry is None:
+                return None, 0
+            return dict(entry[1]), entry[2]
+    
+    def pop(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """進捗データを削除"""
+        with self._lock:
+            entry = self._data.pop(task_id, None)
+            return entry[1] if entry is not None else None
+    
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+    
+    def subscribe(self, task_id: str) -> asyncio.Event:
+        """進捗更新の通知を受け取るイベントを登録（イベントループ内で呼ぶ）"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._waiters.setdefault(task_id, []).append(waiter)
+        return event
+    
+    def unsubscribe(self, task_id: str, event: asyncio.Event):
+        """通知イベントの登録を解除"""
+        with self._lock:
+            waiters = self._waiters.get(task_id, [])
+            waiters[:] = [w for w in waiters if w[1] is not event]
+            if not waiters:
+                self._waiters.pop(task_id, None)
+    
+    def _notify(self, task_id: str):
+        """購読者に更新を通知（どのスレッドからでも呼べる）"""
+        with self._lock:
+            waiters = list(self._waiters.get(task_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # イベントループが既に終了している
+                pass
+
+
+# 進捗状況を保存するためのグローバルストア（完了後のタスクはTTLで自動削除）
+progress_store = ProgressStore()
+
+# 更新が無い場合にキープアライブを送る間隔（秒）
+SSE_KEEPALIVE_INTERVAL = 15
+
+# 1接続あたりの最大配信時間（秒）。停止したタスクの接続が残り続けるのを防ぐ
+SSE_MAX_DURATION = 1800
+
+# 進捗が変化しない状態がこの時間（秒）続いたら停滞とみなす
+SSE_STALL_TIMEOUT = 300
+
+# 途中経過を送る最小間隔（秒）。これより速い更新はまとめて最新の状態のみ送る（完了・エラーは即時）
+SSE_MIN_INTERVAL = 0.1
+
+# SSEのコメント行（クライアント側では無視される）
+SSE_KEEPALIVE = b": keep-alive\n\n"
+
+# 切断時にクライアント（EventSource）が再接続するまでの待ち時間（ミリ秒）
+SSE_RETRY = b"retry: 3000\n\n"
+
+
+def _sse_event(payload: Dict[str, Any]) -> bytes:
+    """SSE形式のイベントをバイト列で生成"""
+    return b"data: " + orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) + b"\n\n"
 
 class ProgressTracker:
     """進捗追跡クラス"""
     
-    def __init__(self, task_id: str):
+    def __init__(self, task_id: str, initialize: bool = True):
         self.task_id = task_id
         self.progress_store = progress_store
-        self.progress_store[task_id] = {
+        if not initialize:
+            # 既存タスクへの参照のみ（進捗を初期化しない）
+            return
+        self.progress_store.set(task_id, {
             "status": "started",
             "progress": 0,
             "message": "処理を開始しています...",
             "details": {},
             "created_at": time.time()
-        }
+        })
     
     def update(self, progress: int, message: str, details: Dict[str, Any] = None):
         """進捗を更新"""
-        if self.task_id in self.progress_store:
-            self.progress_store[self.task_id].update({
-                "progress": progress,
-                "message": message,
-                "details": details or {},
-                "updated_at": time.time()
-            })
+        if self.progress_store.update(self.task_id, {
+            "progress": progress,
+            "message": message,
+            "details": details or {},
+            "updated_at": time.time()
+        }):
             logger.info(f"Progress {self.task_id}: {progress}% - {message}")
     
     def complete(self, message: str = "処理が完了しました", result: Any = None):
         """処理完了"""
-        if self.task_id in self.progress_store:
-            self.progress_store[self.task_id].update({
-                "status": "completed",
-                "progress": 100,
-                "message": message,
-                "result": result,
-                "completed_at": time.time()
-            })
+        self.progress_store.update(self.task_id, {
+            "status": "completed",
+            "progress": 100,
+            "message": message,
+            "result": result,
+            "completed_at": time.time()
+        })
     
     def error(self, error_message: str):
         """エラー状態"""
-        if self.task_id in self.progress_store:
-            self.progress_store[self.task_id].update({
-                "status": "error",
-                "message": f"エラー: {error_message}",
-                "error_at": time.time()
-            })
+        self.progress_store.update(self.task_id, {
+            "status": "error",
+            "message": f"エラー: {error_message}",
+            "error_at": time.time()
+        })
+
+@router.get("/qa-page")
+async def progress_qa_page(request: Request):
+    """進捗表示機能付きQAのHTMLページを配信（ETagが一致すれば304、圧縮は事前計算済みの本文を使用）"""
+    accepted = {
+        token.split(";")[0].strip() for token in request.headers.get("accept-encoding", "").split(",")
+    }
+    encoding = next(
+        (enc for enc in ("br", "gzip") if enc in accepted and enc in PROGRESS_QA_HTML_ENCODED), None
+    )
+    if encoding is None:
+        content, etag = PROGRESS_QA_HTML_BYTES, PROGRESS_QA_HTML_ETAG
+    else:
+        content, etag = PROGRESS_QA_HTML_ENCODED[encoding], PROGRESS_QA_HTML_ENCODED_ETAGS[encoding]
+    
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=3600",
+        "Vary": "Accept-Encoding",
+    }
+    # 配信する表現のETagと照合する（If-None-Matchは複数指定・*もあり得る）
+    if_none_match = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="text/html; charset=utf-8", headers=headers)
 
 @router.get("/progress/{task_id}")
 async def get_progress(task_id: str):
     """特定のタスクの進捗状況を取得"""
-    if task_id in progress_store:
-        return progress_store[task_id]
+    progress_data = progress_store.get(task_id)
+    if progress_data is not None:
+        return progress_data
     else:
         return {"error": "Task not found"}
 
@@ -74,34 +238,71 @@ async def stream_progress(task_id: str, request: Request):
     """Server-Sent Events を使用した進捗ストリーミング"""
     
     async def event_generator():
+        updated = progress_store.subscribe(task_id)
+        last_sent_revision = None
+        started_at = last_change_at = time.monotonic()
+        last_sent_at = float("-inf")
+        stalled = False
         try:
+            yield SSE_RETRY
+            
             while True:
                 # クライアントの接続状況をチェック
                 if await request.is_disconnected():
                     logger.info(f"Client disconnected from progress stream {task_id}")
                     break
                 
-                # 進捗状況を取得
-                if task_id in progress_store:
-                    progress_data = progress_store[task_id]
+                # 最大配信時間を超えたら打ち切る
+                if time.monotonic() - started_at > SSE_MAX_DURATION:
+                    logger.warning(f"Progress stream {task_id} exceeded {SSE_MAX_DURATION}s, closing")
+                    yield _sse_event({"status": "stream_timeout", "error": "進捗の取得がタイムアウトしました"})
+                    break
+                
+                # 取得前にクリアし、取得後の更新を取りこぼさないようにする
+                updated.clear()
+                
+                # 進捗状況を取得（待機中に複数回更新されていても最新の状態のみ送る）
+                progress_data, revision = progress_store.get_with_revision(task_id)
+                if progress_data is not None:
+                    finished = progress_data.get("status") in ["completed", "error"]
                     
-                    # SSE形式でデータを送信
-                    yield f"data: {json.dumps(progress_data, ensure_ascii=False)}\n\n"
+                    # 前回送信から変化がなければ送信しない
+                    if revision != last_sent_revision:
+                        # 前回送信から間もない途中経過は送らず、間隔が空いてから最新の状態を読み直す
+                        wait = last_sent_at + SSE_MIN_INTERVAL - time.monotonic()
+                        if wait > 0 and not finished:
+                            await asyncio.sleep(wait)
+                            continue
+                        
+                        # SSE形式でデータを送信
+                        yield _sse_event(progress_data)
+                        last_sent_revision = revision
+                        last_sent_at = last_change_at = time.monotonic()
+                        stalled = False
                     
                     # 完了またはエラーの場合は終了
-                    if progress_data.get("status") in ["completed", "error"]:
-                        yield f"data: {json.dumps({'status': 'stream_ended'})}\n\n"
+                    if finished:
+                        yield _sse_event({"status": "stream_ended"})
                         break
                 else:
-                    yield f"data: {json.dumps({'error': 'Task not found'})}\n\n"
+                    yield _sse_event({"error": "Task not found"})
                     break
                 
-                # 1秒待機
-                await asyncio.sleep(1)
+                # 更新通知を待機（タイムアウト時はコメント行でキープアライブ）
+                try:
+                    await asyncio.wait_for(updated.wait(), timeout=SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 停滞中もキープアライブのみ送り、最大配信時間で打ち切られるのを待つ
+                    if not stalled and time.monotonic() - last_change_at > SSE_STALL_TIMEOUT:
+                        logger.warning(f"Progress stream {task_id} has not changed for {SSE_STALL_TIMEOUT}s")
+                        stalled = True
+                    yield SSE_KEEPALIVE
                 
         except Exception as e:
             logger.error(f"Error in progress stream: {e}")
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            yield _sse_event({"error": str(e)})
+        finally:
+            progress_store.unsubscribe(task_id, updated)
     
     return StreamingResponse(
         event_generator(),
@@ -115,19 +316,20 @@ async def stream_progress(task_id: str, request: Request):
 
 @router.delete("/progress/{task_id}")
 async def cleanup_progress(task_id: str):
-    """進捗データをクリーンアップ"""
-    if task_id in progress_store:
-        del progress_store[task_id]
+    """進捗データをクリーンアップ（通常はTTLで自動削除される）"""
+    if progress_store.pop(task_id) is not None:
         return {"message": "Progress data cleaned up"}
     else:
         return {"error": "Task not found"}
 
 def create_progress_tracker() -> tuple[str, ProgressTracker]:
     """新しい進捗追跡を作成"""
-    task_id = str(uuid.uuid4())
+    task_id = secrets.token_urlsafe(12)
     tracker = ProgressTracker(task_id)
     return task_id, tracker
 
-def get_progress_tracker(task_id: str) -> ProgressTracker:
-    """既存の進捗追跡を取得"""
-    return ProgressTracker(task_id)
+def get_progress_tracker(task_id: str) -> Optional[ProgressTracker]:
+    """既存の進捗追跡を取得（存在しない場合はNone）"""
+    if task_id not in progress_store:
+        return None
+    return ProgressTracker(task_id, initialize=False)
@@ -2,47 +2,123 @@
 質問応答API - ハイブリッド検索対応版
 """
 
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Optional, Tuple
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from loguru import logger
-from datetime import datetime
 
 # 進捗追跡のインポート
-from .progress import create_progress_tracker, get_progress_tracker
+from .progress import create_progress_tracker, get_progress_tracker, _sse_event
 
-# QAサービスの条件付きインポート
-try:
-    from ...services.langchain_qa_service import LangChainQAService
-    LANGCHAIN_AVAILABLE = True
-    logger.info("✅ LangChain QA service available")
-except ImportError as e:
-    LANGCHAIN_AVAILABLE = False
-    LangChainQAService = None
-    logger.warning(f"⚠️ LangChain QA service not available: {e}")
-
-try:
-    from ...services.qa_service import QAService
-    ORIGINAL_QA_AVAILABLE = True
-    logger.info("✅ Original QA service available")
-except ImportError as e:
-    ORIGINAL_QA_AVAILABLE = False
-    QAService = None
-    logger.warning(f"⚠️ Original QA service not available: {e}")
+# QAサービス（qa_new.pyと共有）
+from .qa_services import QA_SERVICE_FACTORIES, get_langchain_qa, get_original_qa
 
 # ハイブリッド検索サービス
 try:
-    from ...services.hybrid_search_service import HybridSearchService
+    from ...services.hybrid_search_service import HybridSearchService, get_hybrid_search_service
+    from ...services.search_service import get_search_service
     HYBRID_SEARCH_AVAILABLE = True
     logger.info("✅ Hybrid search service available")
 except ImportError as e:
     HYBRID_SEARCH_AVAILABLE = False
     HybridSearchService = None
+    get_hybrid_search_service = None
+    get_search_service = None
     logger.warning(f"⚠️ Hybrid search service not available: {e}")
 
 from ...config.settings import settings
 
 router = APIRouter()
 
+# LLM推論は同期処理のため専用スレッドで実行し、イベントループ（SSE配信など）を止めない
+_qa_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.qa_worker_threads), thread_name_prefix="qa-worker"
+)
+
+
+async def _run_in_qa_thread(func: Callable, *args, **kwargs):
+    """同期関数をQA用スレッドプールで実行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_qa_executor, partial(func, *args, **kwargs))
+
+
+@lru_cache(maxsize=1)
+def _select_qa_service() -> Tuple[Any, str]:
+    """
+    利用するQAサービスを選択（結果はキャッシュされ、初期化は一度だけ）
+    
+    Returns:
+        (QAサービス, サービス名)
+    
+    Raises:
+        RuntimeError: 利用可能なサービスがない場合（この結果はキャッシュされない）
+    """
+    for factory, label in QA_SERVICE_FACTORIES:
+        try:
+            qa_service = factory()
+            logger.info(f"Using {label}")
+            return qa_service, label
+        except Exception as e:
+            logger.warning(f"{label} failed: {e}")
+    
+    raise RuntimeError("QA service dependencies not available")
+
+
+def _get_qa_service() -> Tuple[Optional[Any], Optional[str]]:
+    """QAサービスを取得（利用できない場合は (None, None)）"""
+    try:
+        return _select_qa_service()
+    except RuntimeError:
+        return None, None
+
+
+# ストリーミング生成の終了を表す番兵
+_STREAM_END = object()
+
+
+def reset_services():
+    """キャッシュ済みのサービスを破棄（次回利用時に再生成）"""
+    _select_qa_service.cache_clear()
+    get_langchain_qa.cache_clear()
+    get_original_qa.cache_clear()
+    if get_hybrid_search_service is not None:
+        get_hybrid_search_service.cache_clear()
+        get_search_service.cache_clear()
+
+
+def _unavailable_response(question: str) -> Dict[str, Any]:
+    """QAサービスが利用できない場合のレスポンス"""
+    return {
+        "question": question,
+        "answer": "申し訳ございません。現在QAサービスは利用できません。依存関係のインストールが必要です。",
+        "sources": [],
+        "confidence": 0.0,
+        "service_used": "fallback",
+        "error": "QA service dependencies not available"
+    }
+
+
+def _build_response(result, service_used: str) -> Dict[str, Any]:
+    """QA結果からレスポンスを構築（orjsonでそのまま直列化できる型のみを含める）"""
+    response = {
+        "question": result.question,
+        "answer": result.answer,
+        "sources": [source._asdict() for source in result.sources],
+        "confidence": result.confidence,
+        "service_used": service_used
+    }
+    
+    # LangChainサービスの場合、追加情報を含める
+    if hasattr(result, 'model_info') and result.model_info:
+        response["model_info"] = result.model_info
+    
+    return response
+
 
 class QARequest(BaseModel):
     """質問応答リクエスト"""
@@ -59,7 +135,7 @@ class QAWithProgressRequest(BaseModel):
     use_hybrid_search: bool = True
 
 
-@router.post("/with-progress")
+@router.post("/with-progress", response_class=ORJSONResponse)
 async def answer_question_with_progress(request: QAWithProgressRequest):
     """進捗追跡付きで質問に対する回答を生成"""
     # 進捗追跡を作成
@@ -68,87 +144,31 @@ async def answer_question_with_progress(request: QAWithProgressRequest):
     try:
         progress_tracker.update(5, "QAサービスを初期化中...")
         
-        # 利用可能なサービスに応じて選択
-        qa_service = None
-        service_used = None
-        
-        # LangChainサービスを優先
-        if LANGCHAIN_AVAILABLE and settings.qa_service_type in ["langchain", "auto"]:
-            try:
-                qa_service = LangChainQAService()
-                service_used = "LangChain RAG Service"
-                logger.info("Using LangChain QA service")
-                progress_tracker.update(10, "LangChain QAサービスを使用します")
-            except Exception as e:
-                logger.warning(f"LangChain service failed: {e}")
-                qa_service = None
-        
-        # フォールバック: オリジナルQAサービス
-        if qa_service is None and ORIGINAL_QA_AVAILABLE:
-            try:
-                qa_service = QAService()
-                service_used = "Original QA Service (fallback)"
-                logger.info("Using original QA service as fallback")
-                progress_tracker.update(10, "オリジナルQAサービスにフォールバック")
-            except Exception as e:
-                logger.error(f"Original QA service also failed: {e}")
-                qa_service = None
+        # 利用可能なサービスに応じて選択（初回はモデル読み込みを伴うためスレッドで実行）
+        qa_service, service_used = await _run_in_qa_thread(_get_qa_service)
         
         # どちらも利用できない場合
         if qa_service is None:
             progress_tracker.error("QAサービスが利用できません")
-            return {
-                "task_id": task_id,
-                "question": request.question,
-                "answer": "申し訳ございません。現在QAサービスは利用できません。依存関係のインストールが必要です。",
-                "sources": [],
-                "confidence": 0.0,
-                "service_used": "fallback",
-                "error": "QA service dependencies not available"
-            }
+            return ORJSONResponse({"task_id": task_id, **_unavailable_response(request.question)})
         
+        progress_tracker.update(10, f"{service_used} を使用します")
         progress_tracker.update(15, "ハイブリッド検索を開始中...")
         
         # 質問応答実行
         if request.use_hybrid_search and HYBRID_SEARCH_AVAILABLE:
             # ハイブリッド検索を使用してコンテキストを取得
-            hybrid_service = HybridSearchService()
-            search_results = await hybrid_service.hybrid_search(
+            hybrid_service = get_hybrid_search_service()
+            search_results, _ = await hybrid_service.cached_hybrid_search(
                 query=request.question,
                 limit=request.context_limit
             )
             
-            progress_tracker.update(50, f"ハイブリッド検索完了 ({len(search_results.results)}件の記事)")
-            
-            # ハイブリッド検索結果をQAサービス用の形式に変換
-            context_articles = []
-            for result in search_results:
-                # HybridSearchResultからArticle形式を構築
-                from ...models.esa_models import Article
-                from datetime import datetime
-                
-                article = Article(
-                    number=result.article_id,
-                    name=result.title,
-                    full_name=result.title,
-                    wip=False,
-                    body_md=result.content,
-                    body_html="",
-                    created_at=datetime.now(),
-                    updated_at=datetime.now(),
-                    url="",
-                    tags=[],
-                    category="",
-                    created_by_id=0,
-                    updated_by_id=0,
-                    processed_text=result.content,
-                    embedding=None,
-                    summary=None
-                )
-                context_articles.append(article)
+            progress_tracker.update(50, f"ハイブリッド検索完了 ({len(search_results)}件の記事)")
             
             # QAサービスでハイブリッド検索の結果を使用
-            result = qa_service.answer_question_with_context(
+            result = await _run_in_qa_thread(
+                qa_service.answer_question_with_context,
                 question=request.question,
                 contexts=search_results,
                 context_limit=request.context_limit,
@@ -158,34 +178,20 @@ async def answer_question_with_progress(request: QAWithProgressRequest):
         else:
             # 従来の検索方法を使用
             progress_tracker.update(50, "従来の検索方法を使用中...")
-            result = qa_service.answer_question(
+            result = await _run_in_qa_thread(
+                qa_service.answer_question,
                 question=request.question,
                 context_limit=request.context_limit
             )
+            # 一括生成は進捗を報告しないため、完了をここで通知する（SSEの購読側が終了を受け取れるように）
+            progress_tracker.complete("回答生成が完了しました", {
+                "confidence": result.confidence,
+                "articles_used": len(result.sources),
+                "response_length": len(result.answer)
+            })
         
         # レスポンス構築
-        response = {
-            "task_id": task_id,
-            "question": result.question,
-            "answer": result.answer,
-            "sources": [
-                {
-                    "name": article.name,
-                    "url": article.url,
-                    "category": article.category,
-                    "tags": article.tags or []
-                }
-                for article in result.source_articles
-            ],
-            "confidence": result.confidence,
-            "service_used": service_used
-        }
-        
-        # LangChainサービスの場合、追加情報を含める
-        if hasattr(result, 'model_info') and result.model_info:
-            response["model_info"] = result.model_info
-        
-        return response
+        return ORJSONResponse({"task_id": task_id, **_build_response(result, service_used)})
         
     except Exception as e:
         logger.error(f"QA API error: {e}")
@@ -193,56 +199,29 @@ async def answer_question_with_progress(request: QAWithProgressRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/")
+@router.post("/", response_class=ORJSONResponse)
 async def answer_question(request: QARequest):
     """質問に対する回答を生成（通常版）"""
     try:
-        # 利用可能なサービスに応じて選択
-        qa_service = None
-        service_used = None
-        
-        # LangChainサービスを優先
-        if LANGCHAIN_AVAILABLE and settings.qa_service_type in ["langchain", "auto"]:
-            try:
-                qa_service = LangChainQAService()
-                service_used = "LangChain RAG Service"
-                logger.info("Using LangChain QA service")
-            except Exception as e:
-                logger.warning(f"LangChain service failed: {e}")
-                qa_service = None
-        
-        # フォールバック: オリジナルQAサービス
-        if qa_service is None and ORIGINAL_QA_AVAILABLE:
-            try:
-                qa_service = QAService()
-                service_used = "Original QA Service (fallback)"
-                logger.info("Using original QA service as fallback")
-            except Exception as e:
-                logger.error(f"Original QA service also failed: {e}")
-                qa_service = None
+        # 利用可能なサービスに応じて選択（初回はモデル読み込みを伴うためスレッドで実行）
+        qa_service, service_used = await _run_in_qa_thread(_get_qa_service)
         
         # どちらも利用できない場合
         if qa_service is None:
-            return {
-                "question": request.question,
-                "answer": "申し訳ございません。現在QAサービスは利用できません。依存関係のインストールが必要です。",
-                "sources": [],
-                "confidence": 0.0,
-                "service_used": "fallback",
-                "error": "QA service dependencies not available"
-            }
+            return ORJSONResponse(_unavailable_response(request.question))
         
         # 質問応答実行
         if request.use_hybrid_search and HYBRID_SEARCH_AVAILABLE:
             # ハイブリッド検索を使用してコンテキストを取得
-            hybrid_service = HybridSearchService()
-            search_results = await hybrid_service.hybrid_search(
+            hybrid_service = get_hybrid_search_service()
+            search_results, _ = await hybrid_service.cached_hybrid_search(
                 query=request.question,
                 limit=request.context_limit
             )
             
             # QAサービスでハイブリッド検索の結果を使用
-            result = qa_service.answer_question_with_context(
+            result = await _run_in_qa_thread(
+                qa_service.answer_question_with_context,
                 question=request.question,
                 contexts=search_results,
                 context_limit=request.context_limit
@@ -250,34 +229,87 @@ async def answer_question(request: QARequest):
             service_used += " + Hybrid Search"
         else:
             # 従来の検索方法を使用
-            result = qa_service.answer_question(
+            result = await _run_in_qa_thread(
+                qa_service.answer_question,
                 question=request.question,
                 context_limit=request.context_limit
             )
         
         # レスポンス構築
-        response = {
-            "question": result.question,
-            "answer": result.answer,
-            "sources": [
-                {
-                    "name": article.name,
-                    "url": article.url,
-                    "category": article.category,
-                    "tags": article.tags or []
-                }
-                for article in result.source_articles
-            ],
-            "confidence": result.confidence,
-            "service_used": service_used
-        }
-        
-        # LangChainサービスの場合、追加情報を含める
-        if hasattr(result, 'model_info') and result.model_info:
-            response["model_info"] = result.model_info
-        
-        return response
+        return ORJSONResponse(_build_response(result, service_used))
         
     except Exception as e:
         logger.error(f"QA API error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/stream")
+async def answer_question_stream(request: QARequest):
+    """質問に対する回答をトークン単位でSSE配信（生成完了を待たずに表示できる）"""
+    qa_service, service_used = await _run_in_qa_thread(_get_qa_service)
+    
+    if qa_service is None or not hasattr(qa_service, "stream_answer"):
+        raise HTTPException(status_code=503, detail="Streaming QA service not available")
+    
+    contexts = None
+    if request.use_hybrid_search and HYBRID_SEARCH_AVAILABLE:
+        hybrid_service = get_hybrid_search_service()
+        contexts, _ = await hybrid_service.cached_hybrid_search(
+            query=request.question,
+            limit=request.context_limit
+        )
+        service_used += " + Hybrid Search"
+    
+    async def event_generator():
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancel_event = threading.Event()
+        
+        def on_text(text: str):
+            # 生成スレッドから呼ばれるため、キューへの投入はイベントループ側で行う
+            loop.call_soon_threadsafe(tokens.put_nowait, text)
+        
+        # 生成はQA用スレッドプールで行い、同時生成数をqa_worker_threadsに抑える
+        generation = loop.run_in_executor(_qa_executor, partial(
+            qa_service.stream_answer,
+            request.question,
+            on_text,
+            contexts=contexts,
+            context_limit=request.context_limit,
+            cancel_event=cancel_event
+        ))
+        # 生成完了は投入済みのテキスト片より後に通知される
+        generation.add_done_callback(lambda _: tokens.put_nowait(_STREAM_END))
+        
+        try:
+            while (token := await tokens.get()) is not _STREAM_END:
+                yield _sse_event({"delta": token})
+            sources, confidence = generation.result()
+            yield _sse_event({
+                "done": True,
+                "service_used": service_used,
+                "sources": [source._asdict() for source in sources],
+                "confidence": confidence
+            })
+        except Exception as e:
+            logger.error(f"QA stream error: {e}")
+            yield _sse_event({"error": str(e)})
+        finally:
+            # クライアント切断時も次のトークンで生成を止め、ワーカーを解放する
+            cancel_event.set()
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive"
+        }
+    )
+
+
+@router.post("/services/reset")
+async def reset_qa_services():
+    """QA関連サービスのキャッシュを破棄（設定変更やモデル更新後に使用）"""
+    reset_services()
+    return {"message": "QAサービスのキャッシュを破棄しました"}
@@ -29,11 +29,15 @@ async def answer_question_fallback(request: QARequest):
     }
 
 
+# ヘルスチェックの応答（固定値）
+_FALLBACK_HEALTH = {
+    "status": "fallback",
+    "message": "QA service dependencies not available",
+    "available_endpoints": ["/api/search", "/api/articles", "/api/export"]
+}
+
+
 @router.get("/health")
 async def qa_health_check_fallback():
     """QAサービスのヘルスチェック（フォールバック）"""
-    return {
-        "status": "fallback",
-        "message": "QA service dependencies not available",
-        "available_endpoints": ["/api/search", "/api/articles", "/api/export"]
-    }
+    return _FALLBACK_HEALTH
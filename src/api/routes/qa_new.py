@@ -7,24 +7,21 @@ from pydantic import BaseModel
 from loguru import logger
 from datetime import datetime
 
-# QAサービスの条件付きインポート
-try:
-    from ...services.langchain_qa_service import LangChainQAService
-    LANGCHAIN_AVAILABLE = True
-    logger.info("✅ LangChain QA service available")
-except ImportError as e:
-    LANGCHAIN_AVAILABLE = False
-    LangChainQAService = None
-    logger.warning(f"⚠️ LangChain QA service not available: {e}")
+# QAサービス（qa.pyと共有し、両方のルーターを登録してもモデルは一度だけ読み込む）
+from .qa_services import (
+    LANGCHAIN_AVAILABLE,
+    ORIGINAL_QA_AVAILABLE,
+    QA_SERVICE_FACTORIES,
+    get_langchain_qa,
+)
 
+# GPU情報（リクエストごとにtorchのインポートを試みないよう起動時に一度だけ確認）
 try:
-    from ...services.qa_service import QAService
-    ORIGINAL_QA_AVAILABLE = True
-    logger.info("✅ Original QA service available")
-except ImportError as e:
-    ORIGINAL_QA_AVAILABLE = False
-    QAService = None
-    logger.warning(f"⚠️ Original QA service not available: {e}")
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    torch = None
+    TORCH_AVAILABLE = False
 
 from ...config.settings import settings
 
@@ -41,29 +38,17 @@ class QARequest(BaseModel):
 async def answer_question(request: QARequest):
     """質問に対する回答を生成"""
     try:
-        # 利用可能なサービスに応じて選択
+        # 利用可能なサービスを優先順に試す
         qa_service = None
         service_used = None
-        
-        # LangChainサービスを優先
-        if LANGCHAIN_AVAILABLE and settings.qa_service_type in ["langchain", "auto"]:
-            try:
-                qa_service = LangChainQAService()
-                service_used = "LangChain RAG Service"
-                logger.info("Using LangChain QA service")
-            except Exception as e:
-                logger.warning(f"LangChain service failed: {e}")
-                qa_service = None
-        
-        # フォールバック: オリジナルQAサービス
-        if qa_service is None and ORIGINAL_QA_AVAILABLE:
+        for factory, label in QA_SERVICE_FACTORIES:
             try:
-                qa_service = QAService()
-                service_used = "Original QA Service (fallback)"
-                logger.info("Using original QA service as fallback")
+                qa_service = factory()
+                service_used = label
+                logger.info(f"Using {label}")
+                break
             except Exception as e:
-                logger.error(f"Original QA service also failed: {e}")
-                qa_service = None
+                logger.warning(f"{label} failed: {e}")
         
         # どちらも利用できない場合
         if qa_service is None:
@@ -86,15 +71,7 @@ async def answer_question(request: QARequest):
         response = {
             "question": result.question,
             "answer": result.answer,
-            "sources": [
-                {
-                    "name": article.name,
-                    "url": article.url,
-                    "category": article.category,
-                    "tags": article.tags or []
-                }
-                for article in result.source_articles
-            ],
+            "sources": [source._asdict() for source in result.sources],
             "confidence": result.confidence,
             "service_used": service_used
         }
@@ -121,14 +98,10 @@ async def qa_status():
     }
     
     # GPU情報を追加
-    try:
-        import torch
-        status["gpu_available"] = torch.cuda.is_available()
-        if torch.cuda.is_available():
-            status["gpu_count"] = torch.cuda.device_count()
-            status["gpu_name"] = torch.cuda.get_device_name(0)
-    except ImportError:
-        status["gpu_available"] = False
+    status["gpu_available"] = TORCH_AVAILABLE and torch.cuda.is_available()
+    if status["gpu_available"]:
+        status["gpu_count"] = torch.cuda.device_count()
+        status["gpu_name"] = torch.cuda.get_device_name(0)
     
     return status
 
@@ -140,7 +113,7 @@ async def available_models():
     
     if LANGCHAIN_AVAILABLE:
         try:
-            service = LangChainQAService()
+            service = get_langchain_qa()
             if hasattr(service, 'get_model_info'):
                 model_info = service.get_model_info()
                 models.append({
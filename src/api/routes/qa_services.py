@@ -0,0 +1,58 @@
+"""
+QAサービスの共有インスタンス
+qa.py と qa_new.py の両方から利用し、モデルの読み込みをプロセス内で一度にまとめる
+"""
+
+from functools import lru_cache
+from typing import Any, Callable, List, Tuple
+from loguru import logger
+
+from ...config.settings import settings
+
+# QAサービスの条件付きインポート
+try:
+    from ...services.langchain_qa_service import LangChainQAService
+    LANGCHAIN_AVAILABLE = True
+    logger.info("✅ LangChain QA service available")
+except ImportError as e:
+    LANGCHAIN_AVAILABLE = False
+    LangChainQAService = None
+    logger.warning(f"⚠️ LangChain QA service not available: {e}")
+
+try:
+    from ...services.qa_service import QAService
+    ORIGINAL_QA_AVAILABLE = True
+    logger.info("✅ Original QA service available")
+except ImportError as e:
+    ORIGINAL_QA_AVAILABLE = False
+    QAService = None
+    logger.warning(f"⚠️ Original QA service not available: {e}")
+
+
+# サービスはモデル読み込みが重いため、初回利用時に一度だけ生成して使い回す
+@lru_cache(maxsize=1)
+def get_langchain_qa() -> "LangChainQAService":
+    """共有のLangChainQAServiceを取得"""
+    return LangChainQAService()
+
+
+@lru_cache(maxsize=1)
+def get_original_qa() -> "QAService":
+    """共有のQAServiceを取得"""
+    return QAService()
+
+
+def _build_qa_service_factories() -> List[Tuple[Callable[[], Any], str]]:
+    """設定と利用可能な依存関係から、QAサービスの優先順リストを構築"""
+    factories: List[Tuple[Callable[[], Any], str]] = []
+    # LangChainサービスを優先
+    if LANGCHAIN_AVAILABLE and settings.qa_service_type in ["langchain", "auto"]:
+        factories.append((get_langchain_qa, "LangChain RAG Service"))
+    # フォールバック: オリジナルQAサービス
+    if ORIGINAL_QA_AVAILABLE:
+        factories.append((get_original_qa, "Original QA Service (fallback)"))
+    return factories
+
+
+# 依存関係と設定は起動後に変わらないため、優先順はインポート時に一度だけ決定する
+QA_SERVICE_FACTORIES = _build_qa_service_factories()
@@ -2,12 +2,16 @@
 検索API
 """
 
+import asyncio
+import time
+from datetime import datetime
 from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
-from ...services.search_service import SearchService
-from ...services.hybrid_search_service import HybridSearchService
+from ...services.search_service import SearchService, get_search_service
+from ...services.hybrid_search_service import get_hybrid_search_service
 
 router = APIRouter()
 
@@ -22,87 +26,167 @@ class SearchRequest(BaseModel):
     dense_weight: Optional[float] = None
 
 
-@router.post("/")
-async def search_articles(request: SearchRequest):
+# 一括検索で受け付ける最大クエリ数
+BULK_SEARCH_MAX_QUERIES = 50
+
+
+class BulkSearchRequest(BaseModel):
+    """一括検索リクエスト"""
+    queries: List[SearchRequest]
+
+
+def _iso(value: Any) -> Any:
+    """日時をISO 8601文字列に変換（文字列などはそのまま返す）"""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+@router.post("/", response_class=ORJSONResponse)
+async def search_articles(
+    request: SearchRequest,
+    search_service: SearchService = Depends(get_search_service)
+):
     """記事検索（セマンティック/ハイブリッド対応）"""
     try:
-        if request.search_type == "hybrid":
-            # ハイブリッド検索を実行
-            hybrid_service = HybridSearchService()
-            hybrid_results = await hybrid_service.hybrid_search(
-                query=request.query,
-                limit=request.limit,
-                sparse_weight=request.sparse_weight,
-                dense_weight=request.dense_weight
-            )
-            
-            # レスポンス形式に変換
-            search_results = []
-            for result in hybrid_results:
-                search_results.append({
-                    "article": {
-                        "number": result.article_id,
-                        "name": result.title,
-                        "content": result.content
-                    },
-                    "score": result.hybrid_score,
-                    "sparse_score": result.sparse_score,
-                    "dense_score": result.dense_score,
-                    "search_type": result.search_type,
-                    "matched_text": f"Hybrid search: {result.search_type}",
-                    "highlights": []
-                })
-        else:
-            # 従来のセマンティック検索
-            search_service = SearchService()
-            results = search_service.semantic_search(
-                query=request.query,
-                limit=request.limit,
-                filters=request.filters
-            )
-            
-            # レスポンス形式に変換
-            search_results = []
-            for result in results:
-                search_results.append({
-                    "article": {
-                        "number": result.article.number,
-                        "name": result.article.name,
-                        "full_name": result.article.full_name,
-                        "wip": result.article.wip,
-                        "created_at": result.article.created_at.isoformat() if hasattr(result.article.created_at, 'isoformat') else str(result.article.created_at),
-                        "updated_at": result.article.updated_at.isoformat() if hasattr(result.article.updated_at, 'isoformat') else str(result.article.updated_at),
-                        "url": result.article.url,
-                        "tags": result.article.tags,
-                        "category": result.article.category
-                    },
-                    "score": result.score,
-                    "matched_text": result.matched_text,
-                    "highlights": result.highlights
-                })
-        
-        return {
-            "results": search_results,
-            "total": len(search_results),
-            "query": request.query,
-            "search_type": request.search_type,
-            "query_time": 0.5  # 実際の処理時間を計測する場合は実装が必要
-        }
+        started_at = time.perf_counter()
+        # クエリ埋め込みはキャッシュ済みならそのまま再利用される
+        query_embedding = await asyncio.to_thread(
+            search_service.embedding_service.generate_query_embedding, request.query
+        )
+        embed_ms = (time.perf_counter() - started_at) * 1000
+        return ORJSONResponse(await _run_search(request, search_service, query_embedding, embed_ms))
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"検索エラー: {str(e)}")
 
 
-@router.get("/keyword/{query}")
-async def keyword_search(query: str, limit: int = 10):
+@router.post("/bulk", response_class=ORJSONResponse)
+async def bulk_search_articles(
+    request: BulkSearchRequest,
+    search_service: SearchService = Depends(get_search_service)
+):
+    """複数クエリの一括検索（クエリのベクトル化を1回のモデル呼び出しにまとめる）"""
+    if len(request.queries) > BULK_SEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"一度に検索できるクエリは{BULK_SEARCH_MAX_QUERIES}件までです"
+        )
+    
+    try:
+        started_at = time.perf_counter()
+        query_embeddings = await asyncio.to_thread(
+            search_service.embedding_service.generate_query_embeddings,
+            [q.query for q in request.queries]
+        )
+        responses = await asyncio.gather(*(
+            _run_search(q, search_service, embedding)
+            for q, embedding in zip(request.queries, query_embeddings)
+        ))
+        return ORJSONResponse({
+            "results": responses,
+            "total": len(responses),
+            "query_time": time.perf_counter() - started_at
+        })
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"一括検索エラー: {str(e)}")
+
+
+async def _run_search(
+    request: SearchRequest,
+    search_service: SearchService,
+    query_embedding: List[float],
+    embed_ms: float = 0.0
+) -> Dict[str, Any]:
+    """
+    1件の検索を実行してレスポンスを構築
+    
+    レスポンスはjsonable_encoderを通さずorjsonで直接シリアライズするため、値はJSON互換の型で構築する。
+    query_time（秒）はクエリのベクトル化（embed_ms）と検索（retrieve_ms）の合計
+    """
+    started_at = time.perf_counter()
+    if request.search_type == "hybrid":
+        # ハイブリッド検索を実行（初回はサービス初期化を伴うためスレッドで取得）
+        hybrid_service = await asyncio.to_thread(get_hybrid_search_service)
+        hybrid_results = await hybrid_service.hybrid_search(
+            query=request.query,
+            limit=request.limit,
+            sparse_weight=request.sparse_weight,
+            dense_weight=request.dense_weight,
+            query_embedding=query_embedding
+        )
+        
+        # レスポンス形式に変換
+        search_results = [
+            {
+                "article": {
+                    "number": result.article_id,
+                    "name": result.title,
+                    "content": result.content
+                },
+                "score": result.hybrid_score,
+                "sparse_score": result.sparse_score,
+                "dense_score": result.dense_score,
+                "search_type": result.search_type,
+                "matched_text": f"Hybrid search: {result.search_type}",
+                "highlights": []
+            }
+            for result in hybrid_results
+        ]
+    else:
+        # 従来のセマンティック検索
+        results = await search_service.asemantic_search(
+            query=request.query,
+            limit=request.limit,
+            filters=request.filters,
+            query_embedding=query_embedding
+        )
+        
+        # レスポンス形式に変換
+        search_results = [
+            {
+                "article": {
+                    "number": result.article.number,
+                    "name": result.article.name,
+                    "full_name": result.article.full_name,
+                    "wip": result.article.wip,
+                    "created_at": _iso(result.article.created_at),
+                    "updated_at": _iso(result.article.updated_at),
+                    "url": result.article.url,
+                    "tags": result.article.tags,
+                    "category": result.article.category
+                },
+                "score": result.score,
+                "matched_text": result.matched_text,
+                "highlights": result.highlights
+            }
+            for result in results
+        ]
+    
+    retrieve_ms = (time.perf_counter() - started_at) * 1000
+    return {
+        "results": search_results,
+        "total": len(search_results),
+        "query": request.query,
+        "search_type": request.search_type,
+        "query_time": (embed_ms + retrieve_ms) / 1000,
+        "embed_ms": embed_ms,
+        "retrieve_ms": retrieve_ms
+    }
+
+
+@router.get("/keyword/{query}", response_class=ORJSONResponse)
+async def keyword_search(
+    query: str,
+    limit: int = 10,
+    search_service: SearchService = Depends(get_search_service)
+):
     """キーワード検索"""
     try:
-        search_service = SearchService()
-        results = search_service.keyword_search(query=query, limit=limit)
+        started_at = time.perf_counter()
+        results = await asyncio.to_thread(search_service.keyword_search, query=query, limit=limit)
         
-        search_results = []
-        for result in results:
-            search_results.append({
+        search_results = [
+            {
                 "article": {
                     "number": result.article.number,
                     "name": result.article.name,
@@ -113,13 +197,16 @@ async def keyword_search(query: str, limit: int = 10):
                 },
                 "score": result.score,
                 "matched_text": result.matched_text
-            })
+            }
+            for result in results
+        ]
         
-        return {
+        return ORJSONResponse({
             "results": search_results,
             "total": len(search_results),
-            "query": query
-        }
+            "query": query,
+            "query_time": time.perf_counter() - started_at
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"キーワード検索エラー: {str(e)}")
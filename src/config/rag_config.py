@@ -3,19 +3,28 @@ RAGシステム設定管理
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
+
+
+@lru_cache(maxsize=8)
+def _parse_env_file(env_path: Path, mtime: float) -> Dict[str, str]:
+    """.envファイルを解析（パスと更新時刻が同じ間は再解析しない）"""
+    values = {}
+    with open(env_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                values[key.strip()] = value.strip()
+    return values
 
 
 def load_env_file(env_path: Path):
     """手動で.envファイルを読み込み"""
     if env_path.exists():
-        with open(env_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip()
+        os.environ.update(_parse_env_file(env_path, env_path.stat().st_mtime))
 
 
 class RAGConfig:
@@ -93,5 +102,14 @@ class RAGConfig:
         }
 
 
-# グローバル設定インスタンス
-config = RAGConfig()
+@lru_cache(maxsize=1)
+def get_config() -> RAGConfig:
+    """共有のRAGConfigを取得（初回利用時に一度だけ生成）"""
+    return RAGConfig()
+
+
+def __getattr__(name: str):
+    """後方互換: `from .rag_config import config` は初回アクセス時に生成する"""
+    if name == "config":
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
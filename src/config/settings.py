@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     # esa.io API設定
     esa_api_token: str = ""
     esa_team_name: str = ""
+    esa_http_cache_path: str = "./data/esa_http_cache.db"  # APIレスポンスのETagキャッシュ（未更新ページは304で本文を再取得しない。空で無効）
+    esa_http_cache_ttl: int = 604800  # ETagキャッシュの有効期間（秒）。期限切れのエントリは書き込み時に削除する
     
     # データベース設定
     database_url: str = "sqlite:///./data/research_rag.db"
@@ -21,6 +23,8 @@ class Settings(BaseSettings):
     # HuggingFace設定
     hf_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     hf_llm_model: str = "google/flan-t5-base"
+    hf_cache_dir: str = ""  # 埋め込みモデルのダウンロード先（空でHuggingFaceの既定のキャッシュ）
+    embedding_model_marker: str = "./data/models/active_embedding_model"  # 前回読み込めた埋め込みモデルの記録（空で無効）
     
     # QAサービス設定
     qa_service_type: str = "langchain"  # "original", "langchain", "auto"
@@ -29,21 +33,35 @@ class Settings(BaseSettings):
     # サービス自動選択設定
     auto_fallback: bool = True  # LangChainサービス失敗時にオリジナルにフォールバック
     performance_mode: str = "balanced"  # "fast", "balanced", "quality"
+    qa_worker_threads: int = 2  # QA推論を実行するスレッド数（GPU競合を抑えるため少なめ）
     
     # GPU設定
     enable_gpu: bool = True  # GPU利用を有効にする
     force_cpu: bool = False  # 強制的にCPUを使用する
     gpu_memory_fraction: float = 0.8  # 使用するGPUメモリの割合
+    cpu_num_threads: int = 0  # CPU推論のスレッド数（0で全コアを使用）
+    embedding_fp16: bool = True  # GPU推論時に埋め込みモデルをFP16に変換する
+    embedding_backend: str = "torch"  # CPU推論時のバックエンド（"torch" または "onnx"）
+    embedding_onnx_file: str = ""  # ONNXバックエンドで読み込むファイル（例: onnx/model_qint8_avx512_vnni.onnx）
+    embedding_batch_size: int = 64  # 記事一括ベクトル化時のmodel.encodeのバッチサイズ
+    embedding_cache_size: int = 4096  # テキスト単位の埋め込みLRUキャッシュ件数（0で無効）
     
     # アプリケーション設定
     app_host: str = "localhost"
     app_port: int = 8000
     log_level: str = "INFO"
     max_search_results: int = 50
+    hybrid_fusion_mode: str = "cc"  # ハイブリッド検索のスコア統合方式: "cc"（min-max正規化スコアの凸結合）, "rrf"（RRF + 重み付き）
+    query_embedding_cache_size: int = 1024  # クエリ埋め込みのLRUキャッシュ件数
+    query_embedding_cache_path: str = "./data/embedding_cache.db"  # クエリ埋め込みの永続キャッシュ（空で無効）
+    query_embedding_cache_ttl: int = 2592000  # 永続キャッシュの有効期間（秒）
+    query_warmup_file: str = ""  # 起動時に埋め込みを事前計算するクエリログ（1行1クエリ）
+    query_warmup_top_n: int = 100  # 事前計算する頻出クエリ数
     
     # レート制限設定
     esa_api_rate_limit: int = 300
     rate_limit_buffer: float = 0.8
+    esa_export_concurrency: int = 4  # 全記事エクスポート時に並行して取得するページ数
     
     # 認証設定
     basic_auth_username: str = "lab_member"
@@ -2,18 +2,41 @@
 データベース接続設定
 """
 
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from pathlib import Path
 
 from ..config.settings import settings
 
+IS_SQLITE = "sqlite" in settings.database_url
+
 # データベースエンジンの作成
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+if IS_SQLITE:
+    # 接続を使い回し、APIの同時リクエストで接続を取り合わないようにする
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=10,
+        max_overflow=20
+    )
+else:
+    engine = create_engine(settings.database_url)
+
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """接続ごとにSQLiteの性能設定を適用（WALで読み取りと書き込みを並行可能にする）"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+        cursor.execute("PRAGMA cache_size=-65536")  # 64MB
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
 
 # セッションファクトリの作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -34,6 +57,15 @@ def get_db():
         db.close()
 
 
+def dialect_insert(db, model):
+    """接続先DBの方言に応じたINSERT文（ON CONFLICTによるupsert用）を生成"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
 def init_db():
     """データベースの初期化"""
     # データディレクトリの作成
@@ -42,3 +74,12 @@ def init_db():
     
     # テーブルの作成
     Base.metadata.create_all(bind=engine)
+    
+    # 既存テーブルに後から追加したインデックスはcreate_allでは作られないため個別に作成
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    
+    # 全文検索用のFTS5テーブル
+    from .repositories.article_repository import init_fts
+    init_fts(engine)
@@ -2,18 +2,27 @@
 記事リポジトリ
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index, bindparam, or_, text
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
+from loguru import logger
 
-from ..connection import Base, get_db
+from ..connection import Base, dialect_insert
+from ..types import ORJSONType, EmbeddingType
 from ...models.esa_models import Article
 
 
 class ArticleORM(Base):
     """記事ORM"""
     __tablename__ = "articles"
+    __table_args__ = (
+        # get_recent_articles（ORDER BY updated_at DESC LIMIT n）をインデックスの逆順走査で完結させる
+        Index("ix_articles_updated_at", "updated_at"),
+        # カテゴリの前方一致（esaのカテゴリ階層の絞り込み）用
+        Index("ix_articles_category", "category"),
+    )
     
     number = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -24,26 +33,72 @@ class ArticleORM(Base):
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=False)
     url = Column(String)
-    tags = Column(JSON)  # JSONフィールドとしてタグを保存
+    tags = Column(ORJSONType)  # JSONテキストとしてタグを保存（orjson）
     category = Column(String)
     created_by_id = Column(Integer)
     updated_by_id = Column(Integer)
     processed_text = Column(Text)
-    embedding = Column(JSON)  # JSONフィールドとして埋め込みベクトルを保存
+    embedding = Column(EmbeddingType)  # float32バイナリとして埋め込みベクトルを保存
     summary = Column(Text)
 
 
+# 記事の全文検索用FTS5テーブル（articlesを外部コンテンツとし、トリガーで同期する）
+# 日本語は単語区切りが無いためtrigramトークナイザを使う（3文字未満の語はLIKEで検索）
+_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS fts_articles USING fts5(
+        name, full_name, processed_text,
+        content='articles', content_rowid='number', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS fts_articles_ai AFTER INSERT ON articles BEGIN
+        INSERT INTO fts_articles(rowid, name, full_name, processed_text)
+        VALUES (new.number, new.name, new.full_name, new.processed_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS fts_articles_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO fts_articles(fts_articles, rowid, name, full_name, processed_text)
+        VALUES ('delete', old.number, old.name, old.full_name, old.processed_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS fts_articles_au AFTER UPDATE ON articles BEGIN
+        INSERT INTO fts_articles(fts_articles, rowid, name, full_name, processed_text)
+        VALUES ('delete', old.number, old.name, old.full_name, old.processed_text);
+        INSERT INTO fts_articles(rowid, name, full_name, processed_text)
+        VALUES (new.number, new.name, new.full_name, new.processed_text);
+    END""",
+]
+
+# trigramトークナイザで検索できる最短の語長
+_FTS_MIN_QUERY_LENGTH = 3
+
+
+def init_fts(engine):
+    """FTS5テーブルとトリガーを作成（新規作成時は既存記事から索引を構築）"""
+    if engine.dialect.name != "sqlite":
+        return
+    
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fts_articles'"
+            )).first() is not None
+            for ddl in _FTS_DDL:
+                conn.execute(text(ddl))
+            if not exists:
+                conn.execute(text("INSERT INTO fts_articles(fts_articles) VALUES ('rebuild')"))
+                logger.info("Built full-text index for articles")
+    except OperationalError as e:
+        # FTS5・trigramに対応していないSQLiteではLIKE検索のみとなる
+        logger.warning(f"Full-text index not available: {e}")
+
+
 class ArticleRepository:
     """記事リポジトリ"""
     
-    def __init__(self, db: Session = None):
+    def __init__(self, db: Session):
+        # セッションは呼び出し側（リクエスト・バッチ単位）で管理し、リポジトリ間で共有する
         self.db = db
     
     def get_session(self) -> Session:
         """セッションを取得"""
-        if self.db:
-            return self.db
-        return next(get_db())
+        return self.db
     
     def create(self, article: Article) -> ArticleORM:
         """記事を作成"""
@@ -76,6 +131,18 @@ class ArticleRepository:
         db = self.get_session()
         return db.query(ArticleORM).filter(ArticleORM.number == number).first()
     
+    def get_texts_by_numbers(self, numbers: List[int]) -> Dict[int, str]:
+        """記事番号ごとの本文（前処理済みテキスト優先）を1回のIN句で取得（埋め込み等の大きな列は読まない）"""
+        if not numbers:
+            return {}
+        db = self.get_session()
+        rows = (
+            db.query(ArticleORM.number, ArticleORM.processed_text, ArticleORM.body_md)
+            .filter(ArticleORM.number.in_(numbers))
+            .all()
+        )
+        return {number: processed_text or body_md or "" for number, processed_text, body_md in rows}
+    
     def get_all(self, skip: int = 0, limit: Optional[int] = None) -> List[ArticleORM]:
         """全記事を取得"""
         db = self.get_session()
@@ -118,6 +185,32 @@ class ArticleRepository:
             db.refresh(db_article)
             return db_article
     
+    def upsert_many(self, rows: List[Dict[str, Any]], chunksize: int = 500) -> int:
+        """
+        記事を一括で作成または更新（INSERT ... ON CONFLICT DO UPDATE）
+        
+        行ごとのSELECTとコミットを行わず、chunksize件ずつ1文で書き込み最後に1回だけコミットする。
+        各行のキーは揃えること（行に含まれない列は既存の値を保持する）
+        """
+        if not rows:
+            return 0
+        
+        db = self.get_session()
+        try:
+            for start in range(0, len(rows), chunksize):
+                chunk = rows[start:start + chunksize]
+                stmt = dialect_insert(db, ArticleORM).values(chunk)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ArticleORM.number],
+                    set_={key: stmt.excluded[key] for key in chunk[0] if key != "number"}
+                )
+                db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+    
     def delete(self, number: int) -> bool:
         """記事を削除"""
         db = self.get_session()
@@ -128,21 +221,6 @@ class ArticleRepository:
             return True
         return False
     
-    def search_by_category(self, category: str) -> List[ArticleORM]:
-        """カテゴリで検索"""
-        db = self.get_session()
-        return db.query(ArticleORM).filter(ArticleORM.category.like(f"%{category}%")).all()
-    
-    def search_by_tags(self, tags: List[str]) -> List[ArticleORM]:
-        """タグで検索"""
-        db = self.get_session()
-        # JSONフィールドでの検索（SQLiteの場合）
-        articles = []
-        for article in db.query(ArticleORM).all():
-            if article.tags and any(tag in article.tags for tag in tags):
-                articles.append(article)
-        return articles
-    
     def get_recent_articles(self, limit: int = 10) -> List[ArticleORM]:
         """最近の記事を取得"""
         db = self.get_session()
@@ -154,22 +232,83 @@ class ArticleRepository:
         return db.query(ArticleORM).offset(offset).limit(limit).all()
     
     def search_by_category(self, category: str, limit: int = 10) -> List[ArticleORM]:
-        """カテゴリで検索（改良版）"""
+        """
+        カテゴリで検索
+        
+        まずインデックスが効く前方一致（カテゴリ階層の配下）で探し、
+        足りない分を部分一致で補う
+        """
         db = self.get_session()
-        return db.query(ArticleORM).filter(
-            ArticleORM.category.like(f"%{category}%")
+        articles = db.query(ArticleORM).filter(
+            ArticleORM.category >= category,
+            ArticleORM.category < category + "\U0010ffff"
         ).limit(limit).all()
+        
+        if len(articles) < limit:
+            found = [article.number for article in articles]
+            articles += db.query(ArticleORM).filter(
+                ArticleORM.category.like(f"%{category}%"),
+                ArticleORM.number.notin_(found)
+            ).limit(limit - len(articles)).all()
+        
+        return articles
     
     def search_by_tags(self, tags: List[str], limit: int = 10) -> List[ArticleORM]:
-        """タグで検索（改良版）"""
+        """タグで検索"""
+        if not tags:
+            return []
         db = self.get_session()
-        articles = []
-        for article in db.query(ArticleORM).all():
-            if article.tags and any(tag in article.tags for tag in tags):
-                articles.append(article)
-                if len(articles) >= limit:
-                    break
-        return articles
+        return db.query(ArticleORM).filter(self._has_any_tag(tags)).limit(limit).all()
+    
+    def keyword_search(self, query: str, limit: int = 10) -> List[Tuple[ArticleORM, float]]:
+        """
+        キーワードで全文検索
+        
+        FTS5のBM25スコアが高い順に返す。FTS5が使えない場合や短すぎる語はLIKEで検索する
+        
+        Returns:
+            (記事, スコア) のリスト（スコアは大きいほど関連が高い）
+        """
+        query = query.strip()
+        if not query:
+            return []
+        
+        db = self.get_session()
+        if len(query) >= _FTS_MIN_QUERY_LENGTH:
+            try:
+                # クエリ全体を1フレーズとして扱う（FTS5の演算子として解釈させない）
+                phrase = '"' + query.replace('"', '""') + '"'
+                rows = db.execute(text(
+                    "SELECT rowid, bm25(fts_articles) AS rank FROM fts_articles "
+                    "WHERE fts_articles MATCH :phrase ORDER BY rank LIMIT :limit"
+                ), {"phrase": phrase, "limit": limit}).all()
+                
+                articles = {
+                    article.number: article
+                    for article in db.query(ArticleORM).filter(
+                        ArticleORM.number.in_([row.rowid for row in rows])
+                    )
+                }
+                # bm25()は小さいほど関連が高いため符号を反転する
+                return [(articles[row.rowid], -row.rank) for row in rows if row.rowid in articles]
+            except OperationalError as e:
+                logger.warning(f"Full-text search unavailable, falling back to LIKE: {e}")
+                db.rollback()
+        
+        pattern = f"%{query}%"
+        articles = db.query(ArticleORM).filter(or_(
+            ArticleORM.name.like(pattern),
+            ArticleORM.full_name.like(pattern),
+            ArticleORM.processed_text.like(pattern)
+        )).limit(limit).all()
+        return [(article, 0.8) for article in articles]
+    
+    @staticmethod
+    def _has_any_tag(tags: List[str]):
+        """指定タグのいずれかを持つ記事の条件（SQLiteのJSON1でDB側で判定し、該当行のみ読み込む）"""
+        return text(
+            "EXISTS (SELECT 1 FROM json_each(articles.tags) WHERE json_each.value IN :tags)"
+        ).bindparams(bindparam("tags", value=list(tags), expanding=True))
     
     def count_articles(self) -> int:
         """記事数をカウント"""
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, DateTime
 from datetime import datetime
 
-from ..connection import Base, get_db
+from ..connection import Base, dialect_insert
 from ...models.esa_models import EsaMember
 
 
@@ -27,14 +27,13 @@ class MemberORM(Base):
 class MemberRepository:
     """メンバーリポジトリ"""
     
-    def __init__(self, db: Session = None):
+    def __init__(self, db: Session):
+        # セッションは呼び出し側（リクエスト・バッチ単位）で管理し、リポジトリ間で共有する
         self.db = db
     
     def get_session(self) -> Session:
         """セッションを取得"""
-        if self.db:
-            return self.db
-        return next(get_db())
+        return self.db
     
     def create(self, member: EsaMember) -> MemberORM:
         """メンバーを作成"""
@@ -126,6 +125,33 @@ class MemberRepository:
                     # 再試行でも失敗の場合は例外を再発生
                     raise e
     
+    def upsert_many(self, rows: List[Dict[str, Any]], chunksize: int = 500) -> int:
+        """
+        メンバーを一括で作成または更新（screen_nameベース、INSERT ... ON CONFLICT DO UPDATE）
+        
+        各行のキーは揃えること（行に含まれない列は既存の値を保持する）
+        """
+        if not rows:
+            return 0
+        if any(not row.get("screen_name") for row in rows):
+            raise ValueError("screen_name is required for upsert operation")
+        
+        db = self.get_session()
+        try:
+            for start in range(0, len(rows), chunksize):
+                chunk = rows[start:start + chunksize]
+                stmt = dialect_insert(db, MemberORM).values(chunk)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[MemberORM.screen_name],
+                    set_={key: stmt.excluded[key] for key in chunk[0] if key != "screen_name"}
+                )
+                db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return len(rows)
+    
     def delete(self, member_id: int) -> bool:
         """メンバーを削除"""
         db = self.get_session()
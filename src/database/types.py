@@ -0,0 +1,44 @@
+"""
+カスタムカラム型
+"""
+
+import numpy as np
+import orjson
+from sqlalchemy.types import TypeDecorator, Text, LargeBinary
+
+
+class ORJSONType(TypeDecorator):
+    """orjsonでシリアライズするJSONカラム（既存のJSONテキストと互換）"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return orjson.dumps(value).decode("utf-8")
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return orjson.loads(value)
+
+
+class EmbeddingType(TypeDecorator):
+    """埋め込みベクトルをfloat32のバイナリとして保存するカラム"""
+    impl = LargeBinary
+    cache_ok = True
+
+    dtype = np.float32
+
+    def process_bind_param(self, value, dialect):
+        if value is None or len(value) == 0:
+            return None
+        return np.asarray(value, dtype=self.dtype).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # 旧形式（JSONテキスト）で保存された行
+            return np.asarray(orjson.loads(value), dtype=self.dtype)
+        return np.frombuffer(value, dtype=self.dtype)
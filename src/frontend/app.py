@@ -4,14 +4,23 @@ Streamlit メインアプリケーション
 
 import streamlit as st
 import requests
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
-import json
+from typing import Callable, Dict, Optional
+import orjson
+import os
+import pandas as pd
 import sys
 from pathlib import Path
 
-# プロジェクトルートをPythonパスに追加
-project_root = Path(__file__).parent.parent.parent
-sys.path.insert(0, str(project_root))
+# プロジェクトルートをPythonパスに追加（スクリプトは再実行のたびに実行されるため重複追加しない）
+project_root = str(Path(__file__).resolve().parent.parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
 from src.config.settings import settings
 
@@ -22,46 +31,125 @@ st.set_page_config(
     layout="wide"
 )
 
-# API基本URL（環境変数から動的に設定）
-import os
-api_port = os.getenv("API_PORT", "8000")  # rag_manager.pyから環境変数で渡される
-API_BASE_URL = f"http://localhost:{api_port}/api"
 
-# デバッグ用：実際のAPI URLを表示
-print(f"🔗 Frontend connecting to API: {API_BASE_URL}")
+# Streamlitはスクリプトを毎回先頭から実行するため、プロセスで一度だけ行う処理はcache_resourceで保持する
+# （lru_cacheでは再実行のたびに関数が定義し直されキャッシュが効かない）
+@st.cache_resource
+def get_api_base_url() -> str:
+    """API基本URL（環境変数から動的に設定）"""
+    api_port = os.getenv("API_PORT", "8000")  # rag_manager.pyから環境変数で渡される
+    api_base_url = f"http://localhost:{api_port}/api"
+    
+    # デバッグ用：実際のAPI URLを表示（プロセスごとに一度だけ）
+    print(f"🔗 Frontend connecting to API: {api_base_url}")
+    return api_base_url
+
+
+API_BASE_URL = get_api_base_url()
 
 # 認証情報
 AUTH = (settings.basic_auth_username, settings.basic_auth_password)
 
 
+@st.cache_resource
+def get_session() -> requests.Session:
+    """API呼び出し用の共有セッション（再実行のたびに接続を張り直さないようKeep-Aliveで再利用）"""
+    session = requests.Session()
+    session.auth = AUTH
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def post_json(url: str, payload, **kwargs) -> requests.Response:
+    """JSONボディをorjsonでシリアライズしてPOST（エンコード済みのbytesはそのまま送る）"""
+    return get_session().post(
+        url,
+        data=payload if isinstance(payload, bytes) else orjson.dumps(payload),
+        headers={"Content-Type": "application/json"},
+        **kwargs
+    )
+
+
+# QAリクエストは質問文以外が固定のため、質問文だけをエンコードしてテンプレートに埋め込む
+_QA_PAYLOAD_TEMPLATE = b'{"question":%s,"context_limit":%d,"use_hybrid_search":%s}'
+
+
+def build_qa_payload(question: str, context_limit: int, use_hybrid_search: bool = True) -> bytes:
+    """QAリクエストのJSONボディを生成"""
+    return _QA_PAYLOAD_TEMPLATE % (
+        orjson.dumps(question), context_limit, b"true" if use_hybrid_search else b"false"
+    )
+
+
+def parse_json(response: requests.Response):
+    """レスポンスボディをorjsonでパース"""
+    return orjson.loads(response.content)
+
+
+@st.cache_resource
+def get_pool() -> ThreadPoolExecutor:
+    """API呼び出しを画面描画と並行して行うためのスレッドプール（Streamlitの描画はメインスレッドで行う）"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="api-call")
+
+
+def submit_with_ctx(func: Callable, *args) -> Future:
+    """
+    現在のスクリプト実行コンテキストを引き継いでプールで実行
+    
+    st.cache_dataなどStreamlitの機能を使う関数をワーカースレッドから呼ぶと
+    「missing ScriptRunContext」の警告が出るため、実行前にコンテキストを付与する
+    """
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    
+    return get_pool().submit(run)
+
+
+# 変化の少ない情報は再実行のたびに取得しないようキャッシュする（失敗時は例外となりキャッシュされない）
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_status() -> dict:
+    """サーバー状態を取得"""
+    response = get_session().get(f"{API_BASE_URL}/../", timeout=5)
+    response.raise_for_status()
+    return parse_json(response)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_recent_articles() -> dict:
+    """最近の記事を取得"""
+    response = get_session().get(f"{API_BASE_URL}/articles/recent/")
+    response.raise_for_status()
+    return parse_json(response)
+
+
 def main():
     """メインアプリケーション"""
     st.title("🔍 研究室 esa.io RAGシステム")
     st.markdown("---")
     
     # サイドバーでページ選択
-    page = st.sidebar.selectbox(
-        "ページを選択",
-        ["🔍 検索", "💬 質問応答", "� 進捗表示QA", "�📊 統計情報", "⚙️ 管理"]
-    )
-    
-    if page == "🔍 検索":
-        search_page()
-    elif page == "💬 質問応答":
-        qa_page()
-    elif page == "🚀 進捗表示QA":
-        progress_qa_page()
-        qa_page()
-    elif page == "📊 統計情報":
-        analytics_page()
-    elif page == "⚙️ 管理":
-        admin_page()
+    page = st.sidebar.selectbox("ページを選択", list(PAGES))
+    PAGES[page]()
 
 
 def search_page():
     """検索ページ"""
     st.header("🔍 記事検索")
-    
+    search_form()
+
+
+@st.fragment
+def search_form():
+    """検索条件の入力と結果表示（入力操作ではこの部分だけを再実行する）"""
     # 検索クエリ入力
     query = st.text_input("検索キーワードを入力してください", placeholder="例: 機械学習")
     
@@ -76,99 +164,151 @@ def search_page():
         wip_filter = st.selectbox("WIP記事", ["すべて", "WIPのみ", "WIP以外"])
     
     # 検索実行
+    search_key = (query, search_type, limit, category_filter, wip_filter)
     if st.button("🔍 検索実行") and query:
+        st.session_state.pop("_search_last", None)
         with st.spinner("検索中..."):
             try:
                 if search_type == "セマンティック検索":
-                    response = requests.post(
-                        f"{API_BASE_URL}/search/",
-                        json={
-                            "query": query,
-                            "limit": limit,
-                            "filters": {
-                                "category": category_filter if category_filter else None,
-                                "wip": None if wip_filter == "すべて" else wip_filter == "WIPのみ"
-                            }
-                        },
-                        auth=AUTH
+                    data = run_semantic_search(
+                        query,
+                        limit,
+                        category_filter if category_filter else None,
+                        None if wip_filter == "すべて" else wip_filter == "WIPのみ"
                     )
                 else:
-                    response = requests.get(
-                        f"{API_BASE_URL}/search/keyword/{query}",
-                        params={"limit": limit},
-                        auth=AUTH
-                    )
+                    data = run_keyword_search(query, limit)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    display_search_results(data["results"])
-                else:
-                    st.error(f"検索エラー: {response.status_code}")
+                display_search_results(data["results"])
+                st.session_state["_search_last"] = {"key": search_key, "results": data["results"]}
                     
+            except requests.exceptions.HTTPError as e:
+                st.error(f"検索エラー: {e.response.status_code}")
             except Exception as e:
                 st.error(f"検索中にエラーが発生しました: {str(e)}")
+    else:
+        # 入力が変わっていなければ前回の結果を再表示（無関係な再実行ではAPIを呼ばない）
+        last = st.session_state.get("_search_last")
+        if last and last["key"] == search_key:
+            display_search_results(last["results"])
+
+
+# 同じ条件での再検索や無関係なウィジェット操作による再実行では、APIを呼ばずにキャッシュから返す
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def run_semantic_search(query: str, limit: int, category: Optional[str], wip: Optional[bool]) -> dict:
+    """セマンティック検索を実行"""
+    response = post_json(
+        f"{API_BASE_URL}/search/",
+        {
+            "query": query,
+            "limit": limit,
+            "filters": {
+                "category": category,
+                "wip": wip
+            }
+        }
+    )
+    response.raise_for_status()
+    return _prepare_search_response(parse_json(response))
+
+
+@st.cache_data(ttl=300, max_entries=128, show_spinner=False)
+def run_keyword_search(query: str, limit: int) -> dict:
+    """キーワード検索を実行"""
+    response = get_session().get(
+        f"{API_BASE_URL}/search/keyword/{query}",
+        params={"limit": limit}
+    )
+    response.raise_for_status()
+    return _prepare_search_response(parse_json(response))
+
+
+def _prepare_search_response(data: dict) -> dict:
+    """検索レスポンスの各記事に表示用の文字列を付与（結果と一緒にキャッシュされる）"""
+    prepare_articles([result["article"] for result in data["results"]])
+    return data
+
+
+def prepare_articles(articles: list) -> list:
+    """表示用の文字列（タグのMarkdown・日付）を取得時に一度だけ組み立てて各記事に付与"""
+    for article in articles:
+        article["tags_md"] = " ".join(f"`{tag}`" for tag in article.get("tags") or [])
+        article["created_date"] = (article.get("created_at") or "")[:10]
+        article["updated_date"] = (article.get("updated_at") or "")[:10]
+    return articles
 
 
 def display_search_results(results):
-    """検索結果を表示"""
+    """検索結果を表示（一覧は1つの表にまとめ、選択した記事の詳細のみ描画する）"""
     if not results:
         st.info("検索結果が見つかりませんでした。")
         return
     
     st.success(f"🎯 {len(results)}件の記事が見つかりました")
     
-    for i, result in enumerate(results):
-        article = result["article"]
+    table = pd.DataFrame([
+        {
+            "記事": result["article"]["name"],
+            "スコア": result["score"],
+            "カテゴリ": result["article"]["category"],
+            "更新日": result["article"]["updated_date"],
+            "WIP": bool(result["article"].get("wip"))
+        }
+        for result in results
+    ])
+    event = st.dataframe(
+        table,
+        on_select="rerun",
+        selection_mode="single-row",
+        hide_index=True,
+        use_container_width=True,
+        column_config={"スコア": st.column_config.NumberColumn(format="%.3f")},
+        key="search_results_table"
+    )
+    
+    # 検索し直した直後は前回の選択行が残っている場合があるため範囲を確認する
+    selected = [row for row in event.selection.rows if row < len(results)]
+    if not selected:
+        st.caption("行を選択すると記事の詳細を表示します")
+        return
+    
+    result = results[selected[0]]
+    article = result["article"]
+    
+    st.markdown(f"### 📄 {article['name']} (スコア: {result['score']:.3f})")
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        st.markdown(f"**カテゴリ:** {article['category']}")
+        if article['tags_md']:
+            st.markdown(f"**タグ:** {article['tags_md']}")
+        if article['created_date']:
+            st.markdown(f"**作成日:** {article['created_date']}")
+            st.markdown(f"**更新日:** {article['updated_date']}")
         
-        with st.expander(f"📄 {article['name']} (スコア: {result['score']:.3f})"):
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.markdown(f"**カテゴリ:** {article['category']}")
-                if article['tags']:
-                    tags = " ".join([f"`{tag}`" for tag in article['tags']])
-                    st.markdown(f"**タグ:** {tags}")
-                st.markdown(f"**作成日:** {article['created_at'][:10]}")
-                st.markdown(f"**更新日:** {article['updated_at'][:10]}")
-                
-                if "matched_text" in result:
-                    st.markdown("**マッチした内容:**")
-                    st.text_area(
-                        "マッチした内容", 
-                        result["matched_text"], 
-                        height=100, 
-                        key=f"text_{i}",
-                        label_visibility="collapsed"
-                    )
-            
-            with col2:
-                if article['wip']:
-                    st.warning("🚧 WIP")
-                st.markdown(f"[📎 記事を開く]({article['url']})")
+        if "matched_text" in result:
+            st.markdown("**マッチした内容:**")
+            st.text_area(
+                "マッチした内容", 
+                result["matched_text"], 
+                height=100, 
+                key=f"text_{article['number']}",
+                label_visibility="collapsed"
+            )
+    
+    with col2:
+        if article.get('wip'):
+            st.warning("🚧 WIP")
+        st.markdown(f"[📎 記事を開く]({article['url']})")
 
 
 def qa_page():
     """質問応答ページ"""
     st.header("💬 質問応答")
     
-    # サーバー状態チェック
-    try:
-        status_response = requests.get(f"{API_BASE_URL}/../", auth=AUTH, timeout=5)
-        if status_response.status_code == 200:
-            status_data = status_response.json()
-            qa_status = status_data.get("qa_status", "unknown")
-            
-            if qa_status == "available":
-                st.success("🚀 フル機能QAサービス利用可能")
-            elif qa_status == "fallback":
-                st.warning("⚠️ フォールバックQAサービス利用中")
-                st.info("💡 完全な機能を利用するには依存関係をインストールしてください")
-            else:
-                st.error("❌ QAサービス利用不可")
-        else:
-            st.warning("⚠️ サーバー状態を確認できません")
-    except:
-        st.warning("⚠️ サーバー接続確認中...")
+    # サーバー状態チェック（応答を待つ間に残りの画面を描画し、結果は先頭の枠に表示する）
+    status_placeholder = st.empty()
+    status_future = submit_with_ctx(fetch_status)
     
     # システム情報の表示
     with st.expander("ℹ️ システム情報"):
@@ -187,6 +327,13 @@ def qa_page():
         st.markdown("- モデル分散配置（large モデル対応）")
         st.caption("💡 RTX 3060 (6GB) 以上のGPUで大幅な高速化が期待できます")
     
+    render_qa_status(status_placeholder, status_future)
+    qa_form()
+
+
+@st.fragment
+def qa_form():
+    """質問の入力と回答表示（入力操作ではこの部分だけを再実行する）"""
     # 質問入力
     question = st.text_area(
         "質問を入力してください",
@@ -203,45 +350,158 @@ def qa_page():
         st.caption("1. 関連記事を検索\n2. コンテキストを構築\n3. LLMで回答生成")
     
     # 質問実行
+    qa_key = (question, context_limit)
     if st.button("💬 質問する") and question:
-        with st.spinner("回答を生成中..."):
-            try:
-                response = requests.post(
+        st.session_state.pop("_qa_last", None)
+        try:
+            # 回答を逐次表示する（ストリーミング非対応のサーバーでは一括取得にフォールバック）
+            streamed = stream_qa_answer(question, context_limit)
+            if streamed is not None:
+                # 途中でエラーになった回答は再表示しない
+                if "error" not in streamed:
+                    st.session_state["_qa_last"] = {"key": qa_key, "streamed": True, "data": streamed}
+                return
+            
+            with st.spinner("回答を生成中..."):
+                response = post_json(
                     f"{API_BASE_URL}/qa/",
-                    json={
-                        "question": question,
-                        "context_limit": context_limit
-                    },
-                    auth=AUTH
+                    build_qa_payload(question, context_limit)
                 )
+            
+            if response.status_code == 200:
+                data = parse_json(response)
+                prepare_articles(data["sources"])
+                display_qa_result(data)
+                st.session_state["_qa_last"] = {"key": qa_key, "streamed": False, "data": data}
+            elif response.status_code == 404:
+                st.error("❌ QAエンドポイントが見つかりません")
+                st.info("💡 サーバーを再起動してください")
+                with st.expander("🔧 トラブルシューティング"):
+                    st.markdown("**考えられる原因:**")
+                    st.markdown("- QAサービスの依存関係が不足")
+                    st.markdown("- transformersライブラリ未インストール")
+                    st.markdown("- PyTorchライブラリ未インストール")
+                    st.markdown("\n**解決方法:**")
+                    st.code("uv add transformers torch", language="bash")
+            else:
+                st.error(f"質問応答エラー: {response.status_code}")
+                if response.status_code == 500:
+                    try:
+                        error_detail = parse_json(response).get("detail", "Unknown error")
+                        st.error(f"詳細: {error_detail}")
+                    except:
+                        st.error("サーバー内部エラーが発生しました")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    display_qa_result(data)
-                elif response.status_code == 404:
-                    st.error("❌ QAエンドポイントが見つかりません")
-                    st.info("💡 サーバーを再起動してください")
-                    with st.expander("🔧 トラブルシューティング"):
-                        st.markdown("**考えられる原因:**")
-                        st.markdown("- QAサービスの依存関係が不足")
-                        st.markdown("- transformersライブラリ未インストール")
-                        st.markdown("- PyTorchライブラリ未インストール")
-                        st.markdown("\n**解決方法:**")
-                        st.code("uv add transformers torch", language="bash")
-                else:
-                    st.error(f"質問応答エラー: {response.status_code}")
-                    if response.status_code == 500:
-                        try:
-                            error_detail = response.json().get("detail", "Unknown error")
-                            st.error(f"詳細: {error_detail}")
-                        except:
-                            st.error("サーバー内部エラーが発生しました")
-                    
-            except requests.exceptions.ConnectionError:
-                st.error("❌ APIサーバーに接続できません")
-                st.info(f"💡 {API_BASE_URL} でサーバーが起動していることを確認してください")
-            except Exception as e:
-                st.error(f"質問応答中にエラーが発生しました: {str(e)}")
+        except requests.exceptions.ConnectionError:
+            st.error("❌ APIサーバーに接続できません")
+            st.info(f"💡 {API_BASE_URL} でサーバーが起動していることを確認してください")
+        except Exception as e:
+            st.error(f"質問応答中にエラーが発生しました: {str(e)}")
+    else:
+        # 入力が変わっていなければ前回の回答を再表示（無関係な再実行ではAPIを呼ばない）
+        last = st.session_state.get("_qa_last")
+        if last and last["key"] == qa_key:
+            if last["streamed"]:
+                display_streamed_answer(last["data"])
+            else:
+                display_qa_result(last["data"])
+
+
+def stream_qa_answer(question: str, context_limit: int, use_hybrid_search: bool = True) -> Optional[dict]:
+    """
+    回答をSSEで受け取りながら逐次表示
+    
+    Returns:
+        表示した回答とサービス名（サーバーが非対応、または回答前にエラーになった場合は何も表示せずNone。
+        回答の途中でエラーになった場合は"error"を含む）
+    """
+    response = post_json(
+        f"{API_BASE_URL}/qa/stream",
+        build_qa_payload(question, context_limit, use_hybrid_search),
+        stream=True
+    )
+    with response:
+        if response.status_code != 200 or not response.headers.get("content-type", "").startswith("text/event-stream"):
+            return None
+        
+        # text/event-streamは文字コード指定が無いとISO-8859-1として扱われるため明示する
+        response.encoding = "utf-8"
+        
+        # 最初のテキスト片より前にエラーになった場合は一括取得へ切り替えるため、表示枠ごと消せるようにする
+        area = st.empty()
+        with area.container():
+            st.markdown("## 🤖 回答")
+            placeholder = st.empty()
+        placeholder.caption("回答を生成中...")
+        data = {"answer": "", "service_used": "Unknown", "sources": [], "confidence": None}
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = orjson.loads(line[5:])
+            if "delta" in event:
+                data["answer"] += event["delta"]
+                placeholder.markdown(data["answer"])
+            elif event.get("done"):
+                data["service_used"] = event.get("service_used", data["service_used"])
+                data["sources"] = prepare_articles(event.get("sources") or [])
+                data["confidence"] = event.get("confidence")
+                display_streamed_details(data)
+            elif "error" in event:
+                if not data["answer"]:
+                    area.empty()
+                    return None
+                st.error(f"質問応答中にエラーが発生しました: {event['error']}")
+                data["error"] = event["error"]
+                break
+    
+    return data
+
+
+def display_streamed_answer(data):
+    """ストリーミングで受け取った回答を再表示"""
+    st.markdown("## 🤖 回答")
+    st.markdown(data["answer"])
+    display_streamed_details(data)
+
+
+def display_streamed_details(data):
+    """ストリーミング回答の完了後に届くサービス名・信頼度・参考記事を表示"""
+    st.caption(f"サービス: {data['service_used']}")
+    if data.get("confidence") is not None:
+        st.markdown(f"**信頼度:** {data['confidence']:.1%}")
+    if data.get("sources"):
+        display_qa_sources(data["sources"])
+
+
+def display_qa_sources(sources):
+    """参考記事を表示"""
+    st.markdown("## 📚 参考記事")
+    for source in sources:
+        with st.expander(f"📄 {source['name']}"):
+            st.markdown(f"**カテゴリ:** {source['category']}")
+            if source['tags_md']:
+                st.markdown(f"**タグ:** {source['tags_md']}")
+            st.markdown(f"[📎 記事を開く]({source['url']})")
+
+
+def render_qa_status(placeholder, status_future: Future):
+    """サーバー状態チェックの結果を表示"""
+    with placeholder.container():
+        try:
+            status_data = status_future.result()
+            qa_status = status_data.get("qa_status", "unknown")
+            
+            if qa_status == "available":
+                st.success("🚀 フル機能QAサービス利用可能")
+            elif qa_status == "fallback":
+                st.warning("⚠️ フォールバックQAサービス利用中")
+                st.info("💡 完全な機能を利用するには依存関係をインストールしてください")
+            else:
+                st.error("❌ QAサービス利用不可")
+        except requests.exceptions.HTTPError:
+            st.warning("⚠️ サーバー状態を確認できません")
+        except:
+            st.warning("⚠️ サーバー接続確認中...")
 
 
 def display_qa_result(data):
@@ -306,14 +566,7 @@ def display_qa_result(data):
     
     # 参考記事を表示
     if data["sources"]:
-        st.markdown("## 📚 参考記事")
-        for source in data["sources"]:
-            with st.expander(f"📄 {source['name']}"):
-                st.markdown(f"**カテゴリ:** {source['category']}")
-                if source['tags']:
-                    tags = " ".join([f"`{tag}`" for tag in source['tags']])
-                    st.markdown(f"**タグ:** {tags}")
-                st.markdown(f"[📎 記事を開く]({source['url']})")
+        display_qa_sources(data["sources"])
     elif "error" in data:
         st.info("💡 フォールバックモードでは記事検索機能は利用できません")
 
@@ -324,29 +577,26 @@ def analytics_page():
     
     try:
         # 最近の記事を取得
-        response = requests.get(f"{API_BASE_URL}/articles/recent/", auth=AUTH)
+        data = fetch_recent_articles()
+        articles = data["articles"]
         
-        if response.status_code == 200:
-            data = response.json()
-            articles = data["articles"]
-            
-            st.metric("📄 最近の記事数", len(articles))
-            
-            # 最近の記事一覧
-            st.subheader("📅 最近の記事")
-            for article in articles[:10]:
-                with st.expander(f"📄 {article['name']}"):
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown(f"**カテゴリ:** {article['category']}")
-                        st.markdown(f"**作成日:** {article['created_at'][:10]}")
-                    with col2:
-                        st.markdown(f"**更新日:** {article['updated_at'][:10]}")
-                        if article['wip']:
-                            st.warning("🚧 WIP")
-        else:
-            st.error("統計情報の取得に失敗しました")
+        st.metric("📄 最近の記事数", len(articles))
+        
+        # 最近の記事一覧
+        st.subheader("📅 最近の記事")
+        for article in articles[:10]:
+            with st.expander(f"📄 {article['name']}"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown(f"**カテゴリ:** {article['category']}")
+                    st.markdown(f"**作成日:** {article['created_at'][:10]}")
+                with col2:
+                    st.markdown(f"**更新日:** {article['updated_at'][:10]}")
+                    if article['wip']:
+                        st.warning("🚧 WIP")
             
+    except requests.exceptions.HTTPError:
+        st.error("統計情報の取得に失敗しました")
     except Exception as e:
         st.error(f"統計情報の取得中にエラーが発生しました: {str(e)}")
 
@@ -364,9 +614,10 @@ def admin_page():
         if st.button("🔄 フルエクスポート開始"):
             with st.spinner("エクスポートを開始中..."):
                 try:
-                    response = requests.post(f"{API_BASE_URL}/export/", auth=AUTH)
+                    response = get_session().post(f"{API_BASE_URL}/export/")
                     if response.status_code == 200:
                         st.success("エクスポートを開始しました")
+                        st.session_state["export_running"] = True
                     else:
                         st.error("エクスポート開始に失敗しました")
                 except Exception as e:
@@ -374,15 +625,11 @@ def admin_page():
     
     with col2:
         if st.button("📊 エクスポート状況確認"):
-            try:
-                response = requests.get(f"{API_BASE_URL}/export/status", auth=AUTH)
-                if response.status_code == 200:
-                    status = response.json()
-                    st.json(status)
-                else:
-                    st.error("状況確認に失敗しました")
-            except Exception as e:
-                st.error(f"エラー: {str(e)}")
+            render_export_status()
+    
+    # 実行中はこの部分だけを定期的に再実行して状況を更新する（ページ全体は再実行しない）
+    if st.session_state.get("export_running"):
+        st.fragment(run_every=2)(poll_export_status)()
     
     # 差分同期
     st.subheader("🔄 差分同期")
@@ -391,13 +638,12 @@ def admin_page():
     if st.button("🔄 差分同期実行"):
         with st.spinner("差分同期中..."):
             try:
-                response = requests.post(
+                response = get_session().post(
                     f"{API_BASE_URL}/export/sync",
-                    params={"hours": hours},
-                    auth=AUTH
+                    params={"hours": hours}
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = parse_json(response)
                     st.success(data["message"])
                 else:
                     st.error("差分同期に失敗しました")
@@ -411,38 +657,75 @@ def admin_page():
     if uploaded_file and st.button("📤 アップロード"):
         with st.spinner("アップロード中..."):
             try:
-                files = {"file": uploaded_file.getvalue()}
-                response = requests.post(
+                # バイト列にコピーせずファイルオブジェクトのまま渡す（ファイル名はサーバー側の拡張子チェックに使われる）
+                files = {"file": (uploaded_file.name, uploaded_file, "text/csv")}
+                response = get_session().post(
                     f"{API_BASE_URL}/export/upload/csv",
-                    files=files,
-                    auth=AUTH
+                    files=files
                 )
                 if response.status_code == 200:
-                    data = response.json()
+                    data = parse_json(response)
                     st.success(data["message"])
                 else:
                     st.error("アップロードに失敗しました")
             except Exception as e:
                 st.error(f"エラー: {str(e)}")
+    
+    # キャッシュ
+    st.subheader("🧹 キャッシュ")
+    if st.button("🧹 検索キャッシュをクリア"):
+        run_semantic_search.clear()
+        run_keyword_search.clear()
+        fetch_recent_articles.clear()
+        st.success("検索キャッシュをクリアしました")
+
+
+@st.cache_resource
+def load_progress_qa_html() -> str:
+    """進捗QAのHTMLテンプレートを読み込む（再実行のたびにモジュールを実行しないようキャッシュ）"""
+    # テンプレートファイルを直接読み込み
+    template_path = Path(__file__).parent / "templates" / "progress_qa.py"
+    if not template_path.exists():
+        # フォールバック: 基本的なHTMLを定義
+        return """
+        <h2>進捗表示機能付きQA</h2>
+        <p>テンプレートファイルが見つかりません。通常のQAページをご利用ください。</p>
+        """
+    
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("progress_qa", template_path)
+    progress_qa_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(progress_qa_module)
+    return progress_qa_module.PROGRESS_QA_HTML
+
+
+def render_export_status() -> Optional[dict]:
+    """エクスポート状況を取得して表示"""
+    try:
+        response = get_session().get(f"{API_BASE_URL}/export/status")
+        if response.status_code == 200:
+            status = parse_json(response)
+            st.json(status)
+            return status
+        st.error("状況確認に失敗しました")
+    except Exception as e:
+        st.error(f"エラー: {str(e)}")
+    return None
+
+
+def poll_export_status():
+    """実行中のエクスポート状況を表示（終了したらページ全体を再実行して自動更新を止める）"""
+    st.caption("🔄 エクスポート状況を自動更新中...")
+    status = render_export_status()
+    if status is not None and status.get("status") in ("completed", "error"):
+        st.session_state["export_running"] = False
+        st.rerun()
 
 
 def progress_qa_page():
     """進捗表示機能付き質問応答ページ"""
     try:
-        # テンプレートファイルを直接読み込み
-        template_path = Path(__file__).parent / "templates" / "progress_qa.py"
-        if template_path.exists():
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("progress_qa", template_path)
-            progress_qa_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(progress_qa_module)
-            PROGRESS_QA_HTML = progress_qa_module.PROGRESS_QA_HTML
-        else:
-            # フォールバック: 基本的なHTMLを定義
-            PROGRESS_QA_HTML = """
-            <h2>進捗表示機能付きQA</h2>
-            <p>テンプレートファイルが見つかりません。通常のQAページをご利用ください。</p>
-            """
+        PROGRESS_QA_HTML = load_progress_qa_html()
     except Exception as e:
         st.error(f"進捗QAテンプレートの読み込みエラー: {e}")
         PROGRESS_QA_HTML = """
@@ -463,6 +746,9 @@ def progress_qa_page():
     - 📱 レスポンシブデザイン
     """)
     
+    # APIサーバーから配信される同じページ（ブラウザキャッシュが効き、API呼び出しも同一オリジンになる）
+    st.markdown(f"[🔗 別タブで開く]({API_BASE_URL}/progress/qa-page)")
+    
     # HTMLインターフェースを表示
     try:
         st.components.v1.html(PROGRESS_QA_HTML, height=800, scrolling=True)
@@ -499,20 +785,17 @@ def progress_qa_page():
     
     if st.button("質問する", type="primary"):
         if question.strip():
-            with st.spinner("回答を生成中..."):
-                try:
-                    response = requests.post(
-                        f"{API_BASE_URL}/qa/",
-                        json={
-                            "question": question,
-                            "use_hybrid_search": use_hybrid,
-                            "context_limit": context_limit
-                        },
-                        auth=AUTH
-                    )
+            try:
+                # 回答を逐次表示する（ストリーミング非対応のサーバーでは一括取得にフォールバック）
+                if stream_qa_answer(question, context_limit, use_hybrid_search=use_hybrid) is None:
+                    with st.spinner("回答を生成中..."):
+                        response = post_json(
+                            f"{API_BASE_URL}/qa/",
+                            build_qa_payload(question, context_limit, use_hybrid)
+                        )
                     
                     if response.status_code == 200:
-                        result = response.json()
+                        result = parse_json(response)
                         
                         st.success("回答生成完了!")
                         
@@ -535,10 +818,20 @@ def progress_qa_page():
                     else:
                         st.error(f"エラー: {response.status_code}")
                         
-                except Exception as e:
-                    st.error(f"API呼び出しエラー: {e}")
+            except Exception as e:
+                st.error(f"API呼び出しエラー: {e}")
         else:
             st.warning("質問を入力してください")
 
+
+# サイドバーのページ名と描画関数の対応
+PAGES: Dict[str, Callable[[], None]] = {
+    "🔍 検索": search_page,
+    "💬 質問応答": qa_page,
+    "🚀 進捗表示QA": progress_qa_page,
+    "📊 統計情報": analytics_page,
+    "⚙️ 管理": admin_page,
+}
+
 if __name__ == "__main__":
     main()
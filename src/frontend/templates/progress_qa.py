@@ -2,6 +2,14 @@
 進捗表示機能付きの質問応答用HTMLテンプレート
 """
 
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 PROGRESS_QA_HTML = """
 <!DOCTYPE html>
 <html lang="ja">
@@ -290,7 +298,7 @@ PROGRESS_QA_HTML = """
                 currentEventSource.close();
             }
             
-            currentEventSource = new EventSource(`${API_BASE}/api/progress/stream/${taskId}`);
+            currentEventSource = new EventSource(`${API_BASE}/api/progress/progress/stream/${taskId}`);
             
             currentEventSource.onmessage = function(event) {
                 try {
@@ -301,6 +309,11 @@ PROGRESS_QA_HTML = """
                         return;
                     }
                     
+                    // サーバー側で配信が打ち切られた場合は再接続させない
+                    if (data.status === 'stream_timeout') {
+                        currentEventSource.close();
+                    }
+                    
                     if (data.error) {
                         showError(`エラー: ${data.error}`);
                         resetUI();
@@ -323,13 +336,33 @@ PROGRESS_QA_HTML = """
             };
             
             currentEventSource.onerror = function(event) {
+                // 一時的な切断はEventSourceが自動で再接続する（サーバーは再接続時に最新の進捗を送り直す）
+                if (currentEventSource && currentEventSource.readyState === EventSource.CONNECTING) {
+                    console.warn('EventSource reconnecting...', event);
+                    return;
+                }
                 console.error('EventSource failed:', event);
-                currentEventSource.close();
                 resetUI();
             };
         }
         
+        // 進捗のDOM更新は描画フレームごとに最新の1件だけ反映する（SSEが連続しても再レイアウトは1回）
+        let pendingProgress = null;
+        let progressFrameScheduled = false;
+        
         function updateProgress(data) {
+            pendingProgress = data;
+            if (progressFrameScheduled) {
+                return;
+            }
+            progressFrameScheduled = true;
+            requestAnimationFrame(() => {
+                progressFrameScheduled = false;
+                applyProgress(pendingProgress);
+            });
+        }
+        
+        function applyProgress(data) {
             const progressFill = document.getElementById('progressFill');
             const progressPercentage = document.getElementById('progressPercentage');
             const progressText = document.getElementById('progressText');
@@ -402,53 +435,67 @@ PROGRESS_QA_HTML = """
             }
         }
         
+        // 結果はDocumentFragment上で組み立て、textContentで設定する（エスケープ不要・挿入時の再レイアウトは1回）
+        function createElement(tag, className, text) {
+            const element = document.createElement(tag);
+            if (className) {
+                element.className = className;
+            }
+            if (text !== undefined) {
+                element.textContent = text;
+            }
+            return element;
+        }
+        
         function displayResult(result) {
             const resultSection = document.getElementById('resultSection');
+            const fragment = document.createDocumentFragment();
             
-            let html = `
-                <h3>回答</h3>
-                <div class="answer">
-                    <p><strong>質問:</strong> ${escapeHtml(result.question)}</p>
-                    <p><strong>回答:</strong></p>
-                    <div>${escapeHtml(result.answer).replace(/\\n/g, '<br>')}</div>
-                </div>
-            `;
+            fragment.appendChild(createElement('h3', null, '回答'));
+            const answer = createElement('div', 'answer');
+            const questionLine = createElement('p');
+            questionLine.append(createElement('strong', null, '質問:'), ` ${result.question}`);
+            const answerLabel = createElement('p');
+            answerLabel.appendChild(createElement('strong', null, '回答:'));
+            const answerBody = createElement('div', null, result.answer);
+            answerBody.style.whiteSpace = 'pre-wrap';  // 改行をそのまま表示
+            answer.append(questionLine, answerLabel, answerBody);
+            fragment.appendChild(answer);
             
             if (result.sources && result.sources.length > 0) {
-                html += `
-                    <h3>参考記事 (${result.sources.length}件)</h3>
-                    <div class="sources">
-                `;
+                fragment.appendChild(createElement('h3', null, `参考記事 (${result.sources.length}件)`));
+                const sources = createElement('div', 'sources');
                 
                 result.sources.forEach(source => {
-                    html += `
-                        <div class="source-item">
-                            <div class="source-title">${escapeHtml(source.name)}</div>
-                            <div class="source-meta">
-                                カテゴリ: ${escapeHtml(source.category || '未分類')}
-                                ${source.tags && source.tags.length > 0 ? 
-                                    ` | タグ: ${source.tags.map(tag => escapeHtml(tag)).join(', ')}` : ''}
-                            </div>
-                        </div>
-                    `;
+                    const item = createElement('div', 'source-item');
+                    let meta = `カテゴリ: ${source.category || '未分類'}`;
+                    if (source.tags && source.tags.length > 0) {
+                        meta += ` | タグ: ${source.tags.join(', ')}`;
+                    }
+                    item.append(
+                        createElement('div', 'source-title', source.name),
+                        createElement('div', 'source-meta', meta)
+                    );
+                    sources.appendChild(item);
                 });
                 
-                html += '</div>';
+                fragment.appendChild(sources);
             }
             
-            html += `
-                <div style="margin-top: 20px; font-size: 12px; color: #777;">
-                    信頼度: ${(result.confidence * 100).toFixed(1)}% | 
-                    使用サービス: ${escapeHtml(result.service_used)}
-                </div>
-            `;
+            const footer = createElement(
+                'div',
+                null,
+                `信頼度: ${(result.confidence * 100).toFixed(1)}% | 使用サービス: ${result.service_used}`
+            );
+            footer.style.cssText = 'margin-top: 20px; font-size: 12px; color: #777;';
+            fragment.appendChild(footer);
             
-            resultSection.innerHTML = html;
+            resultSection.replaceChildren(fragment);
         }
         
         function showError(message) {
             const resultSection = document.getElementById('resultSection');
-            resultSection.innerHTML = `<div class="error">${escapeHtml(message)}</div>`;
+            resultSection.replaceChildren(createElement('div', 'error', message));
         }
         
         function resetUI() {
@@ -468,12 +515,6 @@ PROGRESS_QA_HTML = """
             }
         }
         
-        function escapeHtml(text) {
-            const div = document.createElement('div');
-            div.textContent = text;
-            return div.innerHTML;
-        }
-        
         // Enterキーでの送信
         document.getElementById('questionInput').addEventListener('keydown', function(e) {
             if (e.key === 'Enter' && e.ctrlKey) {
@@ -484,3 +525,19 @@ PROGRESS_QA_HTML = """
 </body>
 </html>
 """
+
+# 配信時に毎回エンコードしないよう、インポート時にバイト列とETagを確定させておく
+PROGRESS_QA_HTML_BYTES = PROGRESS_QA_HTML.encode("utf-8")
+_PROGRESS_QA_HTML_DIGEST = hashlib.blake2b(PROGRESS_QA_HTML_BYTES, digest_size=8).hexdigest()
+PROGRESS_QA_HTML_ETAG = f'"{_PROGRESS_QA_HTML_DIGEST}"'
+
+# 圧縮済みの本文も一度だけ作っておき、Accept-Encodingに応じてそのまま返す（brotliは未インストールなら使わない）
+PROGRESS_QA_HTML_ENCODED = {"gzip": gzip.compress(PROGRESS_QA_HTML_BYTES, compresslevel=9, mtime=0)}
+if brotli is not None:
+    PROGRESS_QA_HTML_ENCODED["br"] = brotli.compress(PROGRESS_QA_HTML_BYTES, quality=11)
+
+# 強いETagは表現（content-coding）ごとに異なる必要があるため、圧縮形式ごとに別の値を付ける
+PROGRESS_QA_HTML_ENCODED_ETAGS = {
+    encoding: f'"{_PROGRESS_QA_HTML_DIGEST}-{"gz" if encoding == "gzip" else encoding}"'
+    for encoding in PROGRESS_QA_HTML_ENCODED
+}
@@ -1,13 +1,18 @@
 """
 esa.io データモデル（最適化版）
+
+大量の記事を保持するため、各データクラスは__slots__で定義してインスタンスごとの__dict__を持たない。
+処理後データを後から設定するArticle以外は不変（frozen）とする
 """
 
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List, Optional
 
+import numpy as np
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EsaMember:
     """esa.io メンバー情報"""
     id: int                   # メンバーID（主キー）
@@ -19,7 +24,7 @@ class EsaMember:
     joined_at: datetime       # 参加日時
 
 
-@dataclass
+@dataclass(slots=True)
 class Article:
     """記事データ"""
     # esa.io基本データ
@@ -39,11 +44,11 @@ class Article:
     
     # 処理後データ
     processed_text: str      # 前処理済みテキスト
-    embedding: Optional[List[float]] = None  # 埋め込みベクトル
+    embedding: Optional[np.ndarray] = None   # 埋め込みベクトル（float32。DBのEmbeddingType列と同じ形式）
     summary: Optional[str] = None            # 要約
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ArticleComment:
     """記事コメント"""
     id: int                   # コメントID
@@ -53,7 +58,7 @@ class ArticleComment:
     user_id: int             # 作成者ID（外部キー）
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ArticleStar:
     """記事スター"""
     id: int                   # スターID
@@ -4,15 +4,28 @@
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import List, NamedTuple
 from .esa_models import Article
 
 
-@dataclass
+class SourceRef(NamedTuple):
+    """根拠記事の参照情報（本文を含まないメタデータのみ）"""
+    name: str                 # 記事名
+    url: str                  # 記事URL
+    category: str             # カテゴリ
+    tags: List[str]           # タグリスト
+
+    @classmethod
+    def from_article(cls, article: Article) -> "SourceRef":
+        """記事から参照情報を作成"""
+        return cls(article.name, article.url, article.category, article.tags or [])
+
+
+@dataclass(slots=True, frozen=True)
 class QAResult:
     """質問応答結果"""
     question: str             # 質問
     answer: str               # 回答
-    source_articles: List[Article]  # 根拠記事
+    sources: List[SourceRef]  # 根拠記事の参照情報
     confidence: float         # 信頼度
     generated_at: datetime    # 生成日時
@@ -7,7 +7,7 @@ from typing import List, Optional, Dict, Any
 from .esa_models import Article
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SearchResult:
     """検索結果"""
     article: Article
@@ -16,7 +16,7 @@ class SearchResult:
     highlights: List[str]     # ハイライト箇所
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SearchParams:
     """検索パラメータ"""
     query: str
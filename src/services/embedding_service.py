@@ -2,13 +2,72 @@
 埋め込みベクトル生成サービス
 """
 
+import hashlib
+import os
 import numpy as np
 import re
-from typing import List, Dict, Any, Tuple
+import threading
+import torch
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Tuple, Union
 from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from ..config.settings import settings
+from ..utils.embedding_cache import PersistentEmbeddingCache
+
+# 前処理・チャンク分割は記事ごとに何度も呼ばれるため、正規表現はモジュール読み込み時にコンパイルしておく
+_SENTENCE_PATTERN = re.compile(r'[^。！？\.\!\?]+[。！？\.\!\?]*')
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r'[。！？\.\!\?]')
+_QUOTE_PATTERN = re.compile(r'[''"""]')
+_HYPHEN_PATTERN = re.compile(r'[‐－−‒–—―]')
+_URL_PATTERN = re.compile(r'https?://[^\s]+')
+
+
+@lru_cache(maxsize=8192)
+def _preprocess_text_enhanced(text: str) -> str:
+    """
+    強化されたテキスト前処理
+    
+    入力だけで結果が決まる純粋関数のため、再ベクトル化や再検索で同じ記事・クエリを
+    処理する際は正規表現の適用を省いてキャッシュから返す
+    """
+    if not text:
+        return ""
+    
+    # 基本的なクリーニング
+    text = text.replace('\n', ' ').replace('\r', ' ')
+    text = text.replace('　', ' ')  # 全角スペースを半角に
+    
+    # 複数の空白を単一の空白に統合
+    text = ' '.join(text.split())
+    
+    # 特殊文字の正規化（ただし重要な記号は保持）
+    text = _QUOTE_PATTERN.sub('"', text)  # クォート統一
+    text = _HYPHEN_PATTERN.sub('-', text)  # ハイフン統一
+    
+    # URL除去（ただし重要なキーワードは保持）
+    text = _URL_PATTERN.sub('[URL]', text)
+    
+    # 最大長制限を緩和（チャンクベースなので）
+    max_length = 450  # 以前の512から調整
+    if len(text) > max_length:
+        # 文の境界で切り詰め（文字列を連結し直さず、長さだけ数えて最後に1回join）
+        parts = []
+        running_length = 0
+        for sentence in _SENTENCE_BOUNDARY_PATTERN.split(text):
+            running_length += len(sentence) + 1
+            if running_length > max_length:
+                break
+            parts.append(sentence)
+        if parts:
+            text = "。".join(parts) + "。"
+        else:
+            text = text[:max_length]
+    
+    return text.strip()
 
 
 class EmbeddingService:
@@ -23,18 +82,34 @@ class EmbeddingService:
             "intfloat/multilingual-e5-base",  # 多言語対応・高性能
             "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # 多言語対応
         ]
+        # 検索クエリは繰り返されやすいため、埋め込みをLRUでキャッシュする
+        self._query_embedding_cached = lru_cache(maxsize=settings.query_embedding_cache_size)(
+            self._embed_query
+        )
+        # プロセス再起動後も使える2段目のキャッシュ（メモリのLRUに無いときに参照）
+        self.persistent_cache = self._open_persistent_cache()
+        # 記事の再登録などで同じテキストを再度ベクトル化しないよう、結果をfloat32で保持するLRU
+        # （検索・QAの各スレッドから呼ばれるためロックで保護する）
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
         self._load_model()
     
     def _load_model(self):
         """モデルの読み込み（フォールバック対応）"""
-        models_to_try = [self.model_name] + self.fallback_models
+        # 前回起動時に実際に読み込めたモデルを先頭にし、失敗が分かっている候補の試行を省く
+        models_to_try = list(dict.fromkeys(
+            [self._read_active_model_marker(), self.model_name] + self.fallback_models
+        ))
+        models_to_try = [name for name in models_to_try if name]
         
         for model_name in models_to_try:
             try:
                 logger.info(f"Loading embedding model: {model_name}")
-                self.model = SentenceTransformer(model_name)
+                self.model = self._create_model(model_name)
                 self.model_name = model_name  # 実際に使用されたモデル名を記録
                 logger.info(f"Embedding model loaded successfully: {model_name}")
+                self._configure_cpu_threads()
+                self._write_active_model_marker(model_name)
                 break
             except Exception as e:
                 logger.warning(f"Failed to load model {model_name}: {e}")
@@ -42,6 +117,96 @@ class EmbeddingService:
                     logger.error("All embedding models failed to load")
                     raise
     
+    @staticmethod
+    def _read_active_model_marker() -> str:
+        """
+        前回読み込めたモデル名を取得
+        
+        マーカーは設定上のモデル名と組で保存し、HF_MODEL_NAMEを変更した場合は使わない
+        """
+        if not settings.embedding_model_marker:
+            return ""
+        try:
+            configured, _, loaded = Path(settings.embedding_model_marker).read_text(encoding="utf-8").partition("\n")
+        except OSError:
+            return ""
+        return loaded.strip() if configured.strip() == settings.hf_model_name else ""
+    
+    @staticmethod
+    def _write_active_model_marker(model_name: str):
+        """読み込めたモデル名を次回起動用に保存（失敗しても読み込みには影響させない）"""
+        if not settings.embedding_model_marker:
+            return
+        try:
+            marker = Path(settings.embedding_model_marker)
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.write_text(f"{settings.hf_model_name}\n{model_name}\n", encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Failed to write embedding model marker: {e}")
+    
+    @staticmethod
+    def _select_device() -> str:
+        """GPU設定に従って推論デバイスを決定"""
+        if settings.force_cpu or not settings.enable_gpu:
+            return "cpu"
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    
+    def _create_model(self, model_name: str) -> SentenceTransformer:
+        """
+        推論デバイスに応じた精度・バックエンドでモデルを生成
+        
+        GPUではFP16に変換してメモリ転送量を半減させる。CPUでembedding_backend="onnx"の場合は
+        ONNX Runtime（int8量子化済みファイルを指定可能）で読み込み、失敗時はPyTorchに戻す。
+        どちらもSentenceTransformerのままなのでencode()の呼び出し方は変わらない
+        """
+        device = self._select_device()
+        
+        if device == "cpu" and settings.embedding_backend == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if settings.embedding_onnx_file:
+                model_kwargs["file_name"] = settings.embedding_onnx_file
+            try:
+                model = SentenceTransformer(
+                    model_name,
+                    device=device,
+                    backend="onnx",
+                    model_kwargs=model_kwargs,
+                    cache_folder=settings.hf_cache_dir or None
+                )
+                logger.info(f"Embedding backend: ONNX Runtime ({settings.embedding_onnx_file or 'model.onnx'})")
+                return model
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable, falling back to PyTorch: {e}")
+        
+        model = SentenceTransformer(model_name, device=device, cache_folder=settings.hf_cache_dir or None)
+        if device == "cuda" and settings.embedding_fp16:
+            model.half()
+            logger.info("Embedding model converted to FP16")
+        return model
+    
+    @staticmethod
+    def _open_persistent_cache():
+        """クエリ埋め込みの永続キャッシュを開く（無効・失敗時はNone）"""
+        if not settings.query_embedding_cache_path:
+            return None
+        try:
+            return PersistentEmbeddingCache(
+                settings.query_embedding_cache_path, ttl=settings.query_embedding_cache_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Persistent embedding cache disabled: {e}")
+            return None
+    
+    def _configure_cpu_threads(self):
+        """CPU推論時にMKL/oneDNNが全コアを使えるようスレッド数を設定"""
+        if self.model.device.type != "cpu":
+            return
+        
+        num_threads = settings.cpu_num_threads or os.cpu_count() or 1
+        if torch.get_num_threads() != num_threads:
+            torch.set_num_threads(num_threads)
+            logger.info(f"Embedding inference threads: {num_threads}")
+    
     def generate_embedding(self, text: str, use_chunking: bool = True) -> List[float]:
         """テキストの埋め込みベクトルを生成（改良版）"""
         if not self.model:
@@ -49,16 +214,118 @@ class EmbeddingService:
         
         try:
             if use_chunking and len(text) > 400:  # 長いテキストはチャンク分割
-                return self._generate_chunked_embedding(text)
+                key = self._embedding_cache_key(b"chunked", text)
+                cached = self._get_cached_embedding(key)
+                if cached is not None:
+                    return cached.tolist()
+                embedding = self._generate_chunked_embedding(text)
             else:
-                # 短いテキストは従来通り
+                # 短いテキストは従来通り（前処理後のテキストが同じなら同じ埋め込みになる）
                 processed_text = self._preprocess_text_enhanced(text)
-                embedding = self.model.encode(processed_text, normalize_embeddings=True)
-                return embedding.tolist()
+                key = self._embedding_cache_key(b"text", processed_text)
+                cached = self._get_cached_embedding(key)
+                if cached is not None:
+                    return cached.tolist()
+                embedding = self.model.encode(processed_text, normalize_embeddings=True).tolist()
+            
+            self._put_cached_embedding(key, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             return []
     
+    def _embedding_cache_key(self, kind: bytes, text: str) -> bytes:
+        """埋め込みキャッシュのキー（モデル名・生成方法・テキストのハッシュ）"""
+        digest = hashlib.blake2b(kind, digest_size=16)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+    
+    def _get_cached_embedding(self, key: bytes):
+        """キャッシュ済みの埋め込みを取得（無ければNone）"""
+        with self._embedding_cache_lock:
+            embedding = self._embedding_cache.get(key)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(key)
+            return embedding
+    
+    def _put_cached_embedding(self, key: bytes, embedding: List[float]):
+        """埋め込みをキャッシュに登録（生成に失敗した空の結果は登録しない）"""
+        if not embedding or settings.embedding_cache_size <= 0:
+            return
+        with self._embedding_cache_lock:
+            self._embedding_cache[key] = np.asarray(embedding, dtype=np.float32)
+            self._embedding_cache.move_to_end(key)
+            while len(self._embedding_cache) > settings.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+    
+    def generate_query_embedding(self, query: str) -> List[float]:
+        """検索クエリの埋め込みベクトルを生成（同一クエリはキャッシュから返す）"""
+        try:
+            return list(self._query_embedding_cached(query))
+        except ValueError:
+            return []
+    
+    def _embed_query(self, query: str) -> Tuple[float, ...]:
+        """クエリをベクトル化（失敗時は例外を送出し、キャッシュさせない）"""
+        if self.persistent_cache is not None:
+            cached = self.persistent_cache.get(self.model_name, query)
+            if cached is not None:
+                return tuple(cached)
+        
+        embedding = self.generate_embedding(query)
+        if not embedding:
+            raise ValueError(f"Failed to embed query: {query[:50]}")
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(self.model_name, query, embedding)
+        return tuple(embedding)
+    
+    def generate_query_embeddings(self, queries: List[str], batch_size: int = 64) -> List[List[float]]:
+        """複数の検索クエリを一括でベクトル化（短いクエリは1回のモデル呼び出しにまとめる）"""
+        if not self.model:
+            self._load_model()
+        
+        embeddings: List[Any] = [None] * len(queries)
+        if self.persistent_cache is not None:
+            cached = self.persistent_cache.get_many(self.model_name, queries)
+            embeddings = [cached.get(query) for query in queries]
+        
+        # generate_embeddingでチャンク分割されない長さのクエリのみ一括処理する
+        batch_indices = [
+            i for i, query in enumerate(queries) if embeddings[i] is None and len(query) <= 400
+        ]
+        if batch_indices:
+            try:
+                encoded = self.model.encode(
+                    [self._preprocess_text_enhanced(queries[i]) for i in batch_indices],
+                    batch_size=batch_size,
+                    normalize_embeddings=True
+                )
+                for i, embedding in zip(batch_indices, encoded):
+                    embeddings[i] = embedding.tolist()
+                if self.persistent_cache is not None:
+                    self.persistent_cache.put_many(
+                        self.model_name, [(queries[i], embeddings[i]) for i in batch_indices]
+                    )
+            except Exception as e:
+                logger.error(f"Failed to generate batch query embeddings: {e}")
+        
+        # 長いクエリや一括処理に失敗したものは個別に生成
+        return [
+            embedding if embedding is not None else self.generate_query_embedding(query)
+            for query, embedding in zip(queries, embeddings)
+        ]
+    
+    def warmup(self, queries: List[str]) -> int:
+        """頻出クエリの埋め込みを事前計算してキャッシュに載せる"""
+        warmed = 0
+        for query in queries:
+            if self.generate_query_embedding(query):
+                warmed += 1
+        logger.info(f"Warmed up {warmed} query embeddings")
+        return warmed
+    
     def _generate_chunked_embedding(self, text: str) -> List[float]:
         """長いテキストをチャンク分割してベクトル化（情報損失を最小化）"""
         try:
@@ -68,33 +335,32 @@ class EmbeddingService:
             if not chunks:
                 return []
             
-            # 各チャンクのベクトルを生成
-            chunk_embeddings = []
+            # 前処理後に空になったチャンクを除き、残りを1回のmodel.encodeでベクトル化
+            processed_chunks = []
+            chunk_weights = []  # 長さによる重み
             for chunk in chunks:
                 processed_chunk = self._preprocess_text_enhanced(chunk)
                 if processed_chunk:
-                    embedding = self.model.encode(processed_chunk, normalize_embeddings=True)
-                    chunk_embeddings.append(embedding)
-            
-            if not chunk_embeddings:
-                return []
-            
-            # チャンクベクトルを統合（重み付き平均）
-            chunk_weights = [len(chunk) for chunk in chunks]  # 長さによる重み
-            total_weight = sum(chunk_weights)
+                    processed_chunks.append(processed_chunk)
+                    chunk_weights.append(len(chunk))
             
-            if total_weight == 0:
+            if not processed_chunks:
                 return []
             
-            # 重み付き平均でベクトルを統合
-            final_embedding = np.zeros_like(chunk_embeddings[0])
-            for embedding, weight in zip(chunk_embeddings, chunk_weights):
-                final_embedding += embedding * (weight / total_weight)
+            chunk_embeddings = self.model.encode(
+                processed_chunks,
+                batch_size=settings.embedding_batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
             
-            # 正規化
+            # 重み付き和を1回の行列ベクトル積で求めて正規化（総重みでの除算は正規化で相殺される）
+            weights = np.asarray(chunk_weights, dtype=np.float32)
+            final_embedding = weights @ chunk_embeddings.astype(np.float32, copy=False)
             norm = np.linalg.norm(final_embedding)
             if norm > 0:
-                final_embedding = final_embedding / norm
+                final_embedding /= norm
             
             return final_embedding.tolist()
             
@@ -106,35 +372,39 @@ class EmbeddingService:
             return embedding.tolist()
     
     def _split_text_semantically(self, text: str, max_chunk_size: int = 400) -> List[str]:
-        """テキストを意味のある単位で分割"""
+        """
+        テキストを意味のある単位で分割
+        
+        文の境界を1回の走査で求め、チャンクの区切りが確定したときだけ元のテキストをスライスする
+        （句読点は元のテキストのまま残る）
+        """
         if len(text) <= max_chunk_size:
             return [text]
         
-        # 文単位で分割
-        sentences = re.split(r'[。！？\.\!\?]', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        
         chunks = []
-        current_chunk = ""
+        chunk_start = None
         
-        for sentence in sentences:
-            # 句読点を復元
-            sentence_with_punct = sentence + "。"
+        for match in _SENTENCE_PATTERN.finditer(text):
+            start, end = match.span()
+            if chunk_start is None:
+                chunk_start = start
+            elif end - chunk_start > max_chunk_size:
+                # この文を加えるとチャンクサイズを超えるため、直前の文までで区切る
+                chunk = text[chunk_start:start].strip()
+                if chunk:
+                    chunks.append(chunk)
+                chunk_start = start
             
-            # チャンクサイズを超える場合
-            if len(current_chunk + sentence_with_punct) > max_chunk_size:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = sentence_with_punct
-                else:
-                    # 単一文が長すぎる場合は強制分割
-                    chunks.extend(self._force_split_long_sentence(sentence_with_punct, max_chunk_size))
-            else:
-                current_chunk += sentence_with_punct
+            if end - chunk_start > max_chunk_size:
+                # 単一文が長すぎる場合は強制分割
+                chunks.extend(self._force_split_long_sentence(text[chunk_start:end].strip(), max_chunk_size))
+                chunk_start = None
         
         # 最後のチャンクを追加
-        if current_chunk:
-            chunks.append(current_chunk.strip())
+        if chunk_start is not None:
+            chunk = text[chunk_start:].strip()
+            if chunk:
+                chunks.append(chunk)
         
         return chunks
     
@@ -146,77 +416,99 @@ class EmbeddingService:
         return chunks
     
     def generate_batch_embeddings(self, texts: List[str], use_chunking: bool = True) -> List[List[float]]:
-        """複数テキストの埋め込みベクトルを一括生成（改良版）"""
+        """
+        複数テキストの埋め込みベクトルを一括生成（改良版）
+        
+        全テキストのチャンクを1つのリストにまとめて1回のmodel.encodeで処理し、
+        テキストごとにチャンク長で重み付けした平均を取って正規化する
+        （結果はテキストごとにgenerate_embeddingを呼んだ場合と同じ）
+        """
         if not self.model:
             self._load_model()
         
         try:
-            results = []
-            for text in texts:
-                embedding = self.generate_embedding(text, use_chunking=use_chunking)
-                results.append(embedding)
-            return results
+            all_chunks: List[str] = []
+            owners: List[int] = []
+            weights: List[int] = []
+            for i, text in enumerate(texts):
+                if use_chunking and len(text) > 400:
+                    # 長いテキストはチャンクごとに長さで重み付け
+                    for chunk in self._split_text_semantically(text):
+                        processed_chunk = self._preprocess_text_enhanced(chunk)
+                        if processed_chunk:
+                            all_chunks.append(processed_chunk)
+                            owners.append(i)
+                            weights.append(len(chunk))
+                else:
+                    all_chunks.append(self._preprocess_text_enhanced(text))
+                    owners.append(i)
+                    weights.append(1)
+            
+            if not all_chunks:
+                return [[] for _ in texts]
+            
+            chunk_embeddings = self.model.encode(
+                all_chunks,
+                batch_size=settings.embedding_batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            
+            # テキストごとの重み付き和を求めてから正規化（総重みでの除算は正規化で相殺される）
+            owner_index = np.asarray(owners)
+            summed = np.zeros((len(texts), chunk_embeddings.shape[1]), dtype=np.float32)
+            np.add.at(summed, owner_index, chunk_embeddings * np.asarray(weights, dtype=summed.dtype)[:, None])
+            norms = np.linalg.norm(summed, axis=1, keepdims=True)
+            np.divide(summed, norms, out=summed, where=norms > 0)
+            
+            has_chunks = np.zeros(len(texts), dtype=bool)
+            has_chunks[owner_index] = True
+            return [
+                embedding.tolist() if has_chunk else []
+                for embedding, has_chunk in zip(summed, has_chunks)
+            ]
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {e}")
             return []
     
     def _preprocess_text_enhanced(self, text: str) -> str:
         """強化されたテキスト前処理"""
-        if not text:
-            return ""
-        
-        # 基本的なクリーニング
-        text = text.replace('\n', ' ').replace('\r', ' ')
-        text = text.replace('　', ' ')  # 全角スペースを半角に
-        
-        # 複数の空白を単一の空白に統合
-        text = ' '.join(text.split())
-        
-        # 特殊文字の正規化（ただし重要な記号は保持）
-        text = re.sub(r'[''"""]', '"', text)  # クォート統一
-        text = re.sub(r'[‐－−‒–—―]', '-', text)  # ハイフン統一
-        
-        # URL除去（ただし重要なキーワードは保持）
-        text = re.sub(r'https?://[^\s]+', '[URL]', text)
-        
-        # 最大長制限を緩和（チャンクベースなので）
-        max_length = 450  # 以前の512から調整
-        if len(text) > max_length:
-            # 文の境界で切り詰め
-            sentences = re.split(r'[。！？\.\!\?]', text)
-            result = ""
-            for sentence in sentences:
-                if len(result + sentence + "。") <= max_length:
-                    result += sentence + "。"
-                else:
-                    break
-            if result:
-                text = result
-            else:
-                text = text[:max_length]
-        
-        return text.strip()
+        return _preprocess_text_enhanced(text)
     
     def _preprocess_text(self, text: str) -> str:
         """従来のテキスト前処理（後方互換性）"""
         return self._preprocess_text_enhanced(text)
     
-    def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        """2つの埋め込みベクトル間のコサイン類似度を計算"""
+    def calculate_similarity(self, embedding1: Union[np.ndarray, List[float]],
+                             embedding2: Union[np.ndarray, List[float]]) -> float:
+        """
+        2つの埋め込みベクトル間のコサイン類似度を計算
+        
+        本サービスの埋め込みはnormalize_embeddings=Trueで単位ベクトル化済みのため、
+        ノルム計算を省き内積のみで求める（正規化されていないベクトルを渡さないこと）
+        """
         try:
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
-            
-            # コサイン類似度の計算
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
-            
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-            
-            similarity = dot_product / (norm1 * norm2)
-            return float(similarity)
+            vec1 = self._as_float32(embedding1)
+            vec2 = self._as_float32(embedding2)
+            return float(vec1 @ vec2)
         except Exception as e:
             logger.error(f"Failed to calculate similarity: {e}")
             return 0.0
+    
+    @staticmethod
+    def _as_float32(embedding: Union[np.ndarray, List[float]]) -> np.ndarray:
+        """埋め込みを連続したfloat32配列に変換（既にその形式ならコピーしない）"""
+        return np.ascontiguousarray(embedding, dtype=np.float32)
+
+
+def load_frequent_queries(path: str, top_n: int = 100) -> List[str]:
+    """クエリログ（1行1クエリ）から出現頻度の高いクエリを取得"""
+    log_path = Path(path)
+    if not log_path.exists():
+        logger.warning(f"Query log not found: {path}")
+        return []
+    
+    with log_path.open(encoding="utf-8") as f:
+        counts = Counter(line.strip() for line in f if line.strip())
+    return [query for query, _ in counts.most_common(top_n)]
@@ -2,14 +2,39 @@
 esa.io REST API クライアント
 """
 
+import math
+from functools import lru_cache
+import orjson
 import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Dict, Any, Optional
 from ratelimit import limits, sleep_and_retry
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from loguru import logger
 
 from ..config.settings import settings
+from ..utils.http_cache import ETagResponseCache
+
+# エクスポート時の1ページあたりの件数（esa.io APIの上限）
+EXPORT_PER_PAGE = 100
+
+# 接続・読み込みのタイムアウト（秒）
+REQUEST_TIMEOUT = (5, 30)
+
+
+# クライアントはリクエストごとに生成されるため、キャッシュの接続はプロセス内で1つを共有する
+@lru_cache(maxsize=1)
+def get_http_cache() -> Optional[ETagResponseCache]:
+    """esa.io APIレスポンスのETagキャッシュを取得（無効・失敗時はNone）"""
+    if not settings.esa_http_cache_path:
+        return None
+    try:
+        return ETagResponseCache(settings.esa_http_cache_path, ttl=settings.esa_http_cache_ttl)
+    except Exception as e:
+        logger.warning(f"esa HTTP cache disabled: {e}")
+        return None
 
 
 class EsaAPIClient:
@@ -23,16 +48,49 @@ class EsaAPIClient:
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
+        # ページごとにTCP/TLS接続を張り直さないよう、接続を使い回すセッションで送信する
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=max(20, settings.esa_export_concurrency),
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"]
+            )
+        )
+        self.session.mount("https://", adapter)
+        self.http_cache = get_http_cache()
     
     @sleep_and_retry
     @limits(calls=int(settings.esa_api_rate_limit * settings.rate_limit_buffer), period=3600)
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
-        """レート制限対応のリクエスト実行"""
+        """
+        レート制限対応のリクエスト実行
+        
+        前回のETagがあればIf-None-Matchを付けて送り、304（未更新）なら保存済みの本文を返す
+        """
         url = f"{self.base_url}/{endpoint}"
+        cache_key, cached, headers = None, None, None
+        if self.http_cache is not None:
+            cache_key = self.http_cache.key(url, params)
+            cached = self.http_cache.get(cache_key)
+            if cached is not None:
+                headers = {"If-None-Match": cached[0]}
+        
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 304 and cached is not None:
+                self.http_cache.touch(cache_key)
+                return orjson.loads(cached[1])
             response.raise_for_status()
-            return response.json()
+            
+            etag = response.headers.get("ETag")
+            if cache_key is not None and etag:
+                self.http_cache.put(cache_key, etag, response.content)
+            return orjson.loads(response.content)
         except requests.RequestException as e:
             logger.error(f"API request failed: {e}")
             raise
@@ -51,48 +109,80 @@ class EsaAPIClient:
         return self._make_request("members")
     
     def export_all_posts(self) -> List[Dict]:
-        """全記事のエクスポート（レート制限対応）"""
-        posts = []
-        page = 1
+        """
+        全記事のエクスポート（レート制限対応）
         
+        1ページ目のtotal_countから総ページ数を求め、残りのページはスレッドで並行取得する。
+        リクエスト数は_make_requestのレート制限で抑えられるため、固定の待機は入れない
+        """
         logger.info("Starting full posts export...")
         
-        while True:
-            try:
-                response = self.get_posts(page=page, per_page=100)
-                batch_posts = response.get("posts", [])
-                
-                if not batch_posts:
-                    break
-                    
-                posts.extend(batch_posts)
-                logger.info(f"Exported page {page}, total posts: {len(posts)}")
-                
-                page += 1
-                # レート制限対応の待機
-                time.sleep(1)
-                
-            except Exception as e:
-                logger.error(f"Error on page {page}: {e}")
-                break
+        try:
+            first_page = self.get_posts(page=1, per_page=EXPORT_PER_PAGE)
+        except Exception as e:
+            logger.error(f"Error on page 1: {e}")
+            return []
+        
+        posts = list(first_page.get("posts", []))
+        total_pages = math.ceil(first_page.get("total_count", 0) / EXPORT_PER_PAGE)
+        logger.info(f"Exported page 1/{total_pages}, total posts: {len(posts)}")
+        
+        if total_pages > 1:
+            pages = range(2, total_pages + 1)
+            with ThreadPoolExecutor(max_workers=max(1, settings.esa_export_concurrency)) as executor:
+                # ページ順に結果を受け取り、取得に失敗したページ以降は従来通り打ち切る
+                for page, batch_posts in zip(pages, executor.map(self._fetch_posts_page, pages)):
+                    if not batch_posts:
+                        break
+                    posts.extend(batch_posts)
+                    logger.info(f"Exported page {page}/{total_pages}, total posts: {len(posts)}")
         
         logger.info(f"Export completed. Total posts: {len(posts)}")
         return posts
     
+    def _fetch_posts_page(self, page: int) -> Optional[List[Dict]]:
+        """エクスポート用に1ページ分の記事を取得（失敗時はNone）"""
+        try:
+            return self.get_posts(page=page, per_page=EXPORT_PER_PAGE).get("posts", [])
+        except Exception as e:
+            logger.error(f"Error on page {page}: {e}")
+            return None
+    
     def get_recent_posts(self, hours: int = 24) -> List[Dict]:
-        """指定時間以内の更新記事を取得"""
-        since = datetime.now() - timedelta(hours=hours)
-        all_posts = self.export_all_posts()
+        """
+        指定時間以内の更新記事を取得
+        
+        esa.ioの検索クエリ（updated:>日付）で対象を絞り、更新日時の新しい順に取得して
+        指定時刻より古い記事が出た時点でページングを打ち切る
+        """
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        # 日付単位の条件はチームのタイムゾーンで解釈されるため、1日手前から取得して時刻で厳密に絞る
+        query = f"updated:>{(since - timedelta(days=1)).strftime('%Y-%m-%d')}"
         
         recent_posts = []
-        for post in all_posts:
-            try:
-                updated_at = datetime.fromisoformat(post["updated_at"].replace('Z', '+00:00'))
-                if updated_at > since:
-                    recent_posts.append(post)
-            except (KeyError, ValueError) as e:
-                logger.warning(f"Error parsing post date: {e}")
-                continue
+        page = 1
+        while page:
+            response = self._make_request("posts", {
+                "q": query,
+                "sort": "updated",
+                "order": "desc",
+                "per_page": EXPORT_PER_PAGE,
+                "page": page
+            })
+            
+            reached_older = False
+            for post in response.get("posts", []):
+                try:
+                    updated_at = datetime.fromisoformat(post["updated_at"].replace('Z', '+00:00'))
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Error parsing post date: {e}")
+                    continue
+                if updated_at <= since:
+                    reached_older = True
+                    break
+                recent_posts.append(post)
+            
+            page = None if reached_older else response.get("next_page")
         
         logger.info(f"Found {len(recent_posts)} recent posts in last {hours} hours")
         return recent_posts
@@ -4,19 +4,39 @@ BM25（Sparse）+ Vector Search（Dense）の組み合わせ
 """
 
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
+from functools import lru_cache
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
 from dataclasses import dataclass
 import numpy as np
 from loguru import logger
 
+from ..config.settings import settings
 from ..models.search import SearchResult
 from ..utils.query_processor import QueryProcessor
-from .search_service import SearchService
-from .embedding_service import EmbeddingService
-from ..database.repositories.article_repository import ArticleRepository
+from ..utils.search_cache import SemanticSearchCache
+from ..utils.vector_utils import VectorUtils
+from .search_service import get_search_service
 
 
-@dataclass
+def _min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """スコアを[0, 1]にmin-max正規化（全件同点の場合はすべて1）"""
+    if len(scores) == 0:
+        return scores
+    low = scores.min()
+    span = scores.max() - low
+    if span <= 0:
+        return np.ones_like(scores)
+    return (scores - low) / span
+
+
+class DenseHitArticle(NamedTuple):
+    """Dense検索のヒット記事（統合に必要な項目のみ。Articleの代わりにSearchResultへ格納する）"""
+    number: int               # 記事番号
+    name: str                 # 記事名
+    body_md: str              # 本文の先頭部分（ChromaDBのメタデータ）
+
+
+@dataclass(slots=True, frozen=True)
 class HybridSearchResult:
     """ハイブリッド検索結果"""
     article_id: int
@@ -36,17 +56,23 @@ class HybridSearchService:
     1. Sparse Search (BM25) - キーワード一致重視
     2. Dense Search (Vector) - 意味的類似度重視  
     3. Score Fusion - 両方の結果を統合
+       - "cc": 各スコアをmin-max正規化して重みで凸結合（既定）
+       - "rrf": RRF + 生スコアの重み付き和
     """
     
     def __init__(self):
         self.query_processor = QueryProcessor()
-        self.search_service = SearchService()
-        self.embedding_service = EmbeddingService()
-        self.article_repo = ArticleRepository()
+        # 埋め込みモデルとクエリ埋め込みキャッシュはSearchServiceと共用する
+        self.search_service = get_search_service()
+        self.embedding_service = self.search_service.embedding_service
         
         # ハイブリッド検索の重み設定
         self.sparse_weight = 0.6  # BM25の重み
         self.dense_weight = 0.4   # Vector検索の重み
+        self.fusion_mode = settings.hybrid_fusion_mode
+        
+        # 繰り返し質問向けの検索結果キャッシュ
+        self.result_cache = SemanticSearchCache()
         
         logger.info("HybridSearchService initialized")
     
@@ -55,28 +81,37 @@ class HybridSearchService:
         query: str,
         limit: int = 10,
         sparse_weight: Optional[float] = None,
-        dense_weight: Optional[float] = None
+        dense_weight: Optional[float] = None,
+        use_query_processing: bool = True,
+        query_embedding: Optional[List[float]] = None,
+        fusion_mode: Optional[str] = None
     ) -> List[HybridSearchResult]:
         """
         ハイブリッド検索の実行
+        
+        重みはこの呼び出しのみに適用する（並行実行時に他の検索へ影響させない）。
+        query_embeddingを渡すとDense検索でのクエリのベクトル化を省略する
         """
         logger.info(f"Hybrid search started: '{query}' (limit={limit})")
         
         # 重みを動的に設定可能
-        if sparse_weight is not None:
-            self.sparse_weight = sparse_weight
-        if dense_weight is not None:
-            self.dense_weight = dense_weight
+        if sparse_weight is None:
+            sparse_weight = self.sparse_weight
+        if dense_weight is None:
+            dense_weight = self.dense_weight
         
         # クエリ処理
-        processed = self.query_processor.process_query(query)
-        sparse_query = processed['recommended_query']
+        if use_query_processing:
+            processed = self.query_processor.process_query(query)
+            sparse_query = processed['recommended_query']
+        else:
+            sparse_query = query
         
         logger.info(f"Query processing - Original: '{query}' → Sparse: '{sparse_query}'")
         
-        # 並列で検索実行
+        # 並列で検索実行（どちらも同期処理のためスレッドで実行される）
         sparse_task = self._sparse_search(sparse_query, limit * 2)  # より多くの結果を取得
-        dense_task = self._dense_search(query, limit * 2)
+        dense_task = self._dense_search(query, limit * 2, query_embedding)
         
         sparse_results, dense_results = await asyncio.gather(
             sparse_task, dense_task, return_exceptions=True
@@ -91,88 +126,137 @@ class HybridSearchService:
             dense_results = []
         
         # 結果の統合
-        hybrid_results = self._fuse_results(sparse_results, dense_results, limit)
+        hybrid_results = self._fuse_results(
+            sparse_results, dense_results, limit, sparse_weight, dense_weight, fusion_mode
+        )
         
         logger.info(f"Hybrid search completed: {len(hybrid_results)} results")
         return hybrid_results
     
+    async def cached_hybrid_search(
+        self,
+        query: str,
+        limit: int = 10,
+        sparse_weight: Optional[float] = None,
+        dense_weight: Optional[float] = None,
+        use_query_processing: bool = True,
+        fusion_mode: Optional[str] = None
+    ) -> Tuple[List[HybridSearchResult], bool]:
+        """
+        キャッシュ付きハイブリッド検索
+        
+        クエリ文字列の完全一致、次にクエリ埋め込みの類似度でキャッシュを探し、
+        見つからなければ検索を実行して結果を登録する
+        
+        Returns:
+            (検索結果, キャッシュヒットしたかどうか)
+        """
+        params = (
+            limit,
+            self.sparse_weight if sparse_weight is None else sparse_weight,
+            self.dense_weight if dense_weight is None else dense_weight,
+            use_query_processing,
+            self.fusion_mode if fusion_mode is None else fusion_mode
+        )
+        
+        cached = self.result_cache.get(query, params)
+        if cached is not None:
+            logger.info(f"Hybrid search cache hit (exact): '{query}'")
+            return cached, True
+        
+        # クエリのベクトル化は意味的キャッシュの照合とDense検索で共用する（推論はスレッドで実行）
+        query_embedding = await asyncio.to_thread(self.embedding_service.generate_query_embedding, query)
+        cached = self.result_cache.get_similar(query_embedding, params)
+        if cached is not None:
+            logger.info(f"Hybrid search cache hit (semantic): '{query}'")
+            return cached, True
+        
+        results = await self.hybrid_search(
+            query,
+            limit,
+            sparse_weight=params[1],
+            dense_weight=params[2],
+            use_query_processing=use_query_processing,
+            query_embedding=query_embedding,
+            fusion_mode=params[4]
+        )
+        self.result_cache.put(query, params, query_embedding, results)
+        return results, False
+    
     async def _sparse_search(self, query: str, limit: int) -> List[SearchResult]:
-        """Sparse検索（BM25ベース）"""
+        """Sparse検索（BM25ベース、スレッドで実行しDense検索と並行させる）"""
         try:
             # SearchServiceのsemantic_searchを利用
             # semantic_searchは内部でBM25相当の機能を持っている
-            results = self.search_service.semantic_search(query, limit)
+            results = await self.search_service.asemantic_search(query, limit)
             logger.debug(f"Sparse search found {len(results)} results")
             return results
         except Exception as e:
             logger.error(f"Sparse search error: {e}")
             return []
     
-    async def _dense_search(self, query: str, limit: int) -> List[SearchResult]:
-        """Dense検索（Vector Similarity）"""
+    async def _dense_search(
+        self,
+        query: str,
+        limit: int,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[SearchResult]:
+        """Dense検索（Vector Similarity、スレッドで実行しSparse検索と並行させる）"""
+        return await asyncio.to_thread(self._dense_search_sync, query, limit, query_embedding)
+    
+    def _dense_search_sync(
+        self,
+        query: str,
+        limit: int,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[SearchResult]:
+        """Dense検索の本体（同期処理。ChromaDBの検索中はGILが解放される）"""
         try:
             # ChromaDBのベクター検索を直接活用
             chroma_collection = self.search_service.collection
             
-            # クエリのベクター化
-            query_embedding = self.embedding_service.generate_embedding(query)
+            # クエリのベクター化（計算済みなら再利用）
+            if query_embedding is None or len(query_embedding) == 0:
+                query_embedding = self.embedding_service.generate_query_embedding(query)
             
-            # ベクター検索実行
+            # ベクター検索実行（本文はメタデータの先頭部分で足りるため、ドキュメントは取得しない）
             chroma_results = chroma_collection.query(
                 query_embeddings=[query_embedding],
                 n_results=limit,
-                include=['documents', 'metadatas', 'distances']
+                include=['metadatas', 'distances']
             )
             
             # SearchResult形式に変換
+            # 統合時に参照するのは記事番号・タイトル・本文のみのため、Articleは構築しない
             results = []
             if chroma_results['ids'] and chroma_results['ids'][0]:
-                for i, article_id in enumerate(chroma_results['ids'][0]):
+                ids = chroma_results['ids'][0]
+                metadatas = [metadata or {} for metadata in chroma_results['metadatas'][0]]
+                distances = chroma_results['distances'][0]
+                
+                # 先頭部分を持たない（登録し直す前の）記事のみ、データベースから一括取得する
+                missing = [int(article_id) for article_id, metadata in zip(ids, metadatas) if 'snippet' not in metadata]
+                texts = self.search_service.get_article_texts(missing) if missing else {}
+                
+                for article_id, metadata, distance in zip(ids, metadatas, distances):
                     try:
-                        # メタデータからタイトルと記事情報を取得
-                        metadata = chroma_results['metadatas'][0][i]
-                        distance = chroma_results['distances'][0][i]
-                        
                         # 距離を類似度スコアに変換（0-1の範囲）
                         similarity_score = max(0, 1 - distance)
                         
-                        # 記事情報の取得（メタデータから簡易構築）
-                        try:
-                            # ChromaDBのメタデータから記事情報を取得
-                            from ..models.esa_models import Article
-                            from datetime import datetime
-                            
-                            article = Article(
-                                number=int(article_id),
-                                name=metadata.get('name', f'Article {article_id}'),
-                                full_name=metadata.get('name', f'Article {article_id}'),
-                                wip=metadata.get('wip', False),
-                                body_md=chroma_results['documents'][0][i],
-                                body_html="",
-                                created_at=datetime.fromisoformat(metadata['created_at']) if metadata.get('created_at') else datetime.now(),
-                                updated_at=datetime.fromisoformat(metadata['updated_at']) if metadata.get('updated_at') else datetime.now(),
-                                url=metadata.get('url', ''),
-                                tags=metadata.get('tags', '').split(',') if metadata.get('tags') else [],
-                                category=metadata.get('category', ''),
-                                created_by_id=metadata.get('created_by_id'),
-                                updated_by_id=metadata.get('created_by_id'),
-                                processed_text=chroma_results['documents'][0][i],
-                                embedding=None,
-                                summary=None
-                            )
-                            
-                            result = SearchResult(
-                                article=article,
-                                score=similarity_score,
-                                matched_text=f"Vector similarity: {similarity_score:.3f}",
-                                highlights=[]
-                            )
-                            results.append(result)
-                        except Exception as meta_error:
-                            logger.warning(f"Metadata processing error for article {article_id}: {meta_error}")
-                            continue
+                        number = int(article_id)
+                        article = DenseHitArticle(
+                            number=number,
+                            name=metadata.get('name', f'Article {article_id}'),
+                            body_md=metadata.get('snippet', texts.get(number, ""))
+                        )
+                        results.append(SearchResult(
+                            article=article,
+                            score=similarity_score,
+                            matched_text=f"Vector similarity: {similarity_score:.3f}",
+                            highlights=[]
+                        ))
                     except Exception as e:
-                        logger.warning(f"Error processing dense result {i}: {e}")
+                        logger.warning(f"Error processing dense result {article_id}: {e}")
                         continue
             
             logger.debug(f"Dense search found {len(results)} results")
@@ -186,88 +270,101 @@ class HybridSearchService:
         self, 
         sparse_results: List[SearchResult], 
         dense_results: List[SearchResult], 
-        limit: int
+        limit: int,
+        sparse_weight: Optional[float] = None,
+        dense_weight: Optional[float] = None,
+        fusion_mode: Optional[str] = None
     ) -> List[HybridSearchResult]:
         """
         検索結果の統合（Score Fusion）
         
-        使用手法: RRF (Reciprocal Rank Fusion) + Score Weighting
+        使用手法:
+        - "cc": BM25スコア（上限なし）とベクトル類似度はスケールが異なるため、それぞれ
+          min-max正規化してから α·dense + (1-α)·sparse で凸結合する（α = dense_weight / 重みの合計）
+        - "rrf": RRF (Reciprocal Rank Fusion) + Score Weighting
+        スコアは記事ID単位に揃えた配列上でまとめて計算し、結果オブジェクトは上位limit件のみ構築する
         """
-        # 記事IDをキーとした結果辞書
-        article_scores: Dict[int, Dict[str, Any]] = {}
+        if sparse_weight is None:
+            sparse_weight = self.sparse_weight
+        if dense_weight is None:
+            dense_weight = self.dense_weight
+        if fusion_mode is None:
+            fusion_mode = self.fusion_mode
         
-        # Sparse結果の処理
-        for rank, result in enumerate(sparse_results, 1):
-            article_id = result.article.number
-            if article_id not in article_scores:
-                article_scores[article_id] = {
-                    'article': result.article,
-                    'sparse_score': 0.0,
-                    'dense_score': 0.0,
-                    'sparse_rank': float('inf'),
-                    'dense_rank': float('inf')
-                }
-            
-            article_scores[article_id]['sparse_score'] = result.score
-            article_scores[article_id]['sparse_rank'] = rank
+        all_results = sparse_results + dense_results
+        if not all_results or limit <= 0:
+            return []
         
-        # Dense結果の処理
-        for rank, result in enumerate(dense_results, 1):
-            article_id = result.article.number
-            if article_id not in article_scores:
-                article_scores[article_id] = {
-                    'article': result.article,
-                    'sparse_score': 0.0,
-                    'dense_score': 0.0,
-                    'sparse_rank': float('inf'),
-                    'dense_rank': float('inf')
-                }
-            
-            article_scores[article_id]['dense_score'] = result.score
-            article_scores[article_id]['dense_rank'] = rank
+        n_sparse = len(sparse_results)
+        all_ids = np.fromiter(
+            (r.article.number for r in all_results), dtype=np.int64, count=len(all_results)
+        )
+        all_scores = np.fromiter(
+            (r.score for r in all_results), dtype=np.float64, count=len(all_results)
+        )
         
-        # ハイブリッドスコアの計算
-        hybrid_results = []
-        for article_id, scores in article_scores.items():
-            # RRF (Reciprocal Rank Fusion) スコア
+        # 記事IDの重複を除き、初出順（Sparse→Dense）に並べた位置へ対応付ける
+        unique_ids, first_index, inverse = np.unique(all_ids, return_index=True, return_inverse=True)
+        order = np.argsort(first_index)
+        slot_of = np.empty_like(order)
+        slot_of[order] = np.arange(len(order))
+        slots = slot_of[inverse.reshape(-1)]
+        ids = unique_ids[order]
+        first_index = first_index[order]
+        sparse_slots, dense_slots = slots[:n_sparse], slots[n_sparse:]
+        
+        # 片方の結果にしか現れない記事はスコア0・順位∞（RRFの寄与も0）
+        sparse_scores = np.zeros(len(ids))
+        dense_scores = np.zeros(len(ids))
+        sparse_ranks = np.full(len(ids), np.inf)
+        dense_ranks = np.full(len(ids), np.inf)
+        sparse_scores[sparse_slots] = all_scores[:n_sparse]
+        dense_scores[dense_slots] = all_scores[n_sparse:]
+        sparse_ranks[sparse_slots] = np.arange(1, n_sparse + 1)
+        dense_ranks[dense_slots] = np.arange(1, len(dense_results) + 1)
+        
+        if fusion_mode == "rrf":
             k = 60  # RRFパラメータ
-            rrf_score = (
-                1 / (k + scores['sparse_rank']) + 
-                1 / (k + scores['dense_rank'])
-            )
-            
-            # 重み付きスコア
-            weighted_score = (
-                self.sparse_weight * scores['sparse_score'] + 
-                self.dense_weight * scores['dense_score']
-            )
+            rrf_scores = 1.0 / (k + sparse_ranks) + 1.0 / (k + dense_ranks)
+            weighted_scores = sparse_weight * sparse_scores + dense_weight * dense_scores
             
             # 最終的なハイブリッドスコア（RRF + 重み付き）
-            final_score = 0.7 * weighted_score + 0.3 * rrf_score
+            final_scores = 0.7 * weighted_scores + 0.3 * rrf_scores
+        else:
+            # 正規化は各検索の結果内で行い、現れなかった側の寄与は0とする
+            sparse_norm = np.zeros(len(ids))
+            dense_norm = np.zeros(len(ids))
+            sparse_norm[sparse_slots] = _min_max_normalize(all_scores[:n_sparse])
+            dense_norm[dense_slots] = _min_max_normalize(all_scores[n_sparse:])
+            
+            total_weight = sparse_weight + dense_weight
+            alpha = dense_weight / total_weight if total_weight > 0 else 0.5
+            final_scores = alpha * dense_norm + (1 - alpha) * sparse_norm
+        
+        # 上位limit件のみを選択（全件ソートせず、結果オブジェクトも上位分だけ構築する）
+        hybrid_results = []
+        for i in VectorUtils.top_k_indices(final_scores, limit):
+            article = all_results[first_index[i]].article
             
             # 検索タイプの判定
             search_type = "hybrid"
-            if scores['sparse_rank'] == float('inf'):
+            if np.isinf(sparse_ranks[i]):
                 search_type = "dense"
-            elif scores['dense_rank'] == float('inf'):
+            elif np.isinf(dense_ranks[i]):
                 search_type = "sparse"
             
             hybrid_result = HybridSearchResult(
-                article_id=article_id,
-                title=scores['article'].name,
-                content=scores['article'].body_md[:500] + "..." if len(scores['article'].body_md) > 500 else scores['article'].body_md,
-                sparse_score=scores['sparse_score'],
-                dense_score=scores['dense_score'],
-                hybrid_score=final_score,
+                article_id=int(ids[i]),
+                title=article.name,
+                content=article.body_md[:500] + "..." if len(article.body_md) > 500 else article.body_md,
+                sparse_score=float(sparse_scores[i]),
+                dense_score=float(dense_scores[i]),
+                hybrid_score=float(final_scores[i]),
                 search_type=search_type
             )
             hybrid_results.append(hybrid_result)
         
-        # スコア順でソート
-        hybrid_results.sort(key=lambda x: x.hybrid_score, reverse=True)
-        
-        # 上位limit件を返す
-        return hybrid_results[:limit]
+        return hybrid_results
     
     def explain_search(self, query: str, limit: int = 5) -> Dict[str, Any]:
         """
@@ -309,3 +406,9 @@ class HybridSearchService:
         }
         
         return explanation
+
+
+@lru_cache(maxsize=1)
+def get_hybrid_search_service() -> HybridSearchService:
+    """プロセス内で共有するHybridSearchServiceを取得（初回のみ初期化）"""
+    return HybridSearchService()
@@ -4,19 +4,44 @@ Zennサイトの実装を参考にしたRAGシステム
 """
 
 import os
+import threading
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from typing import Callable, List, Optional, Dict, Any, Tuple
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList, TextStreamer, pipeline
 import torch
 from loguru import logger
 
 from ..config.settings import settings
-from ..models.qa import QAResult
+from ..models.qa import QAResult, SourceRef
 from ..models.esa_models import Article
 from .search_service import SearchService
 from ..utils.query_processor import QueryProcessor
 
 
+class _CallbackStreamer(TextStreamer):
+    """確定したテキスト片をコールバックへ渡すストリーマー（generateを呼んだスレッド上で呼ばれる）"""
+    
+    def __init__(self, tokenizer, on_text: Callable[[str], None], **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+        self._on_text = on_text
+    
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self._on_text(text)
+
+
+class _CancelCriteria(StoppingCriteria):
+    """キャンセル要求（クライアント切断など）があれば生成を打ち切る停止条件"""
+    
+    def __init__(self, cancel_event: threading.Event):
+        self.cancel_event = cancel_event
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full(
+            (input_ids.shape[0],), self.cancel_event.is_set(), dtype=torch.bool, device=input_ids.device
+        )
+
+
 class LangChainQAService:
     """LangChainスタイルの質問応答サービス"""
     
@@ -232,7 +257,7 @@ class LangChainQAService:
                 return QAResult(
                     question=question,
                     answer="申し訳ございませんが、ご質問の内容は川合研究室のデータベースに含まれていないようです。\n\nこのシステムは川合研究室の研究活動、プロジェクト、技術的な取り組みに関する情報を提供するものです。 一般的な技術情報については、公式ドキュメントやオンラインガイドをご参照ください。\n\n川合研究室に関するご質問でしたら、お気軽にお聞かせください。",
-                    source_articles=[],
+                    sources=[],
                     confidence=0.0,
                     generated_at=datetime.now()
                 )
@@ -256,7 +281,7 @@ class LangChainQAService:
             return QAResult(
                 question=question,
                 answer=answer,
-                source_articles=[result.article for result in final_results],
+                sources=[SourceRef.from_article(result.article) for result in final_results],
                 confidence=confidence,
                 generated_at=datetime.now()
             )
@@ -266,7 +291,7 @@ class LangChainQAService:
             return QAResult(
                 question=question,
                 answer="エラーが発生しました。しばらく後にもう一度お試しください。",
-                source_articles=[],
+                sources=[],
                 confidence=0.0,
                 generated_at=datetime.now()
             )
@@ -382,13 +407,7 @@ class LangChainQAService:
                     question_type = self._analyze_question_type(question)
                     
                     # より単純で効果的なプロンプト作成
-                    simple_prompt = f"""以下の情報を参考に、質問に丁寧な日本語で詳しく答えてください。
-
-参考情報：
-{context[:800]}
-
-質問：{question}
-回答："""
+                    simple_prompt = self._create_t5_prompt(question, context)
                     
                     response = self.pipeline(
                         simple_prompt,
@@ -618,6 +637,16 @@ class LangChainQAService:
         
         return answer
     
+    def _create_t5_prompt(self, question: str, context: str) -> str:
+        """T5用の単純なプロンプトを作成"""
+        return f"""以下の情報を参考に、質問に丁寧な日本語で詳しく答えてください。
+
+参考情報：
+{context[:800]}
+
+質問：{question}
+回答："""
+    
     def _create_short_prompt(self, question: str, context: str) -> str:
         """短縮プロンプトを作成（トークン制限対応）"""
         # コンテキストを適切な長さに調整
@@ -879,6 +908,156 @@ class LangChainQAService:
                 "memory_gb": 0
             }
 
+    def _contexts_to_articles(self, contexts: List) -> List[Article]:
+        """ハイブリッド検索結果・検索結果をArticleのリストに変換"""
+        articles = []
+        for ctx in contexts:
+            # HybridSearchResultからArticleへの変換
+            if hasattr(ctx, 'article_id') and hasattr(ctx, 'title'):
+                # 簡易Articleオブジェクト作成
+                article = Article(
+                    number=ctx.article_id,
+                    name=ctx.title,
+                    full_name=ctx.title,
+                    wip=False,
+                    body_md=ctx.content if hasattr(ctx, 'content') else '',
+                    body_html='',
+                    created_at=datetime.now(),
+                    updated_at=datetime.now(),
+                    tags=[],
+                    category='',
+                    url='',
+                    created_by_id=0,
+                    updated_by_id=0,
+                    processed_text=ctx.content if hasattr(ctx, 'content') else ''
+                )
+                articles.append(article)
+            elif hasattr(ctx, 'article'):
+                # 既にArticle形式の場合
+                articles.append(ctx.article)
+        return articles
+    
+    def _build_provided_context(self, articles: List[Article]) -> str:
+        """与えられた記事からコンテキスト文字列を構築"""
+        context_parts = []
+        
+        for i, article in enumerate(articles, 1):
+            context_part = f"【記事{i}: {article.name}】\n"
+            
+            if article.category:
+                context_part += f"分野: {article.category}\n"
+            
+            if article.tags:
+                relevant_tags = [tag for tag in article.tags if tag.strip()][:3]
+                if relevant_tags:
+                    context_part += f"キーワード: {', '.join(relevant_tags)}\n"
+            
+            # 記事内容を追加
+            content = ""
+            if hasattr(article, 'processed_text') and article.processed_text:
+                content = self._extract_key_sentences(article.processed_text, 3)
+            elif article.body_md:
+                clean_text = self._clean_markdown(article.body_md)
+                content = self._extract_key_sentences(clean_text, 3)
+            
+            if content:
+                context_part += f"内容: {content}\n"
+            
+            context_parts.append(context_part)
+        
+        return "\n".join(context_parts)
+    
+    def stream_answer(
+        self,
+        question: str,
+        on_text: Callable[[str], None],
+        contexts: Optional[List] = None,
+        context_limit: int = 5,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Tuple[List[SourceRef], float]:
+        """
+        回答をトークン単位で逐次生成する
+        
+        生成は呼び出したスレッド上でブロッキングに行い、確定したテキスト片ごとにon_textを呼ぶ。
+        同時生成数を抑えるため、呼び出し側で上限付きのスレッドプールから実行すること
+        
+        Args:
+            question: 質問
+            on_text: 生成されたテキスト片を受け取るコールバック
+            contexts: ハイブリッド検索結果など（Noneの場合はセマンティック検索で取得）
+            context_limit: 使用する記事数
+            cancel_event: セットされると次のトークンで生成を打ち切る
+        
+        Returns:
+            (根拠記事の参照情報, 信頼度)（answer_question_with_contextと同じ基準）
+        """
+        if contexts is None:
+            contexts = self.search_service.semantic_search(query=question, limit=context_limit)
+        
+        articles = self._contexts_to_articles(contexts)[:context_limit]
+        if not articles:
+            on_text("申し訳ございませんが、提供されたコンテキストから回答を生成できませんでした。")
+            return [], 0.0
+        
+        context = self._build_provided_context(articles)
+        sources = [SourceRef.from_article(article) for article in articles]
+        confidence = 0.8 if len(articles) >= 3 else 0.6
+        
+        # モデルを読み込めなかった場合は一括生成と同じくフォールバック回答を返す
+        if self.model is None or self.tokenizer is None:
+            on_text(self._create_fallback_answer(question, context))
+            return sources, confidence
+        
+        emitted = False
+        
+        def emit(text: str):
+            nonlocal emitted
+            emitted = True
+            on_text(text)
+        
+        try:
+            # 後処理（_post_process_answer）は逐次出力と両立しないため、ここでは行わない
+            if "flan-t5" in self.model_name:
+                prompt = self._create_t5_prompt(question, context)
+                # ビームサーチはストリーミングに対応しないため貪欲法で生成
+                generation_kwargs = {
+                    "max_new_tokens": 400,
+                    "num_beams": 1,
+                    "do_sample": False,
+                    "no_repeat_ngram_size": 3,
+                    "repetition_penalty": 1.2,
+                    "pad_token_id": self.tokenizer.pad_token_id,
+                    "eos_token_id": self.tokenizer.eos_token_id
+                }
+            else:
+                prompt = self._create_short_prompt(question, context)
+                generation_kwargs = {
+                    "max_new_tokens": 200,
+                    "do_sample": True,
+                    "temperature": 0.7,
+                    "top_p": 0.9,
+                    "repetition_penalty": 1.2,
+                    "pad_token_id": self.tokenizer.eos_token_id,
+                    "eos_token_id": self.tokenizer.eos_token_id
+                }
+            
+            inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True).to(self.model.device)
+            streamer = _CallbackStreamer(self.tokenizer, emit, skip_special_tokens=True)
+            stopping_criteria = StoppingCriteriaList(
+                [_CancelCriteria(cancel_event)] if cancel_event is not None else []
+            )
+            
+            self.model.generate(
+                **inputs, **generation_kwargs, streamer=streamer, stopping_criteria=stopping_criteria
+            )
+        except Exception as e:
+            logger.error(f"Streaming generation error: {e}")
+            # 途中まで送信済みの場合はそのまま打ち切り、何も送っていなければフォールバック回答を返す
+            if not emitted:
+                on_text(self._create_fallback_answer(question, context))
+        
+        return sources, confidence
+    
     def answer_question_with_context(self, question: str, contexts: List, progress_tracker=None, **kwargs) -> QAResult:
         """
         与えられたコンテキストを使用して質問に答える
@@ -893,33 +1072,7 @@ class LangChainQAService:
                 progress_tracker.update(10, "質問の解析を開始しています...", {"question": question[:50]})
             
             # コンテキストからのArticle形式変換
-            articles = []
-            for ctx in contexts:
-                # HybridSearchResultからArticleへの変換
-                if hasattr(ctx, 'article_id') and hasattr(ctx, 'title'):
-                    # 簡易Articleオブジェクト作成
-                    from ..models.esa_models import Article
-                    
-                    article = Article(
-                        number=ctx.article_id,
-                        name=ctx.title,
-                        full_name=ctx.title,
-                        wip=False,
-                        body_md=ctx.content if hasattr(ctx, 'content') else '',
-                        body_html='',
-                        created_at=datetime.now(),
-                        updated_at=datetime.now(),
-                        tags=[],
-                        category='',
-                        url='',
-                        created_by_id=0,
-                        updated_by_id=0,
-                        processed_text=ctx.content if hasattr(ctx, 'content') else ''
-                    )
-                    articles.append(article)
-                elif hasattr(ctx, 'article'):
-                    # 既にArticle形式の場合
-                    articles.append(ctx.article)
+            articles = self._contexts_to_articles(contexts)
             
             # 進捗更新: コンテキスト処理
             if progress_tracker:
@@ -933,7 +1086,7 @@ class LangChainQAService:
                 return QAResult(
                     question=question,
                     answer="申し訳ございませんが、提供されたコンテキストから回答を生成できませんでした。",
-                    source_articles=[],
+                    sources=[],
                     confidence=0.0,
                     generated_at=datetime.now()
                 )
@@ -944,42 +1097,7 @@ class LangChainQAService:
                                       {"processing_articles": len(articles)})
             
             # コンテキスト文字列を構築
-            context_parts = []
-            sources = []
-            
-            for i, article in enumerate(articles[:kwargs.get('context_limit', 5)], 1):
-                context_part = f"【記事{i}: {article.name}】\n"
-                
-                if article.category:
-                    context_part += f"分野: {article.category}\n"
-                
-                if article.tags:
-                    relevant_tags = [tag for tag in article.tags if tag.strip()][:3]
-                    if relevant_tags:
-                        context_part += f"キーワード: {', '.join(relevant_tags)}\n"
-                
-                # 記事内容を追加
-                content = ""
-                if hasattr(article, 'processed_text') and article.processed_text:
-                    content = self._extract_key_sentences(article.processed_text, 3)
-                elif article.body_md:
-                    clean_text = self._clean_markdown(article.body_md)
-                    content = self._extract_key_sentences(clean_text, 3)
-                
-                if content:
-                    context_part += f"内容: {content}\n"
-                
-                context_parts.append(context_part)
-                
-                # ソース情報を追加
-                sources.append({
-                    "article_number": article.number,
-                    "title": article.name,
-                    "category": article.category or "未分類",
-                    "url": article.url or ""
-                })
-            
-            combined_context = "\n".join(context_parts)
+            combined_context = self._build_provided_context(articles[:kwargs.get('context_limit', 5)])
             logger.info(f"コンテキスト長: {len(combined_context)}文字")
             
             # 進捗更新: 質問分析
@@ -1018,7 +1136,7 @@ class LangChainQAService:
             result = QAResult(
                 question=question,
                 answer=response_text,
-                source_articles=articles[:kwargs.get('context_limit', 5)],
+                sources=[SourceRef.from_article(article) for article in articles[:kwargs.get('context_limit', 5)]],
                 confidence=confidence,
                 generated_at=datetime.now()
             )
@@ -1044,7 +1162,7 @@ class LangChainQAService:
             return QAResult(
                 question=question,
                 answer=f"申し訳ございませんが、回答の生成中にエラーが発生しました: {str(e)}",
-                source_articles=[],
+                sources=[],
                 confidence=0.0,
                 generated_at=datetime.now()
             )
@@ -2,15 +2,22 @@
 検索サービス
 """
 
+import asyncio
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import chromadb
+import numpy as np
 from loguru import logger
 
 from ..config.settings import settings
 from ..models.search import SearchResult
 from ..models.esa_models import Article
+from ..utils.vector_utils import VectorUtils
 from .embedding_service import EmbeddingService
 
+# ChromaDBのメタデータに保持する本文の先頭部分の長さ（検索結果の表示用）
+SNIPPET_LENGTH = 500
+
 
 class SearchService:
     """検索サービス"""
@@ -37,31 +44,11 @@ class SearchService:
     def add_article(self, article: Article):
         """記事をベクトルデータベースに追加"""
         try:
-            # 埋め込みベクトル生成
-            if not article.embedding:
-                article.embedding = self.embedding_service.generate_embedding(
-                    f"{article.name} {article.body_md}"
-                )
-            
-            # ChromaDBに追加
-            metadata = {
-                "name": article.name,
-                "category": article.category or "",
-                "tags": ",".join(article.tags) if article.tags else "",
-                "created_at": article.created_at.isoformat() if article.created_at else "",
-                "updated_at": article.updated_at.isoformat() if article.updated_at else "",
-                "wip": article.wip,
-                "url": article.url or ""
-            }
-            
-            # None値を除外
-            if article.created_by_id is not None:
-                metadata["created_by_id"] = article.created_by_id
-                
+            self._ensure_embedding(article)
             self.collection.add(
                 ids=[str(article.number)],
-                embeddings=[article.embedding],
-                metadatas=[metadata],
+                embeddings=self._as_embedding_matrix([article]),
+                metadatas=[self._build_metadata(article)],
                 documents=[article.processed_text or article.body_md]
             )
             
@@ -69,14 +56,91 @@ class SearchService:
         except Exception as e:
             logger.error(f"Failed to add article to vector database: {e}")
     
-    def semantic_search(self, query: str, limit: int = 10, filters: Optional[Dict] = None, debug_mode: bool = False) -> List[SearchResult]:
-        """セマンティック検索（タイトルマッチング強化版）"""
+    def upsert_articles(self, articles: List[Article]) -> int:
+        """記事をベクトルデータベースに一括で追加または更新"""
+        if not articles:
+            return 0
+        
+        try:
+            for article in articles:
+                self._ensure_embedding(article)
+            articles = [a for a in articles if a.embedding is not None and len(a.embedding) > 0]
+            if not articles:
+                return 0
+            
+            # 既存IDは置き換え、新規IDは追加（重複登録を防ぐ）
+            self.collection.upsert(
+                ids=[str(a.number) for a in articles],
+                embeddings=self._as_embedding_matrix(articles),
+                metadatas=[self._build_metadata(a) for a in articles],
+                documents=[a.processed_text or a.body_md for a in articles]
+            )
+            
+            logger.info(f"Upserted {len(articles)} articles to vector database")
+            return len(articles)
+        except Exception as e:
+            logger.error(f"Failed to upsert articles to vector database: {e}")
+            return 0
+    
+    def _ensure_embedding(self, article: Article):
+        """埋め込みベクトルが無ければ生成（float32の配列として保持する）"""
+        if article.embedding is None or len(article.embedding) == 0:
+            article.embedding = np.asarray(
+                self.embedding_service.generate_embedding(f"{article.name} {article.body_md}"),
+                dtype=np.float32
+            )
+    
+    @staticmethod
+    def _as_embedding_matrix(articles: List[Article]) -> np.ndarray:
+        """記事の埋め込みを (記事数, 次元数) のfloat32行列にまとめる（ChromaDBへは1つの連続バッファで渡す）"""
+        return np.asarray([article.embedding for article in articles], dtype=np.float32)
+    
+    def _build_metadata(self, article: Article) -> Dict[str, Any]:
+        """ChromaDB用のメタデータを構築"""
+        metadata = {
+            "name": article.name,
+            "category": article.category or "",
+            "tags": ",".join(article.tags) if article.tags else "",
+            "created_at": self._format_datetime(article.created_at),
+            "updated_at": self._format_datetime(article.updated_at),
+            "wip": article.wip,
+            "url": article.url or "",
+            # Dense検索でドキュメント全体を取得せずに済むよう先頭部分を保持（省略記号の要否判定用に1文字多く持つ）
+            "snippet": (article.processed_text or article.body_md or "")[:SNIPPET_LENGTH + 1]
+        }
+        
+        # None値を除外
+        if article.created_by_id is not None:
+            metadata["created_by_id"] = article.created_by_id
+        
+        return metadata
+    
+    @staticmethod
+    def _format_datetime(value) -> str:
+        """日時をISO形式の文字列に変換（文字列はそのまま）"""
+        if not value:
+            return ""
+        return value.isoformat() if hasattr(value, "isoformat") else str(value)
+    
+    def semantic_search(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: Optional[Dict] = None,
+        debug_mode: bool = False,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[SearchResult]:
+        """セマンティック検索（タイトルマッチング強化版）
+        
+        query_embeddingを渡すとクエリのベクトル化を省略する
+        """
         try:
             # 1. まずタイトルマッチング記事を探す
             title_matched_articles = self._find_title_matches(query, debug_mode)
             
-            # 2. クエリの埋め込みベクトル生成
-            query_embedding = self.embedding_service.generate_embedding(query)
+            # 2. クエリの埋め込みベクトル生成（計算済みなら再利用）
+            if query_embedding is None or len(query_embedding) == 0:
+                query_embedding = self.embedding_service.generate_query_embedding(query)
             
             # より多くの結果を取得してから多様性フィルタリング
             extended_limit = min(limit * 4, 100)  # 4倍の結果を取得（最大100件）
@@ -89,6 +153,7 @@ class SearchService:
             )
             
             search_results = []
+            candidates = []  # (最終スコア, 記事ID, メタデータ, 本文)
             categories_seen = {}  # カテゴリごとの件数をカウント
             title_keywords_seen = set()
             processed_article_ids = set()
@@ -204,37 +269,8 @@ class SearchService:
                 if debug_mode and article_id == "818":
                     logger.info(f"Debug: Article 818 final score: {final_score:.6f} (sim: {similarity_score:.6f}, title: {title_match_bonus:.6f}, div: {diversity_bonus:.6f}, penalty: {keyword_overlap_penalty:.6f})")
                 
-                # Article オブジェクトを構築
-                # IDを正しく取得（ChromaDBのIDから）
-                article_number = int(article_id)
-                
-                article = Article(
-                    number=article_number,
-                    name=metadata["name"],
-                    full_name=metadata["name"],
-                    wip=metadata["wip"],
-                    body_md=document,
-                    body_html="",
-                    created_at=metadata["created_at"],
-                    updated_at=metadata["updated_at"],
-                    url=metadata["url"],
-                    tags=metadata["tags"].split(",") if metadata["tags"] else [],
-                    category=metadata["category"],
-                    created_by_id=metadata.get("created_by_id"),
-                    updated_by_id=metadata.get("created_by_id"),
-                    processed_text=document
-                )
-                
-                # より関連性の高いマッチテキストを抽出
-                matched_text = self._extract_relevant_text(document, query)
-                
-                search_result = SearchResult(
-                    article=article,
-                    score=final_score,
-                    matched_text=matched_text,
-                    highlights=[query]
-                )
-                search_results.append(search_result)
+                # Article・SearchResultの構築は上位limit件に選ばれた候補のみ行う
+                candidates.append((final_score, article_id, metadata, document))
                 
                 if debug_mode and article_id == "818":
                     logger.info(f"Debug: Article 818 successfully added to results")
@@ -253,9 +289,16 @@ class SearchService:
                     logger.warning(f"No relevant articles found for query '{query}' - returning empty results")
                     return []
             
-            # スコア順でソートして上位limit件を返す
-            search_results.sort(key=lambda x: x.score, reverse=True)
-            final_results = search_results[:limit]
+            # スコア上位limit件のみ部分ソートし、選ばれた候補だけ検索結果を構築する
+            scores = np.array(
+                [result.score for result in search_results] + [candidate[0] for candidate in candidates],
+                dtype=np.float64
+            )
+            final_results = [
+                search_results[i] if i < len(search_results)
+                else self._build_semantic_result(query, *candidates[i - len(search_results)])
+                for i in VectorUtils.top_k_indices(scores, limit)
+            ]
             
             if debug_mode:
                 logger.info(f"Debug: Final results count: {len(final_results)}")
@@ -269,6 +312,40 @@ class SearchService:
             logger.error(f"Semantic search failed: {e}")
             return []
     
+    def _build_semantic_result(
+        self, query: str, score: float, article_id: str, metadata: Dict[str, Any], document: str
+    ) -> SearchResult:
+        """ChromaDBの検索結果1件からSearchResultを構築"""
+        # IDを正しく取得（ChromaDBのIDから）
+        article = Article(
+            number=int(article_id),
+            name=metadata["name"],
+            full_name=metadata["name"],
+            wip=metadata["wip"],
+            body_md=document,
+            body_html="",
+            created_at=metadata["created_at"],
+            updated_at=metadata["updated_at"],
+            url=metadata["url"],
+            tags=metadata["tags"].split(",") if metadata["tags"] else [],
+            category=metadata["category"],
+            created_by_id=metadata.get("created_by_id"),
+            updated_by_id=metadata.get("created_by_id"),
+            processed_text=document
+        )
+        
+        # より関連性の高いマッチテキストを抽出
+        return SearchResult(
+            article=article,
+            score=score,
+            matched_text=self._extract_relevant_text(document, query),
+            highlights=[query]
+        )
+    
+    async def asemantic_search(self, *args, **kwargs) -> List[SearchResult]:
+        """semantic_searchをスレッドで実行する非同期版（イベントループを止めない）"""
+        return await asyncio.to_thread(self.semantic_search, *args, **kwargs)
+    
     def _check_content_relevance(self, document: str, query: str) -> bool:
         """クエリと記事内容の関連性をチェック"""
         try:
@@ -342,49 +419,29 @@ class SearchService:
             return document[:max_length] + "..." if len(document) > max_length else document
     
     def keyword_search(self, query: str, limit: int = 10) -> List[SearchResult]:
-        """キーワード検索"""
+        """キーワード検索（SQLiteのFTS5全文索引を使用）"""
         try:
-            # 簡単なキーワード検索の実装
-            # 実際の実装では、より高度な全文検索エンジンを使用することを推奨
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=limit,
-                include=["metadatas", "documents", "distances"]
-            )
+            from ..database.repositories.article_repository import ArticleRepository
+            from ..database.connection import SessionLocal
+            
+            db_session = SessionLocal()
+            try:
+                article_repo = ArticleRepository(db=db_session)
+                matches = article_repo.keyword_search(query, limit=limit)
+            finally:
+                db_session.close()
             
             search_results = []
-            for i, (metadata, document, distance) in enumerate(zip(
-                results["metadatas"][0],
-                results["documents"][0],
-                results["distances"][0]
-            )):
-                if query.lower() in document.lower():
-                    article = Article(
-                        number=int(results["ids"][0][i]),
-                        name=metadata["name"],
-                        full_name=metadata["name"],
-                        wip=metadata["wip"],
-                        body_md=document,
-                        body_html="",
-                        created_at=metadata["created_at"],
-                        updated_at=metadata["updated_at"],
-                        url=metadata["url"],
-                        tags=metadata["tags"].split(",") if metadata["tags"] else [],
-                        category=metadata["category"],
-                        created_by_id=metadata["created_by_id"],
-                        updated_by_id=metadata["created_by_id"],
-                        processed_text=document
-                    )
-                    
-                    search_result = SearchResult(
-                        article=article,
-                        score=0.8,  # キーワード検索のスコア
-                        matched_text=document[:200] + "..." if len(document) > 200 else document,
-                        highlights=[query]
-                    )
-                    search_results.append(search_result)
+            for article, score in matches:
+                document = article.processed_text or article.body_md or ""
+                search_results.append(SearchResult(
+                    article=article,
+                    score=score,
+                    matched_text=document[:200] + "..." if len(document) > 200 else document,
+                    highlights=[query]
+                ))
             
-            return search_results[:limit]
+            return search_results
             
         except Exception as e:
             logger.error(f"Keyword search failed: {e}")
@@ -407,6 +464,23 @@ class SearchService:
             logger.error(f"Failed to get article by ID {article_id}: {e}")
             return None
     
+    def get_article_texts(self, article_ids: List[int]) -> Dict[int, str]:
+        """複数記事の本文をデータベースから一括取得"""
+        try:
+            from ..database.repositories.article_repository import ArticleRepository
+            from ..database.connection import SessionLocal
+            
+            db_session = SessionLocal()
+            try:
+                article_repo = ArticleRepository(db=db_session)
+                return article_repo.get_texts_by_numbers(article_ids)
+            finally:
+                db_session.close()
+                
+        except Exception as e:
+            logger.error(f"Failed to get article texts: {e}")
+            return {}
+    
     def get_all_articles(self, limit: int = None, offset: int = 0) -> List[Article]:
         """全記事を取得"""
         try:
@@ -464,62 +538,64 @@ class SearchService:
     def _find_title_matches(self, query: str, debug_mode: bool = False) -> List[SearchResult]:
         """タイトルに直接マッチする記事を検索"""
         try:
-            # ChromaDBから全記事のメタデータを取得
-            all_results = self.collection.get(
-                include=["metadatas", "documents"]
-            )
+            # ChromaDBから全記事のメタデータを取得（本文はマッチした記事の分だけ後でまとめて取得）
+            all_results = self.collection.get(include=["metadatas"])
             
             title_matches = []
             query_words = query.lower().split()
             
-            for i, metadata in enumerate(all_results['metadatas']):
-                title = metadata.get('name', '').lower()
-                article_id = all_results['ids'][i]
+            # クエリのキーワードがタイトルに含まれる記事を抽出
+            matched = [
+                (article_id, metadata)
+                for article_id, metadata in zip(all_results['ids'], all_results['metadatas'])
+                if any(query_word in metadata.get('name', '').lower() for query_word in query_words)
+            ]
+            if not matched:
+                return []
+            
+            documents_result = self.collection.get(
+                ids=[article_id for article_id, _ in matched],
+                include=["documents"]
+            )
+            documents = dict(zip(documents_result['ids'], documents_result['documents']))
+            
+            for article_id, metadata in matched:
+                # 高いスコアを付与（タイトルマッチなので優先度最高）
+                score = 2.0  # セマンティック検索より高いスコア
                 
-                # クエリのキーワードがタイトルに含まれるかチェック
-                has_match = False
-                for query_word in query_words:
-                    if query_word in title:
-                        has_match = True
-                        break
+                # Article オブジェクトを構築
+                article_number = int(article_id)
+                document = documents.get(article_id) or ""
                 
-                if has_match:
-                    # 高いスコアを付与（タイトルマッチなので優先度最高）
-                    score = 2.0  # セマンティック検索より高いスコア
-                    
-                    # Article オブジェクトを構築
-                    article_number = int(article_id)
-                    document = all_results['documents'][i]
-                    
-                    article = Article(
-                        number=article_number,
-                        name=metadata["name"],
-                        full_name=metadata["name"],
-                        wip=metadata["wip"],
-                        body_md=document,
-                        body_html="",
-                        created_at=metadata["created_at"],
-                        updated_at=metadata["updated_at"],
-                        url=metadata["url"],
-                        tags=metadata["tags"].split(",") if metadata["tags"] else [],
-                        category=metadata["category"],
-                        created_by_id=metadata.get("created_by_id"),
-                        updated_by_id=metadata.get("created_by_id"),
-                        processed_text=document
-                    )
-                    
-                    matched_text = self._extract_relevant_text(document, query)
-                    
-                    search_result = SearchResult(
-                        article=article,
-                        score=score,
-                        matched_text=matched_text,
-                        highlights=[query]
-                    )
-                    title_matches.append(search_result)
-                    
-                    if debug_mode:
-                        logger.info(f"Debug: Title match found - Article {article_id}: {metadata['name']}")
+                article = Article(
+                    number=article_number,
+                    name=metadata["name"],
+                    full_name=metadata["name"],
+                    wip=metadata["wip"],
+                    body_md=document,
+                    body_html="",
+                    created_at=metadata["created_at"],
+                    updated_at=metadata["updated_at"],
+                    url=metadata["url"],
+                    tags=metadata["tags"].split(",") if metadata["tags"] else [],
+                    category=metadata["category"],
+                    created_by_id=metadata.get("created_by_id"),
+                    updated_by_id=metadata.get("created_by_id"),
+                    processed_text=document
+                )
+                
+                matched_text = self._extract_relevant_text(document, query)
+                
+                search_result = SearchResult(
+                    article=article,
+                    score=score,
+                    matched_text=matched_text,
+                    highlights=[query]
+                )
+                title_matches.append(search_result)
+                
+                if debug_mode:
+                    logger.info(f"Debug: Title match found - Article {article_id}: {metadata['name']}")
             
             # タイトルマッチ記事をスコア順でソート（念のため）
             title_matches.sort(key=lambda x: x.score, reverse=True)
@@ -529,3 +605,9 @@ class SearchService:
         except Exception as e:
             logger.error(f"Title search error: {e}")
             return []
+
+
+@lru_cache(maxsize=1)
+def get_search_service() -> SearchService:
+    """プロセス内で共有するSearchServiceを取得（初回のみ初期化）"""
+    return SearchService()
@@ -0,0 +1,82 @@
+"""
+クエリ埋め込みの永続キャッシュ
+プロセス再起動後もクエリの再ベクトル化を避けるため、SQLiteファイルにfloat32のバイト列として保存する
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class PersistentEmbeddingCache:
+    """
+    SQLiteによるクエリ埋め込みのキー・バリューキャッシュ
+
+    キーはモデル名とクエリのSHA-256。TTLを過ぎたエントリは読み出し時に無視し、書き込み時に掃除する。
+    複数ワーカーから同じファイルを共有できるようWALモードで開く
+    """
+
+    def __init__(self, path: str, ttl: int = 30 * 24 * 3600):
+        self.ttl = ttl
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 検索はスレッドプールから呼ばれるため、接続を共有してロックで直列化する
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                "hash TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "vec BLOB NOT NULL, ts INTEGER NOT NULL)"
+            )
+
+    @staticmethod
+    def _key(model_name: str, query: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{query}".encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        """クエリの埋め込みを取得（未登録・期限切れの場合はNone）"""
+        return self.get_many(model_name, [query]).get(query)
+
+    def get_many(self, model_name: str, queries: Sequence[str]) -> Dict[str, List[float]]:
+        """複数クエリの埋め込みを一括取得（見つかったものだけを返す）"""
+        keys = {self._key(model_name, query): query for query in queries}
+        if not keys:
+            return {}
+
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT hash, vec FROM embedding_cache WHERE hash IN ({placeholders}) AND ts > ?",
+                (*keys, int(time.time()) - self.ttl)
+            ).fetchall()
+        return {keys[key]: np.frombuffer(vec, dtype=np.float32).tolist() for key, vec in rows}
+
+    def put(self, model_name: str, query: str, embedding: Sequence[float]):
+        """クエリの埋め込みを登録"""
+        self.put_many(model_name, [(query, embedding)])
+
+    def put_many(self, model_name: str, items: Sequence[Tuple[str, Sequence[float]]]):
+        """複数クエリの埋め込みを1トランザクションで登録"""
+        now = int(time.time())
+        rows = [
+            (self._key(model_name, query), model_name, len(embedding),
+             np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for query, embedding in items
+            if len(embedding) > 0
+        ]
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (hash, model, dim, vec, ts) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute("DELETE FROM embedding_cache WHERE ts <= ?", (now - self.ttl,))
@@ -0,0 +1,65 @@
+"""
+HTTPレスポンスの条件付き取得キャッシュ
+ETagとレスポンス本文をSQLiteファイルに保存し、If-None-Matchで未更新のページの再ダウンロードを避ける
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+
+class ETagResponseCache:
+    """
+    SQLiteによるURL単位のETag・レスポンス本文キャッシュ
+
+    キーはURLとクエリパラメータのSHA-256。TTLを過ぎたエントリは読み出し時に無視し、書き込み時に掃除する。
+    エクスポートはスレッドで並行に取得するため、接続を共有してロックで直列化する
+    """
+
+    def __init__(self, path: str, ttl: int = 7 * 24 * 3600):
+        self.ttl = ttl
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                "key TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, ts INTEGER NOT NULL)"
+            )
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """URLとクエリパラメータからキャッシュキーを作成（パラメータの順序に依存しない）"""
+        query = orjson.dumps(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return hashlib.sha256(url.encode("utf-8") + b"\0" + query).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """保存済みの (ETag, レスポンス本文) を取得（未登録の場合はNone）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, body FROM http_cache WHERE key = ? AND ts > ?",
+                (key, int(time.time()) - self.ttl)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, etag: str, body: bytes):
+        """ETagとレスポンス本文を登録（期限切れのエントリは削除する）"""
+        now = int(time.time())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO http_cache (key, etag, body, ts) VALUES (?, ?, ?, ?)",
+                (key, etag, body, now)
+            )
+            self._conn.execute("DELETE FROM http_cache WHERE ts <= ?", (now - self.ttl,))
+
+    def touch(self, key: str):
+        """304で再検証できたエントリの有効期限を延長"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE http_cache SET ts = ? WHERE key = ?", (int(time.time()), key))
@@ -5,6 +5,7 @@ RAGシステムにおける自然言語質問からの効果的なキーワー
 
 import re
 import unicodedata
+from functools import lru_cache
 from typing import List, Set, Dict, Optional
 from loguru import logger
 
@@ -46,6 +47,9 @@ class QueryProcessor:
             'esa': ['esa', 'エサ', 'チームエサ', 'team esa', 'エササービス'],
             'api': ['api', 'application programming interface', 'アプリケーションプログラミングインターフェース', 'アプリケーションプログラムインターフェース'],
         }
+        
+        # 同じ質問文の再処理を避けるためのキャッシュ（インスタンス単位）
+        self._process_query_cached = lru_cache(maxsize=4096)(self._process_query)
     
     def process_query(self, query: str) -> Dict[str, any]:
         """
@@ -57,6 +61,11 @@ class QueryProcessor:
         Returns:
             処理結果辞書（キーワード、展開クエリなど）
         """
+        # キャッシュ済みの辞書を呼び出し側が書き換えないようコピーを返す
+        return dict(self._process_query_cached(query))
+    
+    def _process_query(self, query: str) -> Dict[str, any]:
+        """クエリ前処理の本体（キャッシュなし）"""
         # 基本前処理
         normalized_query = self._normalize_text(query)
         
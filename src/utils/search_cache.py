@@ -0,0 +1,87 @@
+"""
+検索結果キャッシュ
+クエリ文字列の完全一致と、クエリ埋め込みのコサイン類似度による意味的一致の2段構成
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticSearchCache:
+    """
+    クエリ単位の検索結果キャッシュ（TTL + LRU）
+
+    検索パラメータ（件数・重みなど）が同じエントリ同士でのみ一致判定を行う。
+    イベントループ上からのみ呼ばれる前提のためロックは持たない
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600, threshold: float = 0.97):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        # (query, params) -> (有効期限, 正規化済みクエリ埋め込み, 検索結果)
+        self._entries: "OrderedDict[Tuple[str, Tuple], Tuple[float, Optional[np.ndarray], List[Any]]]" = OrderedDict()
+
+    def get(self, query: str, params: Tuple) -> Optional[List[Any]]:
+        """クエリ文字列の完全一致で取得"""
+        key = (query, params)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return list(entry[2])
+
+    def get_similar(self, embedding, params: Tuple) -> Optional[List[Any]]:
+        """クエリ埋め込みのコサイン類似度が閾値以上のエントリを取得"""
+        query_vec = self._normalize(embedding)
+        if query_vec is None:
+            return None
+
+        now = time.monotonic()
+        keys, vectors = [], []
+        for key, (expires_at, vec, _) in self._entries.items():
+            if key[1] == params and vec is not None and expires_at >= now and vec.shape == query_vec.shape:
+                keys.append(key)
+                vectors.append(vec)
+
+        if not vectors:
+            return None
+
+        similarities = np.stack(vectors) @ query_vec
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        self._entries.move_to_end(keys[best])
+        return list(self._entries[keys[best]][2])
+
+    def put(self, query: str, params: Tuple, embedding, results: List[Any]):
+        """検索結果を登録"""
+        key = (query, params)
+        self._entries[key] = (time.monotonic() + self.ttl, self._normalize(embedding), list(results))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """全エントリを削除"""
+        self._entries.clear()
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        """埋め込みをfloat32の単位ベクトルに変換"""
+        if embedding is None or len(embedding) == 0:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm
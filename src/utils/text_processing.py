@@ -12,6 +12,22 @@ import warnings
 warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
 
+# 記事の取り込み時に1記事ごとに呼ばれるため、正規表現はモジュール読み込み時にコンパイルしておく
+_MARKDOWN_PATTERNS = [
+    (re.compile(r'#{1,6}\s+'), ''),  # ヘッダー
+    (re.compile(r'\*\*(.*?)\*\*'), r'\1'),  # 太字
+    (re.compile(r'\*(.*?)\*'), r'\1'),  # 斜体
+    (re.compile(r'`(.*?)`'), r'\1'),  # インラインコード
+    (re.compile(r'```[\s\S]*?```'), ''),  # コードブロック
+    (re.compile(r'\[([^\]]+)\]\([^\)]+\)'), r'\1'),  # リンク
+    (re.compile(r'!\[([^\]]*)\]\([^\)]+\)'), r'\1'),  # 画像
+]
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_WORD_PATTERN = re.compile(r'[ぁ-んァ-ヶ一-龯a-zA-Z0-9]+')
+_SENTENCE_BOUNDARY_PATTERN = re.compile(r'[。！？\.\!\?]')
+_HTTP_URL_PATTERN = re.compile(r'https?://[^\s]+')
+_WWW_URL_PATTERN = re.compile(r'www\.[^\s]+')
+
 
 class TextProcessor:
     """テキスト処理クラス"""
@@ -26,19 +42,11 @@ class TextProcessor:
         text = BeautifulSoup(text, "html.parser").get_text()
         
         # マークダウン記法を除去
-        text = re.sub(r'#{1,6}\s+', '', text)  # ヘッダー
-        text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # 太字
-        text = re.sub(r'\*(.*?)\*', r'\1', text)  # 斜体
-        text = re.sub(r'`(.*?)`', r'\1', text)  # インラインコード
-        text = re.sub(r'```[\s\S]*?```', '', text)  # コードブロック
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)  # リンク
-        text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', r'\1', text)  # 画像
-        
-        # 改行を統一
-        text = re.sub(r'\r\n|\r|\n', ' ', text)
+        for pattern, replacement in _MARKDOWN_PATTERNS:
+            text = pattern.sub(replacement, text)
         
-        # 複数の空白を単一の空白に
-        text = re.sub(r'\s+', ' ', text)
+        # 改行を含む複数の空白を単一の空白に
+        text = _WHITESPACE_PATTERN.sub(' ', text)
         
         return text.strip()
     
@@ -49,7 +57,7 @@ class TextProcessor:
             return []
         
         # 日本語・英数字のみを抽出
-        words = re.findall(r'[ぁ-んァ-ヶ一-龯a-zA-Z0-9]+', text)
+        words = _WORD_PATTERN.findall(text)
         
         # 最小文字数でフィルタリング
         keywords = [word for word in words if len(word) >= min_length]
@@ -64,7 +72,7 @@ class TextProcessor:
             return text
         
         # 文の境界で切り詰め
-        sentences = re.split(r'[。！？\.\!\?]', text)
+        sentences = _SENTENCE_BOUNDARY_PATTERN.split(text)
         result = ""
         
         for sentence in sentences:
@@ -90,7 +98,7 @@ class TextProcessor:
         text = text.replace('　', ' ')
         
         # 複数の空白を単一の空白に
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_PATTERN.sub(' ', text)
         
         return text.strip()
     
@@ -101,10 +109,10 @@ class TextProcessor:
             return ""
         
         # HTTP/HTTPSのURL除去
-        text = re.sub(r'https?://[^\s]+', '', text)
+        text = _HTTP_URL_PATTERN.sub('', text)
         
         # www.で始まるURL除去
-        text = re.sub(r'www\.[^\s]+', '', text)
+        text = _WWW_URL_PATTERN.sub('', text)
         
         return text.strip()
     
@@ -115,7 +123,7 @@ class TextProcessor:
             return ""
         
         # 文に分割
-        sentences = re.split(r'[。！？\.\!\?]', text)
+        sentences = _SENTENCE_BOUNDARY_PATTERN.split(text)
         sentences = [s.strip() for s in sentences if s.strip()]
         
         # 最初の数文を要約として使用
@@ -57,16 +57,31 @@ class VectorUtils:
         k: int = 10
     ) -> List[Tuple[int, float]]:
         """最も類似度の高いk個のベクトルを取得"""
-        similarities = []
+        if not vectors or k <= 0:
+            return []
         
-        for i, vec in enumerate(vectors):
-            similarity = VectorUtils.cosine_similarity(query_vector, vec)
-            similarities.append((i, similarity))
+        # 行列積1回で全ベクトルとのコサイン類似度を計算
+        matrix = np.asarray(vectors, dtype=np.float32)
+        query = np.asarray(query_vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        similarities = np.divide(
+            matrix @ query, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms != 0
+        )
         
-        # 類似度で降順ソート
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        return [(int(i), float(similarities[i])) for i in VectorUtils.top_k_indices(similarities, k)]
+    
+    @staticmethod
+    def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        """スコア上位k件のインデックスを降順で取得（全体はソートせず上位k件のみ部分ソート）"""
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
         
-        return similarities[:k]
+        if k < len(scores):
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        # 同点は元の順序を保つ（sortedと同じ並び）
+        return top[np.lexsort((top, -scores[top]))]
     
     @staticmethod
     def vector_mean(vectors: List[List[float]]) -> List[float]:
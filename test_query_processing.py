@@ -114,7 +114,7 @@ def test_enhanced_qa_service():
             result = qa_service.answer_question(question)
             
             print(f"信頼度: {result.confidence:.1%}")
-            print(f"参考記事数: {len(result.source_articles)}")
+            print(f"参考記事数: {len(result.sources)}")
             print(f"回答: {result.answer[:200]}...")
             print("-" * 50)
             